@@ -0,0 +1,111 @@
+"""
+Benchmark parallel markdown analysis through OpenAiClient
+
+Spins up a local stub of the openai chat completions endpoint that answers
+after --delay seconds, then times:
+    single:   one analyse_markdowns_with_llm_svc call with one markdown
+    parallel: one call with --markdowns markdowns, gathered concurrently
+
+With a blocking invoke the parallel run takes markdowns x delay, with ainvoke
+on the shared pool it should take about as long as the single call
+
+Usage:
+    python scripts/benchmarks/openai_concurrency_benchmark.py --markdowns 10 --delay 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+# Add src to the path so the benchmark runs from a plain checkout
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import uvicorn
+from fastapi import FastAPI
+
+import product_agent.logging  # noqa: F401 - silences per request debug logs
+from product_agent.infrastructure.llm.client import OpenAiClient
+from product_agent.services.orchestrators.content_extraction import analyse_markdowns_with_llm_svc
+
+SYNTHESIS = {
+    "url": "https://example.com/whey",
+    "name": "Gold Standard Whey",
+    "price": 49.95,
+    "currency": "AUD",
+    "description": "Whey protein",
+    "other": None,
+    "image_urls": None,
+    "sku": None,
+    "brand": "Optimum Nutrition",
+    "category": "Protein Powder",
+    "attributes": None,
+    "rating": None,
+    "review_count": None,
+    "metadata": None
+}
+
+def build_stub_app(delay: float) -> FastAPI:
+    """A slow stand in for the openai chat completions endpoint"""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions():
+        await asyncio.sleep(delay)
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(SYNTHESIS)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def timed(markdowns: int, llm: OpenAiClient) -> float:
+    started = time.perf_counter()
+    await analyse_markdowns_with_llm_svc(markdowns=[f"# Product {i}" for i in range(markdowns)], llm=llm, model="scraper_mini")
+    return time.perf_counter() - started
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markdowns", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(build_stub_app(args.delay), host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    llm = OpenAiClient(api_key="benchmark-key", base_url=f"http://127.0.0.1:{port}/v1")
+    try:
+        # Warm up so building the chat model is not measured
+        await timed(1, llm)
+
+        single = await timed(1, llm)
+        parallel = await timed(args.markdowns, llm)
+    finally:
+        await llm.aclose()
+        server.should_exit = True
+        await server_task
+
+    print(f"markdowns={args.markdowns} delay={args.delay}s")
+    print(f"single:     {single:6.2f}s")
+    print(f"parallel:   {parallel:6.2f}s")
+    print(f"sequential: {single * args.markdowns:6.2f}s (what a blocking invoke would take)")
+    print(f"parallel / single: {parallel / single:6.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
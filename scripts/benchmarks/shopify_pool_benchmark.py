@@ -0,0 +1,182 @@
+"""
+Benchmark the pooled shopify transport against a client per job
+
+Spins up a local TLS stub of the shopify graphql endpoint and fires the same
+number of search_by_sku calls two ways:
+    unpooled: every job opens (and closes) its own httpx client, the old behaviour
+    pooled:   every job shares the ShopifyConnectionPool transport
+
+Usage:
+    python scripts/benchmarks/shopify_pool_benchmark.py --jobs 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import socket
+import sys
+import tempfile
+import time
+
+# Add src to the path so the benchmark runs from a plain checkout
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import uvicorn
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from fastapi import FastAPI
+
+import product_agent.logging  # noqa: F401 - silences per request debug logs
+from product_agent.infrastructure.shopify.client import ShopifyClient, Locations, Location
+from product_agent.infrastructure.shopify.pool import ShopifyConnectionPool
+
+STUB_RESPONSE = {
+    "data": {
+        "productVariants": {
+            "edges": [
+                {
+                    "node": {
+                        "id": "gid://shopify/ProductVariant/1",
+                        "title": "2 lb / Chocolate",
+                        "sku": "922001",
+                        "price": "49.95",
+                        "product": {"id": "gid://shopify/Product/1", "title": "Gold Standard Whey"}
+                    }
+                }
+            ]
+        }
+    }
+}
+
+def build_stub_app() -> FastAPI:
+    """A tiny stand in for the shopify admin graphql endpoint"""
+    app = FastAPI()
+
+    @app.post("/admin/api/{api_version}/graphql.json")
+    async def graphql(api_version: str):
+        return STUB_RESPONSE
+
+    return app
+
+def write_self_signed_cert(directory: str) -> tuple[str, str]:
+    """Self signed cert so the benchmark pays for TLS handshakes like production"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+
+    return cert_path, key_path
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def build_client(pool: ShopifyConnectionPool, base_url: str) -> ShopifyClient:
+    """Point a real ShopifyClient at the stub server"""
+    client = ShopifyClient(
+        locations=Locations(locations=[Location(name="City", id="gid://shopify/Location/1")]),
+        access_token="benchmark-token",
+        shop_name="benchmark-shop",
+        pool=pool
+    )
+    client.rest_url = f"{base_url}/admin/api/{client.api_version}"
+    client.graph_url = f"{client.rest_url}/graphql.json"
+    return client
+
+async def run_jobs(jobs: int, concurrency: int, job) -> float:
+    """Run the job coroutine factory jobs times, return requests per second"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await job()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[bounded() for _ in range(jobs)])
+    return jobs / (time.perf_counter() - started)
+
+async def benchmark(jobs: int, concurrency: int, base_url: str):
+    async def unpooled_job():
+        # Old behaviour, a fresh transport (and TLS handshake) every job
+        pool = ShopifyConnectionPool(verify=False)
+        client = build_client(pool, base_url)
+        await client.search_by_sku(sku=922001)
+        await pool.aclose()
+
+    shared_pool = ShopifyConnectionPool(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        verify=False
+    )
+    pooled_client = build_client(shared_pool, base_url)
+
+    async def pooled_job():
+        await pooled_client.search_by_sku(sku=922001)
+
+    # Warm up both paths so import and first connection costs are not measured
+    await run_jobs(concurrency, concurrency, unpooled_job)
+    await run_jobs(concurrency, concurrency, pooled_job)
+
+    unpooled_rps = await run_jobs(jobs, concurrency, unpooled_job)
+    pooled_rps = await run_jobs(jobs, concurrency, pooled_job)
+    await shared_pool.aclose()
+
+    print(f"jobs={jobs} concurrency={concurrency}")
+    print(f"unpooled: {unpooled_rps:8.1f} req/s")
+    print(f"pooled:   {pooled_rps:8.1f} req/s")
+    print(f"speedup:  {pooled_rps / unpooled_rps:8.2f}x")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = write_self_signed_cert(directory)
+        server = uvicorn.Server(uvicorn.Config(
+            build_stub_app(),
+            host="127.0.0.1",
+            port=port,
+            ssl_certfile=cert_path,
+            ssl_keyfile=key_path,
+            log_level="warning"
+        ))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        try:
+            await benchmark(args.jobs, args.concurrency, f"https://127.0.0.1:{port}")
+        finally:
+            server.should_exit = True
+            await server_task
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,155 @@
+"""
+Benchmark recall against latency for products collection settings
+
+Loads our product embeddings, either the store_data/embedding_examples files
+or a live collection, and grows them to --products vectors by jittering the
+real ones so the set keeps the shape of our catalogue at a larger store's size.
+Each setting gets its own collection on --url and is timed over --queries
+searches, recall@k is measured against exact cosine top-k from the in process
+numpy index:
+    plain:          float32 vectors in ram
+    scalar:         int8 quantized in ram, rescored with the float32 vectors
+    scalar-disk:    int8 in ram, float32 vectors on disk
+    binary:         1 bit quantized in ram, rescored with 2x oversampling
+    binary-4x:      1 bit quantized in ram, rescored with 4x oversampling
+    binary-raw:     1 bit quantized, no rescoring
+
+Needs a qdrant server, local mode ignores quantization and search params
+
+Usage:
+    docker run -p 6333:6333 qdrant/qdrant
+    python scripts/benchmarks/vector_quantization_benchmark.py --products 20000 --queries 200
+    python scripts/benchmarks/vector_quantization_benchmark.py --source qdrant --collection shopify_products
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add src to the path so the benchmark runs from a plain checkout
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+import product_agent.logging  # noqa: F401 - silences per request debug logs
+from product_agent.infrastructure.vector_db.client import vector_database
+from product_agent.infrastructure.vector_db.in_memory import InMemoryVectorDb
+from product_agent.infrastructure.vector_db.types import CollectionConfig
+
+EMBEDDING_EXAMPLES = Path(__file__).resolve().parents[2] / "store_data" / "embedding_examples"
+
+SETTINGS = {
+    "plain":        CollectionConfig(),
+    "scalar":       CollectionConfig(quantization="scalar"),
+    "scalar-disk":  CollectionConfig(quantization="scalar", on_disk=True),
+    "binary":       CollectionConfig(quantization="binary", oversampling=2.0),
+    "binary-4x":    CollectionConfig(quantization="binary", oversampling=4.0),
+    "binary-raw":   CollectionConfig(quantization="binary", rescore=False),
+}
+
+def load_examples() -> np.ndarray:
+    vectors = []
+    for path in sorted(EMBEDDING_EXAMPLES.glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "text" in data and "embed" in data:
+            data = {data["text"]: data["embed"]}
+        vectors.extend(data.values())
+    return np.asarray(vectors, dtype=np.float32)
+
+def load_collection(collection_name: str) -> np.ndarray:
+    client = QdrantClient(url=os.environ["QDRANT_URL"], api_key=os.getenv("QDRANT_API_KEY"))
+    vectors = []
+    offset = None
+    while True:
+        records, offset = client.scroll(collection_name=collection_name, limit=512, offset=offset, with_vectors=True, with_payload=False)
+        vectors.extend(record.vector for record in records)
+        if offset is None:
+            return np.asarray(vectors, dtype=np.float32)
+
+def grow(base: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """count vectors around the real ones, unit length like openai embeddings"""
+    picks = base[rng.integers(0, len(base), size=count)]
+    vectors = picks + rng.normal(scale=noise / np.sqrt(base.shape[1]), size=picks.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def wait_until_indexed(client: QdrantClient, collection_name: str, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while client.get_collection(collection_name).status != "green":
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection_name} was not indexed in {timeout}s")
+        time.sleep(0.5)
+
+def benchmark_setting(name: str, config: CollectionConfig, url: str, api_key: str | None, vectors: np.ndarray, queries: np.ndarray, expected: list[set], k: int) -> dict:
+    db = vector_database(api_url=url, api_key=api_key, collection_config=config.model_copy(update={"size": vectors.shape[1]}))
+    collection_name = f"quantization_benchmark_{name}_{uuid.uuid4().hex[:8]}"
+    db.create_collection(collection_name)
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(vectors), 256):
+            db.upsert_points(collection_name, [
+                PointStruct(id=i + j, vector=vector.tolist(), payload={"product_type": f"type-{(i + j) % 20}"})
+                for j, vector in enumerate(vectors[i:i + 256])
+            ])
+        wait_until_indexed(db.client, collection_name)
+        load_seconds = time.perf_counter() - start
+
+        for query in queries[:10]:
+            db.search_points(collection_name, query.tolist(), k=k)
+
+        latencies = []
+        recalls = []
+        for query, exact in zip(queries, expected, strict=True):
+            start = time.perf_counter()
+            points = db.search_points(collection_name, query.tolist(), k=k)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(exact & {point.id for point in points}) / k)
+
+        return {
+            "setting": name,
+            "recall": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "load_s": load_seconds,
+        }
+    finally:
+        db.delete_collection(collection_name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_BENCHMARK_URL", "http://localhost:6333"))
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_BENCHMARK_API_KEY"))
+    parser.add_argument("--source", choices=["examples", "qdrant"], default="examples")
+    parser.add_argument("--collection", default="shopify_products", help="collection to read embeddings from with --source qdrant")
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.6, help="jitter around the real embeddings, higher spreads the catalogue out")
+    parser.add_argument("--settings", nargs="*", choices=list(SETTINGS), default=list(SETTINGS))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base = load_examples() if args.source == "examples" else load_collection(args.collection)
+    vectors = grow(base, args.products, args.noise, rng)
+    queries = grow(base, args.queries, args.noise, rng)
+
+    exact = InMemoryVectorDb()
+    exact.load("products", ids=list(range(len(vectors))), vectors=vectors)
+    expected = [{point.id for point in points} for points in exact.search_batch("products", queries.tolist(), k=args.k)]
+
+    print(f"products={len(vectors)} dims={vectors.shape[1]} queries={len(queries)} k={args.k} source={args.source} ({len(base)} real embeddings)")
+    print(f"{'setting':<12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'load s':>8}")
+    for name in args.settings:
+        result = benchmark_setting(name, SETTINGS[name], args.url, args.api_key, vectors, queries, expected, args.k)
+        print(f"{result['setting']:<12} {result['recall']:>9.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['load_s']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Apply the vector db collection settings to a collection that already exists
+
+VECTOR_DB_QUANTIZATION and VECTOR_DB_ON_DISK are read the same way as the
+service container, which only applies them when it creates a collection. This
+switches them on an existing collection and adds any missing payload index,
+qdrant re-quantizes in the background so searches keep working meanwhile
+
+Usage:
+    VECTOR_DB_QUANTIZATION=scalar python scripts/update_vector_collection.py
+    python scripts/update_vector_collection.py --collection shopify_products --quantization binary --on-disk
+"""
+import argparse
+import os
+import sys
+
+# Add src to the path so the script runs from a plain checkout
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from dotenv import load_dotenv
+
+from product_agent.infrastructure.vector_db.client import vector_database
+from product_agent.infrastructure.vector_db.types import CollectionConfig
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default="shopify_products")
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], default=os.getenv("VECTOR_DB_QUANTIZATION", "none"))
+    parser.add_argument("--on-disk", action="store_true", default=os.getenv("VECTOR_DB_ON_DISK", "").lower() in ("1", "true"))
+    args = parser.parse_args()
+
+    config = CollectionConfig(quantization=args.quantization, on_disk=args.on_disk)
+    db = vector_database(api_url=os.environ["QDRANT_URL"], api_key=os.environ["QDRANT_API_KEY"], collection_config=config)
+    db.update_collection(args.collection)
+    print(f"Updated {args.collection}: quantization={config.quantization} on_disk={config.on_disk} indexes={sorted(config.payload_indexes)}")
+
+if __name__ == "__main__":
+    main()
@@ -12,18 +12,41 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from product_agent.services.workflows.product_create import create_agent, AgentProtocol
-from product_agent.infrastructure.llm.prompts import format_product_input
 
-from product_agent.api.schemas.request import Job
-from product_agent.api.shared import queue
+from product_agent.api.shared import queue, catalogue_queue
 from product_agent.api.routes.product import router
-from product_agent.api.consumers import consume_task
+from product_agent.api.consumers import consume_task, consume_catalogue_events
+from product_agent.services.orchestrators.catalogue_sync import schedule_catalogue_sync
 
 from product_agent.db.redis import RedisDatabase, KV_DB
+from product_agent.infrastructure.shopify.pool import ShopifyConnectionPool, shopify_pool
 
 logger = structlog.get_logger(__name__)
 
-def create_app(agent: AgentProtocol | None = None, job_database: KV_DB | None = None, agent_job_queue: asyncio.Queue | None = None, start_consumer = True) -> FastAPI:
+# The collection similarity search reads from
+CATALOGUE_COLLECTION = "shopify_products"
+
+async def close_agent_clients(agent):
+    """Close the pooled clients an agent holds, one failing close doesnt leave the rest open"""
+    closers = []
+    llm = getattr(agent, "llm", None)
+    if llm is not None and hasattr(llm, "aclose"):
+        closers.append(("llm", llm.aclose))
+    draft_llm = getattr(agent, "draft_llm", None)
+    if draft_llm is not None and draft_llm is not llm and hasattr(draft_llm, "aclose"):
+        # The batch client, closing it fails any invoke still waiting on a batch
+        closers.append(("draft_llm", draft_llm.aclose))
+    async_vector_db = getattr(agent, "async_vector_db", None)
+    if async_vector_db is not None and hasattr(async_vector_db, "close"):
+        closers.append(("async_vector_db", async_vector_db.close))
+
+    for name, close in closers:
+        try:
+            await close()
+        except Exception as e:
+            logger.warning("Failed to close agent client", client=name, error=str(e))
+
+def create_app(agent: AgentProtocol | None = None, job_database: KV_DB | None = None, agent_job_queue: asyncio.Queue | None = None, start_consumer = True, shop_pool: ShopifyConnectionPool | None = None, catalogue_event_queue: asyncio.Queue | None = None, webhook_secret: str | None = None) -> FastAPI:
     logger.info("Started Creating App")
 
     def init_lifespan(agent, job_database):
@@ -32,6 +55,9 @@ def create_app(agent: AgentProtocol | None = None, job_database: KV_DB | None =
             app.state.agent_service = create_agent() if agent is None else agent
             app.state.job_db = RedisDatabase(host=os.getenv("REDIS_HOST"), port=int(os.getenv("REDIS_PORT"))) if job_database is None else job_database
             app.state.queue = queue if agent_job_queue is None else agent_job_queue
+            app.state.shopify_pool = shopify_pool if shop_pool is None else shop_pool
+            app.state.catalogue_queue = catalogue_queue if catalogue_event_queue is None else catalogue_event_queue
+            app.state.webhook_secret = os.getenv("SHOPIFY_WEBHOOK_SECRET") if webhook_secret is None else webhook_secret
 
             try:
                 app.state.job_db.ping()
@@ -44,18 +70,51 @@ def create_app(agent: AgentProtocol | None = None, job_database: KV_DB | None =
                 print("🚨"*60)
                 print("="*60)
 
+            workers = []
             if start_consumer:
-                message = asyncio.create_task(consume_task(app.state.agent_service, app.state.job_db, app.state.queue))
-            yield
+                workers.append(asyncio.create_task(consume_task(app.state.agent_service, app.state.job_db, app.state.queue)))
 
-            if start_consumer:
-                message.cancel()
+                # The catalogue consumer reuses the agents vector db and embeddings
+                vector_db = getattr(app.state.agent_service, "vector_db", None)
+                embeddor = getattr(app.state.agent_service, "embeddor", None)
+                if vector_db is not None and embeddor is not None:
+                    workers.append(asyncio.create_task(consume_catalogue_events(app.state.catalogue_queue, vector_db, embeddor, app.state.job_db, CATALOGUE_COLLECTION)))
+                else:
+                    logger.warning("Agent has no vector db or embeddings, catalogue webhooks will queue but not be applied")
+
+                # Catches up on anything the webhooks missed, off unless an interval is set
+                sync_interval = os.getenv("CATALOGUE_SYNC_INTERVAL_SECONDS")
+                shop = getattr(app.state.agent_service, "shop", None)
+                if sync_interval and shop is not None and vector_db is not None and embeddor is not None:
+                    workers.append(asyncio.create_task(schedule_catalogue_sync(
+                        shop=shop,
+                        vector_db=vector_db,
+                        embeddor=embeddor,
+                        kv_db=app.state.job_db,
+                        shop_name=shop.shop_name,
+                        collection_name=CATALOGUE_COLLECTION,
+                        interval_seconds=float(sync_interval),
+                        full_pass_every=int(os.getenv("CATALOGUE_FULL_SYNC_EVERY", "24")),
+                        sku_index=getattr(shop, "sku_index", None)
+                    )))
+            try:
+                yield
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                    try:
+                        await worker
+                    except asyncio.CancelledError:
+                        pass
+                    except Exception as e:
+                        pass
+
+                # Shopify transports, the openai http pool and the async qdrant client
+                # live for the whole app, close them once on shutdown
                 try:
-                    await message
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    pass
+                    await app.state.shopify_pool.aclose()
+                finally:
+                    await close_agent_clients(app.state.agent_service)
 
         return lifespan
 
@@ -1,3 +1,4 @@
+import asyncio
 import structlog
 import os
 import sys
@@ -7,7 +8,8 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 from product_agent.api.schemas.request import Job
-from product_agent.infrastructure.llm.prompts import format_product_input
+from product_agent.infrastructure.shopify.sku_index import SkuIndex
+from product_agent.services.orchestrators.catalogue_sync import apply_catalogue_changes
 
 logger = structlog.get_logger(__name__)
 
@@ -20,17 +22,84 @@ async def consume_task(agent, redis, queue):
         logger.info("Starting task from the queue", task_id=task.request_id)
 
         try:
-            query = format_product_input(task.body)
-
             # workflow returns a DraftResponse model we created
-            resp = await agent.service_workflow(query, task.request_id)
+            resp = await agent.service_workflow(task.body, task.request_id, on_partial_draft=partial_draft_writer(redis, task.request_id))
             database_insert = redis.hset_data(database_name="agent:jobs", key=str(task.request_id), data=Job(completed=True, time_completed=resp.time_of_comepletion, url_of_job=resp.url).model_dump())
-            logger.info(f"Successfully completed job from task queue", task_id=task.request_id, database_response=database_insert)
+            logger.info("Successfully completed job from task queue", task_id=task.request_id, database_response=database_insert)
         except Exception as e:
-            logger.error(f"Job from task queue failed", request_id=task.request_id, error=e, exc_info=True)
+            logger.error("Job from task queue failed", request_id=task.request_id, error=e, exc_info=True)
             insert = redis.hset_data(database_name="agent:jobs", key=str(task.request_id), data=Job(completed=False, error=str(e)).model_dump())
             logger.debug("Inserted redis data after failure", request_id=task.request_id)
 
         finally:
-            logger.info(f"Marking task as done", request_id=task.request_id)
+            logger.info("Marking task as done", request_id=task.request_id)
             queue.task_done()
+
+def partial_draft_writer(redis, request_id: str):
+    """Publish a streaming draft to the job status store as its fields complete"""
+    async def write(result):
+        if result.final is not None:
+            # The finished job is written once the whole workflow completes
+            return
+        job = Job(completed=False, partial_draft=result.partial, completed_fields=result.completed_fields)
+        redis.hset_data(database_name="agent:jobs", key=str(request_id), data=job.model_dump())
+        logger.debug("Published partial draft", request_id=request_id, completed_fields=result.completed_fields)
+
+    return write
+
+async def _next_catalogue_batch(queue, batch_size: int, batch_wait: float) -> list:
+    """Block for one event then gather whatever else arrives within batch_wait"""
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + batch_wait
+    while len(batch) < batch_size:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+async def consume_catalogue_events(queue, vector_db, embeddor, kv_db, collection_name: str, batch_size: int = 100, batch_wait: float = 2.0):
+    """
+    Apply product webhooks to the vector collection and sku index in batches
+
+    Events for the same product in one batch collapse to the latest, so a burst
+    of updates costs one embedding rather than one per webhook
+    """
+    logger.info("Starting Catalogue Consumer..")
+    sku_indexes: dict[str, SkuIndex] = {}
+    while True:
+        batch = await _next_catalogue_batch(queue, batch_size, batch_wait)
+        try:
+            latest = {}
+            for event in batch:
+                latest[(event.shop_name, event.product_id)] = event
+
+            shops = {shop_name for shop_name, _ in latest}
+            for shop_name in shops:
+                events = [event for (shop, _), event in latest.items() if shop == shop_name]
+                if shop_name not in sku_indexes:
+                    sku_indexes[shop_name] = SkuIndex(kv_db=kv_db, shop_name=shop_name)
+
+                # Embedding and vector calls are blocking, keep them off the event loop
+                result = await asyncio.to_thread(
+                    apply_catalogue_changes,
+                    products=[event.product for event in events if event.topic != "products/delete" and event.product is not None],
+                    deleted_ids=[event.product_id for event in events if event.topic == "products/delete"],
+                    vector_db=vector_db,
+                    embeddor=embeddor,
+                    kv_db=kv_db,
+                    shop_name=shop_name,
+                    collection_name=collection_name,
+                    sku_index=sku_indexes[shop_name]
+                )
+                logger.info("Applied catalogue events", shop_name=shop_name, events=len(events), error=result.error)
+        except Exception as e:
+            logger.error("Catalogue batch failed", events=len(batch), error=e, exc_info=True)
+
+        finally:
+            for _ in batch:
+                queue.task_done()
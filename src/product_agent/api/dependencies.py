@@ -7,4 +7,13 @@ def get_job_database(request: Request):
     return request.app.state.job_db
 
 def get_queue(request: Request):
-    return request.app.state.queue
\ No newline at end of file
+    return request.app.state.queue
+
+def get_shopify_pool(request: Request):
+    return request.app.state.shopify_pool
+
+def get_catalogue_queue(request: Request):
+    return request.app.state.catalogue_queue
+
+def get_webhook_secret(request: Request):
+    return request.app.state.webhook_secret
@@ -1,12 +1,17 @@
+import asyncio
 import structlog
-import sys
 import json
 import datetime
 import uuid
-from fastapi import APIRouter, HTTPException, Response, Depends
+from typing import cast
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
+from pydantic import ValidationError
+from product_agent.infrastructure.shopify.webhooks import verify_webhook_hmac, shop_name_from_domain, PRODUCT_TOPICS
+from product_agent.models.shopify import ShopifyProductSchema
 from ..schemas.request import RequestSchema, Job
 from ..schemas.product import PromptVariant
-from ..dependencies import get_job_database, get_queue
+from ..schemas.webhook import CatalogueEvent, ProductTopic
+from ..dependencies import get_agent, get_job_database, get_queue, get_shopify_pool, get_catalogue_queue, get_webhook_secret
 
 router = APIRouter()
 
@@ -43,7 +48,7 @@ async def process_internal_query(query: PromptVariant, redis = Depends(get_job_d
     try:
         request_id = uuid.uuid4()
         request_id = str(request_id)
-        logger.info(f"Recieved request for agent workflow", job_id=str(request_id))
+        logger.info("Recieved request for agent workflow", job_id=str(request_id))
 
         request_schema = RequestSchema(
             request_id=str(request_id),
@@ -66,8 +71,65 @@ async def process_internal_query(query: PromptVariant, redis = Depends(get_job_d
         logger.error("Task Failed To Queue", job_id=str(request_id), exc_info=True)
         raise HTTPException(status_code=400, detail={"message": "Failed to queue your task, contact admin with your wanted request and job id", "job_id": request_id})
 
-#@router.post("/internal/new_product_created"):
-#async def product_created_Webhook():
-    # Create webhook first and post to postman
+@router.get("/internal/metrics/shopify")
+async def get_shopify_metrics(pool = Depends(get_shopify_pool)):
+    """Graphql cost bucket state per shop, queue depth and wait times"""
+    return {"shops": [metrics.model_dump() for metrics in pool.throttle_metrics()]}
 
+@router.get("/internal/metrics/llm")
+async def get_llm_metrics(agent = Depends(get_agent)):
+    """Per model p50/p95 latency and error rates, routing decision counts and response cache hits per call site"""
+    model_health = getattr(agent, "model_health", None)
+    llm_cache = getattr(agent, "llm_cache", None)
+    return {
+        "router": model_health.metrics().model_dump() if model_health is not None else None,
+        "response_cache": [stats.model_dump() for stats in llm_cache.stats()] if llm_cache is not None else None
+    }
 
+@router.post("/webhooks/shopify/products")
+async def shopify_product_webhook(request: Request, queue = Depends(get_catalogue_queue), secret = Depends(get_webhook_secret)):
+    """
+    Products create, update and delete webhooks
+
+    Only verifies and enqueues, the catalogue consumer applies events in batches
+    so shopify gets its 200 straight away
+    """
+    body = await request.body()
+    if not verify_webhook_hmac(body, request.headers.get("X-Shopify-Hmac-Sha256"), secret):
+        logger.warning("Rejected shopify webhook with a bad hmac", shop_domain=request.headers.get("X-Shopify-Shop-Domain"))
+        raise HTTPException(status_code=401, detail={"message": "Invalid webhook signature"})
+
+    topic = request.headers.get("X-Shopify-Topic")
+    if topic not in PRODUCT_TOPICS:
+        # Acknowledge so shopify doesnt retry a topic we never handle
+        logger.info("Ignored shopify webhook topic", topic=topic)
+        return Response(status_code=200)
+
+    try:
+        payload = json.loads(body)
+        if not isinstance(payload, dict) or payload.get("id") is None:
+            raise ValueError("Webhook payload has no product id")
+
+        event = CatalogueEvent(
+            webhook_id=request.headers.get("X-Shopify-Webhook-Id"),
+            topic=cast(ProductTopic, topic),
+            shop_name=shop_name_from_domain(request.headers.get("X-Shopify-Shop-Domain", "")),
+            product_id=str(payload["id"]),
+            received_at=datetime.datetime.now(),
+            product=None if topic == "products/delete" else ShopifyProductSchema.from_rest_api(payload)
+        )
+    except (ValueError, ValidationError) as e:
+        # Shopify retries anything but a 2xx and the same body would fail every time,
+        # acknowledge it and leave the product to the scheduled catalogue sync
+        logger.error("Dropped malformed shopify webhook", topic=topic, webhook_id=request.headers.get("X-Shopify-Webhook-Id"), error=str(e))
+        return Response(status_code=200)
+
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Shopify retries non 2xx responses, let it hold the event until we catch up
+        logger.error("Catalogue queue full, asking shopify to retry", topic=topic, product_id=event.product_id)
+        raise HTTPException(status_code=503, detail={"message": "Catalogue queue full"}) from None
+
+    logger.debug("Queued catalogue event", topic=topic, product_id=event.product_id, shop_name=event.shop_name)
+    return Response(status_code=200)
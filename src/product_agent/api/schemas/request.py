@@ -11,4 +11,6 @@ class Job(BaseModel):
     completed: bool
     time_completed: datetime | None = None
     url_of_job: str | None = None # Shopify URL returned
-    error: str | None = None
\ No newline at end of file
+    error: str | None = None
+    partial_draft: dict | None = None # the draft so far while it streams
+    completed_fields: list[str] | None = None
@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel
+from product_agent.models.shopify import ShopifyProductSchema
+
+ProductTopic = Literal["products/create", "products/update", "products/delete"]
+
+class CatalogueEvent(BaseModel):
+    """A product webhook reduced to what the catalogue consumer needs"""
+    webhook_id:     str | None = None
+    topic:          ProductTopic
+    shop_name:      str
+    product_id:     str
+    received_at:    datetime
+    product:        ShopifyProductSchema | None = None # None for deletes
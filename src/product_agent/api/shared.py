@@ -1,5 +1,9 @@
 """Shared resources for the API that need to be accessible across modules"""
 import asyncio
+from product_agent.api.schemas.webhook import CatalogueEvent
 
 queue = asyncio.Queue()
 
+# Product webhooks waiting to be applied to the vector collection and sku index
+# bounded so a webhook storm pushes back on shopify (which retries) instead of memory
+catalogue_queue: asyncio.Queue[CatalogueEvent] = asyncio.Queue(maxsize=10_000)
@@ -5,9 +5,9 @@ This module defines the ServiceContainer dataclass and factory functions
 to build containers with real or mock implementations.
 """
 import os
-from dataclasses import dataclass
-from typing import Dict
-from pydantic import BaseModel
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any
 import structlog
 import yaml
 from dotenv import load_dotenv
@@ -16,15 +16,33 @@ from unittest.mock import Mock
 from product_agent.config.dependencies.shop import EcommerceInit
 from product_agent.infrastructure.firecrawl.client import FirecrawlClient, Scraper
 from product_agent.infrastructure.shopify.client import ShopifyClient, Shop, Locations, Location
-from product_agent.infrastructure.vector_db.client import vector_database, VectorDb
+from product_agent.infrastructure.shopify.sku_index import SkuIndex
+from product_agent.infrastructure.vector_db.client import async_vector_database, vector_database, AsyncVectorDb, VectorDb
 from product_agent.infrastructure.vector_db.embeddings import Embeddings, Embeddor
+from product_agent.infrastructure.vector_db.embedding_cache import CachedEmbeddor
+from product_agent.infrastructure.vector_db.in_memory import AsyncInMemoryVectorDb, InMemoryVectorDb
+from product_agent.infrastructure.vector_db.types import CollectionConfig
+from product_agent.infrastructure.llm.batch import OpenAiBatchClient
 from product_agent.infrastructure.llm.client import LLM, OpenAiClient, GeminiClient
+from product_agent.infrastructure.llm.response_cache import LLMResponseCache
+from product_agent.infrastructure.llm.prompt_budget import DEFAULT_TOKEN_BUDGET
+from product_agent.infrastructure.llm.router import ModelHealthRegistry, ModelRouter, RouteTarget
+from product_agent.infrastructure.llm.markdown_cache import MarkdownExtractionCache
 from product_agent.infrastructure.image_scraper.client import ImageScraper, ImageScraperSelenium
+from product_agent.db.redis import RedisDatabase
 
 load_dotenv()
 
 logger = structlog.getLogger(__name__)
 
+LLM_PROVIDER_CONFIG = Path(__file__).parent / "files" / "llm_provider.yaml"
+
+@dataclass
+class LLMConfig:
+    """The client and model a process should call"""
+    client: LLM
+    model: str
+
 @dataclass
 class ServiceContainer:
     """
@@ -38,35 +56,84 @@ class ServiceContainer:
     scraper:            Scraper
     vector_db:          VectorDb
     embeddor:           Embeddor
-    llm:                Dict[str, Dict | None]
+    llm:                dict[str, Any]
     image_scraper:      ImageScraper
+    llm_cache:          LLMResponseCache | None = None # opt in cache for deterministic llm calls
+    markdown_cache:     MarkdownExtractionCache | None = None # near duplicate scraped pages reuse an earlier analysis
+    model_health:       ModelHealthRegistry = field(default_factory=ModelHealthRegistry) # latency and errors per model, shared by routers
+    async_vector_db:    AsyncVectorDb | None = None # searches on the event loop, several queries per round trip
+    batch_llm:          LLM | None = None # openai batch api client, half price for bulk runs
+    batch_processes:    frozenset[str] = frozenset() # processes sent through batch_llm, from LLM_BATCH_PROCESSES
+    _routers:           dict[str, ModelRouter] = field(default_factory=dict, init=False, repr=False)
 
-    def llm_config(self, node_key):
-        """Pass a key for the service, get the client and model"""
-        class LLMConfig(BaseModel):
-            """Return model"""
-            client: LLM
-            model: str
-
-        model = self.llm["models"][node_key]["primary"]
-        client = None
+    def _client_for_model(self, model: str) -> LLM | None:
+        """The provider client that serves a model"""
+        clients = self.llm["clients"] or {}
         if "gemini" in model:
-            client = self.llm["clients"]["gemini"]
+            return clients.get("gemini")
 
         if "gpt" in model:
-            client = self.llm["clients"]["gemini"]
+            return clients.get("open_ai")
 
         if "claude" in model:
-            client = self.llm["clients"]["anthropic"]
+            return clients.get("anthropic")
+
+        return None
+
+    def token_budget(self, node_key: str) -> int:
+        """The prompt token budget for a process, set per process in llm_provider.yaml"""
+        models = self.llm.get("models") if isinstance(self.llm, dict) else None
+        process = (models or {}).get(node_key) or {}
+        return int(process.get("token_budget", DEFAULT_TOKEN_BUDGET))
+
+    def batch_client(self, node_key: str) -> LLM | None:
+        """The batch client when the process is switched to batch mode"""
+        if node_key in self.batch_processes:
+            return self.batch_llm
+        return None
+
+    def llm_config(self, node_key):
+        """
+        Pass a key for the service, get the client and model
+
+        The client is a router over the process's primary and fallback models,
+        built once per process so its decisions are tracked together. A process
+        in batch mode gets the batch client and its batch_model instead, the
+        router's timeout and hedging would cancel or duplicate a batch job
+        """
+        process = self.llm["models"][node_key]
+        model = process["primary"]
+
+        batch_client = self.batch_client(node_key)
+        if batch_client is not None:
+            batch_model = process.get("batch_model", model)
+            logger.info("Called for llm client and model", model=batch_model, batch=True)
+            return LLMConfig(client=batch_client, model=batch_model)
+
+        router = self._routers.get(node_key)
+        if router is None:
+            fallback = None
+            fallback_model = process.get("fallback")
+            fallback_client = self._client_for_model(fallback_model) if fallback_model else None
+            if fallback_client is not None:
+                fallback = RouteTarget(client=fallback_client, model=fallback_model)
+
+            router = ModelRouter(
+                process=node_key,
+                primary=RouteTarget(client=self._client_for_model(model), model=model),
+                fallback=fallback,
+                health=self.model_health
+            )
+            self._routers[node_key] = router
 
         logger.info(
             "Called for llm client and model",
             model=model,
-            client=client
+            fallback=router.fallback.model if router.fallback else None
         )
 
         return LLMConfig(
-            client=client,
+            client=router,
             model=model
         )
 
@@ -77,6 +144,21 @@ def _get_required_env(key: str) -> str:
         raise EnvironmentError(f"Required environment variable '{key}' is not set")
     return value
 
+def _batch_llm() -> tuple[LLM | None, frozenset[str]]:
+    """
+    The batch client and the processes it serves
+
+    LLM_BATCH_PROCESSES is a comma separated list of processes, eg
+    draft_creation,scraper_synthesis, for bulk runs that can wait on the
+    batch api. Unset keeps every process on the realtime clients
+    """
+    processes = frozenset(p.strip() for p in os.getenv("LLM_BATCH_PROCESSES", "").split(",") if p.strip())
+    if not processes:
+        return None, processes
+
+    logger.info("LLM batch mode enabled", processes=sorted(processes))
+    return OpenAiBatchClient(api_key=_get_required_env("OPENAI_API_KEY")), processes
+
 class RealServiceContainer:
     def __init__(self):
         # Check max conn pool later
@@ -86,6 +168,28 @@ class RealServiceContainer:
                 api_url=_get_required_env("QDRANT_URL"),
                 api_key=_get_required_env("QDRANT_API_KEY")
             )
+        self._kv_db = RedisDatabase(host=os.environ["REDIS_HOST"], port=int(_get_required_env("REDIS_PORT"))) if os.getenv("REDIS_HOST") else None
+        # One sku index per shop, every request for that shop reads the same redis hashes
+        self._sku_indexes: dict[str, SkuIndex] = {}
+        # Shared so queued invokes from every request land in the same batch jobs
+        self._batch_llm, self._batch_processes = _batch_llm()
+        # Caches and model health outlive a request, the same as local_build_service_container's
+        self._embeddors: dict[str, CachedEmbeddor] = {}
+        self._llm_cache = LLMResponseCache(kv_db=self._kv_db)
+        self._markdown_cache = MarkdownExtractionCache()
+        self._model_health = ModelHealthRegistry()
+
+    def _sku_index(self, shop_name: str) -> SkuIndex | None:
+        if self._kv_db is None:
+            return None
+        if shop_name not in self._sku_indexes:
+            self._sku_indexes[shop_name] = SkuIndex(kv_db=self._kv_db, shop_name=shop_name)
+        return self._sku_indexes[shop_name]
+
+    def _embeddor(self, embeddor_key: str) -> CachedEmbeddor:
+        if embeddor_key not in self._embeddors:
+            self._embeddors[embeddor_key] = CachedEmbeddor(Embeddings(api_key=embeddor_key), kv_db=self._kv_db)
+        return self._embeddors[embeddor_key]
 
     async def build_service_container(
         self,
@@ -99,12 +203,10 @@ class RealServiceContainer:
         tenant_id: str
     ):
         """Build a requests service container"""
-        shop_built = shop.build_shop()
+        shop_built = await shop.build_shop(sku_index=self._sku_index(shop.shop_name))
         scraper = FirecrawlClient(api_key=scraper_key)
         vector_db = self._vector_db_conn
-        embeddor = Embeddings(
-            api_key=embeddor_key,
-        )
+        embeddor = self._embeddor(embeddor_key)
 
         llm =  {
             "clients": {
@@ -113,11 +215,7 @@ class RealServiceContainer:
             },
             "models": None
         }
-        with open(
-            "product_agent.config.files.llm_provider.yaml",
-            "r",
-            encoding="utf-8"
-        ) as config:
+        with open(LLM_PROVIDER_CONFIG, encoding="utf-8") as config:
             models = yaml.safe_load(config)
             llm["models"] = models["llm_factory"]["subscriptions"][subscription]["processes"]
 
@@ -125,9 +223,8 @@ class RealServiceContainer:
             "Built service container for client",
             tenant_id=tenant_id,
             subscription=subscription,
-            shop=shop_built.shop_domain,
+            shop=shop.shop_name,
             scraper=type(scraper).__name__,
-            vector_db_status=vector_db.status,
             clients=llm["clients"].keys(),
             available_processes=llm["models"].keys(),
         )
@@ -138,7 +235,12 @@ class RealServiceContainer:
             vector_db=vector_db,
             embeddor=embeddor,
             llm=llm,
-            image_scraper=image_scraper
+            image_scraper=image_scraper,
+            llm_cache=self._llm_cache,
+            markdown_cache=self._markdown_cache,
+            model_health=self._model_health,
+            batch_llm=self._batch_llm,
+            batch_processes=self._batch_processes
         )
 
 
@@ -156,24 +258,52 @@ def local_build_service_container() -> ServiceContainer:
         ]
     )
 
+    shop_name = _get_required_env("SHOP_NAME")
+    kv_db = RedisDatabase(host=os.environ["REDIS_HOST"], port=int(_get_required_env("REDIS_PORT"))) if os.getenv("REDIS_HOST") else None
     shop = ShopifyClient(
         locations=locations,
         access_token=_get_required_env("SHOPIFY_TOKEN"),
-        shop_name=_get_required_env("SHOP_NAME"),
-        api_version="2024-10"
+        shop_name=shop_name,
+        api_version="2024-10",
+        # Same redis hashes the catalogue consumer writes to
+        sku_index=SkuIndex(kv_db=kv_db, shop_name=shop_name) if kv_db is not None else None
     )
 
     scraper = FirecrawlClient(api_key=_get_required_env("FIRECRAWL_API_KEY"))
-    vector_db = vector_database(
+    # Settings picked with scripts/benchmarks/vector_quantization_benchmark.py, they only
+    # shape new collections, run scripts/update_vector_collection.py for an existing one
+    collection_config = CollectionConfig.model_validate({
+        "quantization": os.getenv("VECTOR_DB_QUANTIZATION", "none"),
+        "on_disk": os.getenv("VECTOR_DB_ON_DISK", "").lower() in ("1", "true")
+    })
+    qdrant_vector_db = vector_database(
         api_url=_get_required_env("QDRANT_URL"),
-        api_key=_get_required_env("QDRANT_API_KEY")
+        api_key=_get_required_env("QDRANT_API_KEY"),
+        collection_config=collection_config
     )
-    embeddor = Embeddings(_get_required_env("OPENAI_API_KEY"))
+    vector_db: VectorDb = qdrant_vector_db
+    async_vector_db: AsyncVectorDb
+    if os.getenv("VECTOR_DB_IN_MEMORY"):
+        # Searches served from process memory, writes still go to qdrant first.
+        # The workflow searches through async_vector_db so it gets the same index
+        hot_vector_db = InMemoryVectorDb(source=qdrant_vector_db)
+        hot_vector_db.load_from_qdrant(qdrant_vector_db.client, "shopify_products")
+        vector_db = hot_vector_db
+        async_vector_db = AsyncInMemoryVectorDb(hot_vector_db)
+    else:
+        async_vector_db = async_vector_database(
+            api_url=_get_required_env("QDRANT_URL"),
+            api_key=_get_required_env("QDRANT_API_KEY"),
+            collection_config=collection_config
+        )
+    embeddor = CachedEmbeddor(Embeddings(_get_required_env("OPENAI_API_KEY")), kv_db=kv_db)
     llm = {
         "open_ai": OpenAiClient(api_key=_get_required_env("OPENAI_API_KEY")),
         "gemini": GeminiClient(api_key=_get_required_env("GEMINI_API_KEY"))
     }
     image_scraper = ImageScraperSelenium(_get_required_env("DRIVER_PATH"))
+    llm_cache = LLMResponseCache(kv_db=kv_db)
+    batch_llm, batch_processes = _batch_llm()
 
     return ServiceContainer(
         shop=shop,
@@ -181,7 +311,12 @@ def local_build_service_container() -> ServiceContainer:
         vector_db=vector_db,
         embeddor=embeddor,
         llm=llm,
-        image_scraper=image_scraper
+        image_scraper=image_scraper,
+        llm_cache=llm_cache,
+        markdown_cache=MarkdownExtractionCache(),
+        async_vector_db=async_vector_db,
+        batch_llm=batch_llm,
+        batch_processes=batch_processes
     )
 
 # Alias for backwards compatibility
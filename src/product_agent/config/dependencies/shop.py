@@ -1,10 +1,13 @@
 from abc import ABC, abstractmethod
 from product_agent.infrastructure.shopify.client import Locations, ShopifyClient
+from product_agent.infrastructure.shopify.sku_index import SkuIndex
 
 class EcommerceInit(ABC):
     """A class that specifies the methods required"""
+    shop_name:      str
+
     @abstractmethod
-    async def build_shop(self):
+    async def build_shop(self, sku_index: SkuIndex | None = None):
         """Implement a build"""
         ...
 
@@ -14,13 +17,14 @@ class ShopifyInit(EcommerceInit):
     access_token:   str
     graph_url:      str
     locations:      Locations
-    async def build_shop(self):
-        """Building the shopify shop"""
+    async def build_shop(self, sku_index: SkuIndex | None = None):
+        """Building the shopify shop, sku_index should be the one shared by every client of this shop"""
         return ShopifyClient(
             locations=self.locations,
             access_token=self.access_token,
-            shop_name=self.shop_name
+            shop_name=self.shop_name,
+            sku_index=sku_index
         )
 
 class WooCommerceInit(EcommerceInit):
-    """WooCommerce Init"""
\ No newline at end of file
+    """WooCommerce Init"""
@@ -3,4 +3,10 @@ class NoScraperResult(Exception):
     def __init__(self, search_query: str):
         message = f"Markdown scraper return no usable results for the query {search_query}"
         super().__init__(message)
-        
\ No newline at end of file
+        
+class ProductAlreadyExists(Exception):
+    """Exception when a requested variant already exists in the store"""
+    def __init__(self, existing: dict):
+        self.existing = existing
+        message = f"Product already exists in the store, matched on: {', '.join(sorted(existing))}"
+        super().__init__(message)
@@ -1,7 +1,9 @@
 import json
 import structlog
-from typing import Any, Protocol
+from collections.abc import Mapping
+from typing import Protocol, cast
 import redis
+from redis.typing import EncodableT, FieldT
 
 logger = structlog.get_logger(__name__)
 
@@ -12,6 +14,30 @@ class KV_DB(Protocol):
     def hset_data(self, database_name: str, key: str, data: dict):
         ...
 
+    def hgetall_data(self, database_name: str) -> dict[str, str]:
+        ...
+
+    def hget_many(self, database_name: str, keys: list[str]) -> list[str | None]:
+        ...
+
+    def hset_many(self, database_name: str, mapping: dict[str, str]):
+        ...
+
+    def hdel_many(self, database_name: str, keys: list[str]):
+        ...
+
+    def get_value(self, key: str) -> str | None:
+        ...
+
+    def set_value(self, key: str, value: str, ttl_seconds: int | None = None):
+        ...
+
+    def get_bytes_many(self, keys: list[str]) -> list[bytes | None]:
+        ...
+
+    def set_bytes_many(self, mapping: dict[str, bytes], ttl_seconds: int | None = None):
+        ...
+
 class RedisDatabase:
     def __init__(self, host: str, port: int):
         self.client = redis.Redis(host=host, port=port, db=0)
@@ -29,3 +55,67 @@ class RedisDatabase:
         # cant be nested otherwise json.dumps
         logger.debug("Called redis hset", database_name_called=database_name, key=key, data=data)
         return self.client.hset(name=database_name, key=key, value=json.dumps(data, default=str))
+
+
+    def hgetall_data(self, database_name: str) -> dict[str, str]:
+        """Every field of a hash, decoded to strings"""
+        logger.debug("Called redis hgetall", database_name_called=database_name)
+        return {
+            _text(key): _text(value)
+            for key, value in self.client.hgetall(name=database_name).items()
+        }
+
+    def hget_many(self, database_name: str, keys: list[str]) -> list[str | None]:
+        """Many fields of a hash in one round trip, decoded, None where missing"""
+        logger.debug("Called redis hmget", database_name_called=database_name, fields=len(keys))
+        if not keys:
+            return []
+        return [
+            _text(value) if value is not None else None
+            for value in self.client.hmget(database_name, keys)
+        ]
+
+    def hset_many(self, database_name: str, mapping: dict[str, str]):
+        """Set many flat string fields in one round trip"""
+        logger.debug("Called redis hset mapping", database_name_called=database_name, fields=len(mapping))
+        if not mapping:
+            return 0
+        return self.client.hset(name=database_name, mapping=cast(Mapping[FieldT, EncodableT], mapping))
+
+    def hdel_many(self, database_name: str, keys: list[str]):
+        logger.debug("Called redis hdel many", database_name_called=database_name, fields=len(keys))
+        if not keys:
+            return 0
+        return self.client.hdel(database_name, *keys)
+
+    def get_value(self, key: str) -> str | None:
+        """Plain string key, decoded"""
+        logger.debug("Called redis get", key=key)
+        value = self.client.get(name=key)
+        return _text(value) if value is not None else None
+
+    def set_value(self, key: str, value: str, ttl_seconds: int | None = None):
+        """Plain string key, expired by redis after ttl_seconds"""
+        logger.debug("Called redis set", key=key, ttl_seconds=ttl_seconds)
+        return self.client.set(name=key, value=value, ex=ttl_seconds)
+
+    def get_bytes_many(self, keys: list[str]) -> list[bytes | None]:
+        """Raw values for many plain keys in one round trip, None where missing"""
+        logger.debug("Called redis mget", keys=len(keys))
+        if not keys:
+            return []
+        return [value.encode("utf-8") if isinstance(value, str) else value for value in self.client.mget(keys)]
+
+    def set_bytes_many(self, mapping: dict[str, bytes], ttl_seconds: int | None = None):
+        """Raw values for many plain keys, pipelined so it is one round trip"""
+        logger.debug("Called redis set many", keys=len(mapping), ttl_seconds=ttl_seconds)
+        if not mapping:
+            return []
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipeline.set(name=key, value=value, ex=ttl_seconds)
+        return pipeline.execute()
+
+def _text(value: bytes | str) -> str:
+    """Redis replies are bytes unless the client decodes responses itself"""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
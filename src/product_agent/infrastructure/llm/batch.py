@@ -0,0 +1,225 @@
+import asyncio
+import inspect
+import json
+import uuid
+import httpx
+import structlog
+from pydantic import BaseModel
+
+from product_agent.models.image_transformer import ImageTransformer
+from .client import LLMError, OPENAI_MODEL_CONFIGS
+from .structured import openai_response_format, parse_structured
+from ...models.llm_input import LLMInput
+
+logger = structlog.get_logger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class _QueuedRequest(BaseModel):
+    """One invoke waiting on a batch"""
+    model_config = {"arbitrary_types_allowed": True}
+
+    custom_id:      str
+    body:           dict
+    future:         asyncio.Future
+    response_schema: type[BaseModel] | None = None
+
+class OpenAiBatchClient:
+    """
+    An LLM that runs invokes through the openai batch api
+
+    For bulk work like onboarding a supplier, where half price matters more
+    than latency. Invokes are queued until max_batch_size is reached or
+    flush_interval seconds pass, then submitted as one jsonl batch job which
+    is polled every poll_interval seconds, each invoke resolves when its line
+    of the output file comes back
+
+    Satisfies the LLM protocol so workflows run unchanged, pass it as the
+    open_ai client when building the service container
+    """
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.openai.com/v1",
+        max_batch_size: int = 500,
+        flush_interval: float = 5.0,
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+        timeout: float = 120.0
+    ):
+        self._model_configs = OPENAI_MODEL_CONFIGS
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout
+        )
+        self._pending: list[_QueuedRequest] = []
+        self._flush_timer: asyncio.Task | None = None
+        self._jobs: set[asyncio.Task] = set()
+        logger.info("Initialised OpenAiBatchClient", max_batch_size=max_batch_size)
+
+    def _request_body(self, llm_input: LLMInput) -> dict:
+        """The chat completions body for one invoke"""
+        if not isinstance(llm_input.user_query, str):
+            raise LLMError("Batch mode only supports text queries")
+
+        config = self._model_configs.get(llm_input.model, {})
+        messages = []
+        if llm_input.system_query is not None:
+            messages.append({"role": "system", "content": llm_input.system_query})
+        messages.append({"role": "user", "content": llm_input.user_query})
+
+        body = {"model": config.get("model", llm_input.model), "messages": messages}
+        if config.get("temperature") is not None:
+            body["temperature"] = config["temperature"]
+        if llm_input.response_schema:
+            body["response_format"] = openai_response_format(llm_input.response_schema)
+        return body
+
+    async def invoke(self, llm_input: LLMInput) -> str | BaseModel:
+        """Queue the call for the next batch and wait for its result"""
+        logger.debug("Starting %s", inspect.stack()[0][3], llm_model=llm_input.model)
+        request = _QueuedRequest(
+            custom_id=uuid.uuid4().hex,
+            body=self._request_body(llm_input),
+            future=asyncio.get_running_loop().create_future(),
+            response_schema=llm_input.response_schema
+        )
+        self._pending.append(request)
+
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_interval())
+
+        result: str | BaseModel = await request.future
+        return result
+
+    async def _flush_after_interval(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_timer = None
+        self.flush()
+
+    def flush(self):
+        """Submit everything queued so far as one batch job"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        if not self._pending:
+            return
+
+        requests, self._pending = self._pending, []
+        job = asyncio.create_task(self._run_batch(requests))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    def _fail(self, requests: list[_QueuedRequest], message: str):
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(LLMError(message))
+
+    async def _run_batch(self, requests: list[_QueuedRequest]):
+        try:
+            batch_id = await self._submit(requests)
+            batch = await self._wait_for(batch_id)
+            await self._resolve(batch, requests)
+        except asyncio.CancelledError:
+            # Callers are awaiting these futures, they would hang on a cancelled job
+            self._fail(requests, "Batch job cancelled")
+            raise
+        except Exception as e:
+            logger.warning("Batch job failed", error=str(e), requests=len(requests))
+            self._fail(requests, f"Batch job failed: {e}")
+
+    async def _submit(self, requests: list[_QueuedRequest]) -> str:
+        jsonl = "\n".join(
+            json.dumps({"custom_id": r.custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": r.body})
+            for r in requests
+        )
+        upload = await self._http.post(
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", jsonl.encode("utf-8"), "application/jsonl")}
+        )
+        upload.raise_for_status()
+
+        response = await self._http.post("/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": self.completion_window
+        })
+        response.raise_for_status()
+        batch_id = str(response.json()["id"])
+        logger.info("Submitted batch job", batch_id=batch_id, requests=len(requests))
+        return batch_id
+
+    async def _wait_for(self, batch_id: str) -> dict:
+        while True:
+            response = await self._http.get(f"/batches/{batch_id}")
+            response.raise_for_status()
+            batch: dict = response.json()
+            if batch["status"] in TERMINAL_BATCH_STATUSES:
+                logger.info("Batch job finished", batch_id=batch_id, status=batch["status"])
+                return batch
+
+            logger.debug("Batch job in progress", batch_id=batch_id, status=batch["status"])
+            await asyncio.sleep(self.poll_interval)
+
+    async def _file_lines(self, file_id: str | None) -> list[dict]:
+        if file_id is None:
+            return []
+        response = await self._http.get(f"/files/{file_id}/content")
+        response.raise_for_status()
+        return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+    async def _resolve(self, batch: dict, requests: list[_QueuedRequest]):
+        by_id = {r.custom_id: r for r in requests}
+        lines = await self._file_lines(batch.get("output_file_id"))
+        lines += await self._file_lines(batch.get("error_file_id"))
+
+        for line in lines:
+            request = by_id.get(line.get("custom_id", ""))
+            if request is None or request.future.done():
+                continue
+
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                request.future.set_exception(LLMError(f"Batch request failed: {line.get('error') or response.get('body')}"))
+                continue
+
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+                result = parse_structured(content, request.response_schema) if request.response_schema else content
+            except Exception as e:
+                request.future.set_exception(LLMError(f"Failed to parse batch response: {e}"))
+                continue
+
+            request.future.set_result(result)
+
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(LLMError(f"No result in batch {batch['id']}, status {batch['status']}"))
+
+    async def aclose(self):
+        """Cancel outstanding jobs, fail every invoke still waiting and close the HTTP client"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        requests, self._pending = self._pending, []
+        self._fail(requests, "Batch client closed")
+
+        jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        await self._http.aclose()
+
+    async def transform_for_images(self, data: ImageTransformer):
+        raise LLMError("Batch mode only supports text queries")
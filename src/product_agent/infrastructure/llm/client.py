@@ -2,13 +2,15 @@ import asyncio
 import base64
 import hashlib
 import inspect
-import datetime
 import io
-from typing import Protocol
+from typing import Any, Protocol
+from collections.abc import AsyncIterator
+import httpx
+import openai
 from product_agent.models.image_transformer import ImageTransformer
 from product_agent.utils.image_size_calc import calculate_image_size
 import structlog
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_openai import ChatOpenAI
 from google import genai
@@ -16,6 +18,9 @@ from google.genai import types
 from google.genai.errors import ClientError
 
 from .utils import _parse_response
+from .context_cache import ContextCacheRegistry
+from .streaming import PartialResult, StreamingJsonParser
+from .structured import openai_response_format, parse_structured
 from ...models.llm_input import LLMInput
 
 logger = structlog.get_logger(__name__)
@@ -32,23 +37,72 @@ class LLM(Protocol):
     async def transform_for_images(self, data: ImageTransformer):
         """Protocol on how to structure queries with img data"""
 
+# Aliases a node can ask for instead of a concrete openai model
+OPENAI_MODEL_CONFIGS: dict[str, dict[str, Any]] = {
+    "scraper_mini": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.1,
+    },
+    "max_deterministic": {
+        "model": "gpt-4o",
+        "temperature": 0.1,
+    }
+}
+
 class OpenAiClient:
-    """A concrete impl of the open ai LLM's"""
-    def __init__(self, api_key: str):
-        self._model_configs = {
-            "scraper_mini": {
-                "model": "gpt-4o-mini",
-                "temperature": 0.1,
-            },
-            "max_deterministic": {
-                "model": "gpt-4o",
-                "temperature": 0.1,
-            }
-        }
+    """
+    A concrete impl of the open ai LLM's
+
+    Chat models are built once per (model, temperature) and every one of them
+    sends through the same pooled async HTTP client, so concurrent invokes
+    share keep-alive connections instead of each paying for a new TLS handshake
+    """
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout: float = 120.0
+    ):
+        self._model_configs = OPENAI_MODEL_CONFIGS
 
         self._api_key = api_key
+        self._base_url = base_url
+        self._http_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            timeout=timeout
+        )
+        self._models: dict[tuple[str, float | None, bool], ChatOpenAI] = {}
+        # Models that rejected a json_schema response format
+        self._no_native_schema: set[str] = set()
         logger.info("Initialised OpenAiClient")
 
+    def _get_model(self, model: str, temperature: float | None, verbose: bool) -> ChatOpenAI:
+        """Get the cached chat model for this config, building it on first use"""
+        key = (model, temperature, verbose)
+        model_object = self._models.get(key)
+        if model_object is None:
+            logger.debug("Creating ChatOpenAI model", model=model, temperature=temperature)
+            model_object = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                verbose=verbose,
+                api_key=self._api_key,
+                base_url=self._base_url,
+                http_async_client=self._http_async_client
+            )
+            self._models[key] = model_object
+
+        return model_object
+
+    async def aclose(self):
+        """Close the shared HTTP pool"""
+        await self._http_async_client.aclose()
+
     def _resolve_model(self, model: str):
         """
         Resolve what model we want to use
@@ -61,6 +115,28 @@ class OpenAiClient:
         
         return model
 
+    def _messages(self, llm_input: LLMInput, user_query: str | list) -> list[dict]:
+        invocation: list[dict] = []
+        if llm_input.system_query is not None:
+            invocation.append({"role": "system", "content": llm_input.system_query})
+
+        invocation.append({"role": "user", "content": user_query})
+        return invocation
+
+    def _native_schema(self, model: str, llm_input: LLMInput) -> dict | None:
+        """The response_format to send, None when the prompt instruction fallback is needed"""
+        if llm_input.response_schema is None or model in self._no_native_schema:
+            return None
+        return openai_response_format(llm_input.response_schema)
+
+    @staticmethod
+    def _with_format_instructions(llm_input: LLMInput, output_parser: PydanticOutputParser) -> str | list:
+        """The user query with format instructions appended, llm_input is left untouched"""
+        instructions = output_parser.get_format_instructions()
+        if isinstance(llm_input.user_query, list):
+            return llm_input.user_query + [{"type": "input_text", "text": instructions}]
+        return f"{llm_input.user_query}\n\n{instructions}"
+
     async def invoke(self, llm_input: LLMInput) -> str | BaseModel:
         """ 
         Args:
@@ -70,35 +146,46 @@ class OpenAiClient:
             user_query: The users question to the model, dont include format instructions
 
             model_repsonse: A pydantic model to structure the response into
+
+        Structured calls use openai's native json_schema response format, the
+        format instruction prompt is only a fallback for models that reject it
+        or a response that fails validation
         """
         logger.debug("Starting %s", inspect.stack()[0][3],
             llm_model=llm_input.model,
             system_query=llm_input.system_query is not None,
             cache_wanted=llm_input.cache_wanted,
         )
+        temperature = self._model_configs.get(llm_input.model, {}).get("temperature")
         model = self._resolve_model(llm_input.model)
+        model_object = self._get_model(model=model, temperature=temperature, verbose=llm_input.verbose)
 
-        model = self._resolve_model(llm_input.model)
-        llm_input.model = model
-        model_object = ChatOpenAI(
-            model=llm_input.model,
-            verbose=llm_input.verbose,
-            api_key=self._api_key
-        )
-        
-        if llm_input.response_schema:
-            output_parser = PydanticOutputParser(pydantic_object=llm_input.response_schema)
-            instructions = output_parser.get_format_instructions()
+        response_format = self._native_schema(model, llm_input)
+        if response_format is not None and llm_input.response_schema is not None:
+            try:
+                result = await model_object.bind(response_format=response_format).ainvoke(self._messages(llm_input, llm_input.user_query))
+                if result is None:
+                    raise LLMError("No result returned from LLM")
 
-            llm_input.user_query += f"\n\n{instructions}"
+                parsed_response = parse_structured(result.text, llm_input.response_schema)
+                logger.debug("LLM Mini Result", result=parsed_response.model_dump_json())
+                return parsed_response
 
-        invocation: list[dict] = []
-        if llm_input.system_query is not None:
-            invocation.append({"role": "system", "content": llm_input.system_query})
+            except openai.BadRequestError as e:
+                if "response_format" not in str(e) and "json_schema" not in str(e):
+                    raise
+                logger.warning("Model rejected native structured output, using format instructions", model=model, error=str(e))
+                self._no_native_schema.add(model)
+
+            except ValidationError as e:
+                logger.warning("Native structured output failed validation, retrying with format instructions", model=model, error=str(e))
 
-        invocation.append({"role": "user", "content": llm_input.user_query})
+        user_query = llm_input.user_query
+        if llm_input.response_schema:
+            output_parser = PydanticOutputParser(pydantic_object=llm_input.response_schema)
+            user_query = self._with_format_instructions(llm_input, output_parser)
 
-        result = model_object.invoke(invocation)
+        result = await model_object.ainvoke(self._messages(llm_input, user_query))
         if result is None:
             raise LLMError("No result returned from LLM")
 
@@ -111,6 +198,40 @@ class OpenAiClient:
         # Theres also meta data there if its wanted including tokens used etc
         return result.content
 
+    async def astream(self, llm_input: LLMInput) -> AsyncIterator[PartialResult]:
+        """
+        Stream a structured response, yielding as each top level field completes
+
+        The last result carries the validated model in final, callers can act
+        on completed fields (eg variants) while later ones are still generating
+        """
+        logger.debug("Starting %s", inspect.stack()[0][3], llm_model=llm_input.model)
+        if llm_input.response_schema is None:
+            raise LLMError("Streaming needs a response_schema")
+
+        temperature = self._model_configs.get(llm_input.model, {}).get("temperature")
+        model = self._resolve_model(llm_input.model)
+        model_object = self._get_model(model=model, temperature=temperature, verbose=llm_input.verbose)
+        parser = StreamingJsonParser(llm_input.response_schema)
+
+        response_format = self._native_schema(model, llm_input)
+        if response_format is not None:
+            stream = model_object.bind(response_format=response_format).astream(self._messages(llm_input, llm_input.user_query))
+        else:
+            stream = model_object.astream(self._messages(llm_input, self._with_format_instructions(llm_input, parser.output_parser)))
+
+        async for chunk in stream:
+            if not isinstance(chunk.content, str) or not chunk.content:
+                continue
+            result = parser.feed(chunk.content)
+            if result is not None:
+                logger.debug("Streamed fields completed", fields=result.newly_completed)
+                yield result
+
+        if not parser.text:
+            raise LLMError("No result returned from LLM")
+        yield parser.finish()
+
     async def transform_for_images(self, data: ImageTransformer):
         """Transform raw data ready for specific LLM provider"""
         image_len = data.how_many_images()
@@ -133,8 +254,20 @@ class OpenAiClient:
         return user_query
 
 class GeminiClient:
-    """A class that holds concrete gemini specific impls"""
-    def __init__(self, api_key: str):
+    """
+    A class that holds concrete gemini specific impls
+
+    Every call goes through the async (.aio) surface of google-genai so
+    generations and file uploads overlap rather than blocking the event loop,
+    semaphores bound how many of each are in flight at once
+    """
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrent_generations: int = 16,
+        max_concurrent_uploads: int = 8,
+        context_cache_ttl_seconds: int = 3600
+    ):
         self.vertex_api_client = genai.Client(
             vertexai=True,
             project="gen-lang-client-0384813764",
@@ -145,7 +278,6 @@ class GeminiClient:
             project="gen-lang-client-0384813764",
             location="us-central1"
         )
-        self.system_cache_name = "scraper_prompt"
 
         self._model_configs = {
             "scraper_mini": {
@@ -154,18 +286,14 @@ class GeminiClient:
             }
         }
 
-    def _generate_cache(self, system_prompt: str, time_wanted: int):
-        logger.debug("Starting %s", inspect.stack()[0][3])
+        self._generation_slots = asyncio.Semaphore(max_concurrent_generations)
+        self._upload_slots = asyncio.Semaphore(max_concurrent_uploads)
 
-        system_cache = self.vertex_api_client.caches.create(
-            model="gemini-2.0-flash",
-            config=types.CreateCachedContentConfig(
-                system_instruction=system_prompt,
-                display_name="scraper_prompt",
-                ttl=datetime.timedelta(minutes=time_wanted)
-            )
+        # System prompts marked cache_wanted are cached once per model and ttl window
+        self.context_caches = ContextCacheRegistry(
+            caches_api=self.vertex_api_client.aio.caches,
+            ttl_seconds=context_cache_ttl_seconds
         )
-        return system_cache
 
     async def invoke(self, llm_input: LLMInput) -> str | BaseModel:
         """
@@ -184,26 +312,41 @@ class GeminiClient:
             cache_wanted=llm_input.cache_wanted,
         )
 
-        if "-" not in llm_input.model:
-            llm_input.model = self._model_configs[llm_input.model]["model"]
-
-        if llm_input.cache_wanted:
-            self._generate_cache(system_prompt=llm_input.system_query, time_wanted=5)
-
-        response = self.vertex_api_client.models.generate_content(
-            model=llm_input.model,
-            contents=llm_input.user_query,
-            config=types.GenerateContentConfig(
-                system_instruction=llm_input.system_query if llm_input.system_query else None,
-                cached_content=self.system_cache_name if llm_input.cache_wanted else None,
-                temperature=0.1,
-                response_mime_type="application/json" if llm_input.response_schema else "text/plain",
-                response_schema=llm_input.response_schema if llm_input.response_schema else None
+        model = llm_input.model
+        if "-" not in model:
+            model = self._model_configs[model]["model"]
+
+        cache_name = None
+        if llm_input.cache_wanted and llm_input.system_query:
+            cache_name = await self.context_caches.get_cache_name(model=model, system_prompt=llm_input.system_query)
+
+        async with self._generation_slots:
+            response = await self.vertex_api_client.aio.models.generate_content(
+                model=model,
+                contents=llm_input.user_query,
+                config=types.GenerateContentConfig(
+                    # The cache already holds the system prompt, gemini rejects sending both
+                    system_instruction=llm_input.system_query if llm_input.system_query and cache_name is None else None,
+                    cached_content=cache_name,
+                    temperature=0.1,
+                    response_mime_type="application/json" if llm_input.response_schema else "text/plain",
+                    response_schema=llm_input.response_schema if llm_input.response_schema else None
+                )
             )
-        )
+
+        if cache_name is not None:
+            self.context_caches.record_usage(response.usage_metadata)
 
         logger.debug("Returned llm response", response=response.text)
-        logger.debug("Completed %s", inspect.stack()[0][3], cached_tokens_used=response.usage_metadata.cached_content_token_count)
+        logger.debug("Completed %s", inspect.stack()[0][3], cached_tokens_used=response.usage_metadata.cached_content_token_count if response.usage_metadata else None)
+
+        if llm_input.response_schema:
+            # The sdk parses native json output into the schema when it can
+            if isinstance(response.parsed, llm_input.response_schema):
+                return response.parsed
+            if response.text is None:
+                raise LLMError("No result returned from LLM")
+            return parse_structured(response.text, llm_input.response_schema)
 
         return response.text
 
@@ -286,15 +429,16 @@ class GeminiClient:
         # Gemini File API only allows: lowercase alphanumeric + dashes
         file_name = f"img-{hashlib.md5(url.encode()).hexdigest()}"
 
-        try:
-            return self.developer_api_client.files.upload(
-                file=image_file,
-                config={"name": file_name, "mime_type": "image/jpeg"}
-            )
+        async with self._upload_slots:
+            try:
+                return await self.developer_api_client.aio.files.upload(
+                    file=image_file,
+                    config={"name": file_name, "mime_type": "image/jpeg"}
+                )
 
-        except ClientError as ce:
-            logger.debug("Already exists error, trying get method")
-            if "ALREADY_EXISTS" in str(ce):
-                return self.developer_api_client.files.get(name=file_name)
+            except ClientError as ce:
+                logger.debug("Already exists error, trying get method")
+                if "ALREADY_EXISTS" in str(ce):
+                    return await self.developer_api_client.aio.files.get(name=file_name)
 
-            raise Exception(ce) from ce
+                raise Exception(ce) from ce
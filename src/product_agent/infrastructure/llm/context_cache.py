@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import time
+import structlog
+from pydantic import BaseModel, computed_field
+from google.genai import types
+
+logger = structlog.get_logger(__name__)
+
+class CachedContext(BaseModel):
+    """A live gemini context cache for one (model, system prompt)"""
+    name:           str
+    model:          str
+    prompt_hash:    str
+    expires_at:     float
+
+class ContextCacheMetrics(BaseModel):
+    """How much of the prompt gemini served from its context caches"""
+    requests:       int
+    creations:      int
+    refreshes:      int
+    failures:       int
+    prompt_tokens:  int
+    cached_tokens:  int
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def cached_token_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+def prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+class ContextCacheRegistry:
+    """
+    Gemini context caches keyed by (model, hash of the system prompt)
+
+    Each cache is created once and its ttl pushed out when a request lands inside
+    refresh_margin_seconds of expiry, so a big system prompt is billed once per
+    window rather than on every call. Concurrent first calls for the same key
+    wait on one creation instead of racing to make several
+    """
+    def __init__(self, caches_api, ttl_seconds: int = 3600, refresh_margin_seconds: int = 120, retry_failed_after_seconds: int = 300):
+        self._caches_api = caches_api
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._contexts: dict[tuple[str, str], CachedContext] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        # Keys gemini refused to cache, not retried on every call
+        self.retry_failed_after_seconds = retry_failed_after_seconds
+        self._failed_at: dict[tuple[str, str], float] = {}
+
+        # Metrics
+        self._requests = 0
+        self._creations = 0
+        self._refreshes = 0
+        self._failures = 0
+        self._prompt_tokens = 0
+        self._cached_tokens = 0
+
+    @property
+    def _ttl(self) -> str:
+        return f"{self.ttl_seconds}s"
+
+    async def _create(self, model: str, system_prompt: str, key: tuple[str, str]) -> CachedContext:
+        cache = await self._caches_api.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                display_name=f"system-{key[1][:12]}",
+                ttl=self._ttl
+            )
+        )
+        self._creations += 1
+        logger.info("Created gemini context cache", model=model, cache_name=cache.name)
+        return CachedContext(name=cache.name, model=model, prompt_hash=key[1], expires_at=time.time() + self.ttl_seconds)
+
+    async def _refresh(self, context: CachedContext) -> CachedContext:
+        await self._caches_api.update(name=context.name, config=types.UpdateCachedContentConfig(ttl=self._ttl))
+        self._refreshes += 1
+        logger.debug("Refreshed gemini context cache ttl", cache_name=context.name)
+        return context.model_copy(update={"expires_at": time.time() + self.ttl_seconds})
+
+    async def get_cache_name(self, model: str, system_prompt: str) -> str | None:
+        """
+        The name of a live cache holding this system prompt for this model
+
+        Returns:
+            The cache name to pass as cached_content, None if one couldnt be made
+            (eg the prompt is under gemini's minimum cacheable size), callers then
+            send the system prompt uncached
+        """
+        self._requests += 1
+        key = (model, prompt_hash(system_prompt))
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            failed_at = self._failed_at.get(key)
+            if failed_at is not None and time.time() - failed_at < self.retry_failed_after_seconds:
+                return None
+
+            context = self._contexts.get(key)
+            try:
+                if context is None or context.expires_at <= time.time():
+                    context = await self._create(model, system_prompt, key)
+                elif context.expires_at - time.time() < self.refresh_margin_seconds:
+                    try:
+                        context = await self._refresh(context)
+                    except Exception as e:
+                        # Expired or deleted on gemini's side, start a fresh one
+                        logger.warning("Failed to refresh gemini context cache, recreating", cache_name=context.name, error=str(e))
+                        context = await self._create(model, system_prompt, key)
+
+            except Exception as e:
+                self._failures += 1
+                self._contexts.pop(key, None)
+                self._failed_at[key] = time.time()
+                logger.warning("Failed to create gemini context cache", model=model, error=str(e))
+                return None
+
+            self._failed_at.pop(key, None)
+            self._contexts[key] = context
+            return context.name
+
+    def record_usage(self, usage_metadata):
+        """Track how many prompt tokens were served from a cache"""
+        if usage_metadata is None:
+            return
+        self._prompt_tokens += usage_metadata.prompt_token_count or 0
+        self._cached_tokens += usage_metadata.cached_content_token_count or 0
+
+    def metrics(self) -> ContextCacheMetrics:
+        return ContextCacheMetrics(
+            requests=self._requests,
+            creations=self._creations,
+            refreshes=self._refreshes,
+            failures=self._failures,
+            prompt_tokens=self._prompt_tokens,
+            cached_tokens=self._cached_tokens,
+        )
@@ -0,0 +1,163 @@
+import hashlib
+import re
+from collections import OrderedDict
+import numpy as np
+import structlog
+from pydantic import BaseModel
+
+from product_agent.models.scraper import ScraperSynthesisResponse
+
+logger = structlog.get_logger(__name__)
+
+# Universal hashing over 32 bit shingle hashes, a * h + b stays inside uint64
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_LINK_TARGET = re.compile(r"\]\([^)]*\)")
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalise_markdown(markdown: str) -> str:
+    """Lowercase words only, link targets, punctuation and layout stripped"""
+    text = _LINK_TARGET.sub("]", markdown.lower())
+    text = _NON_WORD.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+class MarkdownSignature(BaseModel):
+    """Exact hash and minhash signature of a cleaned page"""
+    exact_hash:     str
+    minhash:        list[int]
+
+class MarkdownCacheStats(BaseModel):
+    exact_hits:     int = 0
+    near_hits:      int = 0
+    misses:         int = 0
+
+class MarkdownExtractionCache:
+    """
+    Reuse ScraperSynthesisResponse's for pages we've already analysed
+
+    Two tiers:
+    - exact, a hash of the normalised markdown catches re-scrapes of the same page
+    - near duplicate, minhash over word shingles with LSH banding catches the same
+      product copy on another retailer with different chrome around it, a
+      candidate is only reused when its estimated jaccard similarity is at least
+      threshold
+
+    Bounded to max_entries, least recently used pages are evicted first
+    """
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        max_entries: int = 5000,
+        seed: int = 7
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must divide evenly into bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._entries: OrderedDict[str, tuple[np.ndarray, ScraperSynthesisResponse]] = OrderedDict()
+        self._buckets: dict[tuple[int, bytes], set[str]] = {}
+        self.stats = MarkdownCacheStats()
+
+    def _shingle_hashes(self, normalised: str) -> np.ndarray:
+        words = normalised.split(" ")
+        if len(words) < self.shingle_size:
+            shingles = {normalised}
+        else:
+            shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+
+    def signature(self, markdown: str) -> MarkdownSignature:
+        normalised = normalise_markdown(markdown)
+        hashes = self._shingle_hashes(normalised)
+        # (num_perm, shingles) permuted hashes, the column minimum is the signature
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        minhash = permuted.min(axis=1) if hashes.size else np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        return MarkdownSignature(
+            exact_hash=hashlib.sha256(normalised.encode("utf-8")).hexdigest(),
+            minhash=minhash.tolist()
+        )
+
+    def similarity(self, first: MarkdownSignature, second: MarkdownSignature) -> float:
+        """Estimated jaccard similarity of two pages shingles"""
+        if first.exact_hash == second.exact_hash:
+            return 1.0
+        return float(np.mean(np.asarray(first.minhash, dtype=np.uint64) == np.asarray(second.minhash, dtype=np.uint64)))
+
+    def _band_keys(self, minhash: np.ndarray) -> list[tuple[int, bytes]]:
+        return [
+            (band, minhash[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, signature: MarkdownSignature) -> ScraperSynthesisResponse | None:
+        """An earlier analysis of this page or a near duplicate of it"""
+        entry = self._entries.get(signature.exact_hash)
+        if entry is not None:
+            self._entries.move_to_end(signature.exact_hash)
+            self.stats.exact_hits += 1
+            return entry[1]
+
+        minhash = np.asarray(signature.minhash, dtype=np.uint64)
+        candidates = set()
+        for band_key in self._band_keys(minhash):
+            candidates |= self._buckets.get(band_key, set())
+
+        best_key, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = float(np.mean(self._entries[key][0] == minhash))
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+
+        if best_key is not None and best_similarity >= self.threshold:
+            self._entries.move_to_end(best_key)
+            self.stats.near_hits += 1
+            logger.debug("Near duplicate markdown reused", similarity=round(best_similarity, 3))
+            return self._entries[best_key][1]
+
+        self.stats.misses += 1
+        return None
+
+    def _evict(self, key: str):
+        minhash, _ = self._entries.pop(key)
+        for band_key in self._band_keys(minhash):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def store(self, signature: MarkdownSignature, response: ScraperSynthesisResponse):
+        key = signature.exact_hash
+        if key in self._entries:
+            self._evict(key)
+
+        minhash = np.asarray(signature.minhash, dtype=np.uint64)
+        self._entries[key] = (minhash, response)
+        for band_key in self._band_keys(minhash):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,149 @@
+import re
+from functools import lru_cache
+import structlog
+import tiktoken
+from pydantic import BaseModel
+
+logger = structlog.get_logger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 16_000
+# Rough english average, only used when the tiktoken encoding cant be loaded
+CHARS_PER_TOKEN = 4
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4)
+def _encoding(encoding_name: str) -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # tiktoken downloads encodings on first use, offline boxes estimate instead
+        logger.warning("Tokenizer unavailable, estimating tokens from length", encoding=encoding_name, error=str(e))
+        return None
+
+class TokenCounter:
+    """
+    Counts prompt tokens locally with tiktoken
+
+    o200k_base is the gpt-4o family encoding, close enough to budget gemini
+    prompts with too
+    """
+    def __init__(self, encoding_name: str = "o200k_base"):
+        self.encoding_name = encoding_name
+
+    def count(self, text: str) -> int:
+        encoding = _encoding(self.encoding_name)
+        if encoding is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return ""
+
+        encoding = _encoding(self.encoding_name)
+        if encoding is None:
+            return text[:max_tokens * CHARS_PER_TOKEN]
+
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+class PromptSection(BaseModel):
+    """
+    One block of a prompt
+
+    Sections without a trim_priority are always sent whole, the rest are
+    trimmed lowest priority first when the prompt is over budget
+    """
+    name:           str
+    text:           str
+    trim_priority:  int | None = None
+
+class AssembledPrompt(BaseModel):
+    text:           str
+    total_tokens:   int
+    budget:         int
+    section_tokens: dict[str, int]
+    trimmed:        list[str]
+
+TRIMMED_MARKER = "\n[... trimmed to fit the prompt budget]"
+
+def assemble_prompt(sections: list[PromptSection], budget: int, process: str, counter: TokenCounter | None = None) -> AssembledPrompt:
+    """
+    Join sections into one prompt that fits in budget tokens
+
+    Sections are cut down lowest trim_priority first until the prompt fits,
+    a required section is never touched so a prompt can still land over budget
+    """
+    counter = counter or TokenCounter()
+    texts = {section.name: section.text for section in sections}
+    tokens = {name: counter.count(text) for name, text in texts.items()}
+    # The blank lines between sections
+    separators = counter.count("\n\n") * max(len(sections) - 1, 0)
+    trimmed = []
+
+    trimmable = sorted((s for s in sections if s.trim_priority is not None), key=lambda s: s.trim_priority or 0)
+    for section in trimmable:
+        overflow = sum(tokens.values()) + separators - budget
+        if overflow <= 0:
+            break
+
+        keep = tokens[section.name] - overflow - counter.count(TRIMMED_MARKER)
+        texts[section.name] = counter.truncate(texts[section.name], keep) + TRIMMED_MARKER if keep > 0 else TRIMMED_MARKER.strip()
+        tokens[section.name] = counter.count(texts[section.name])
+        trimmed.append(section.name)
+
+    text = "\n\n".join(texts[section.name] for section in sections)
+    total_tokens = counter.count(text)
+    logger.info(
+        "Assembled prompt",
+        process=process,
+        total_tokens=total_tokens,
+        budget=budget,
+        section_tokens=tokens,
+        trimmed=trimmed,
+    )
+    if total_tokens > budget:
+        logger.warning("Prompt over budget after trimming", process=process, total_tokens=total_tokens, budget=budget)
+
+    return AssembledPrompt(
+        text=text,
+        total_tokens=total_tokens,
+        budget=budget,
+        section_tokens=tokens,
+        trimmed=trimmed
+    )
+
+def html_to_text(html: str | None, max_chars: int) -> str | None:
+    """Tags stripped and cut to max_chars, enough to show a products style"""
+    if html is None:
+        return None
+    text = _WHITESPACE.sub(" ", _HTML_TAG.sub(" ", html)).strip()
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+def compact_similar_products(similar_products: list, max_description_chars: int = 400) -> list[dict]:
+    """
+    Similar products as prompt material
+
+    Drops the vectors and shortens body_html, the model only needs the
+    store's naming, type and tag style from them
+    """
+    compact = []
+    for product in similar_products:
+        payload = getattr(product, "payload", None)
+        if payload is None:
+            payload = product if isinstance(product, dict) else {}
+
+        compact.append({
+            "title": payload.get("title"),
+            "product_type": payload.get("product_type"),
+            "vendor": payload.get("vendor"),
+            "tags": payload.get("tags"),
+            "description": html_to_text(payload.get("body_html"), max_description_chars),
+        })
+
+    return compact
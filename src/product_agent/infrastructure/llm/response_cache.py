@@ -0,0 +1,147 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+import structlog
+from pydantic import BaseModel, computed_field
+
+from product_agent.db.redis import KV_DB
+from ...models.llm_input import LLMInput
+
+logger = structlog.get_logger(__name__)
+
+class CallSiteStats(BaseModel):
+    """Hits and misses for one call site"""
+    call_site:      str
+    memory_hits:    int = 0
+    redis_hits:     int = 0
+    misses:         int = 0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.memory_hits + self.redis_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+class LLMResponseCache:
+    """
+    Content addressed cache of llm responses
+
+    Keyed by a hash of model, system query, user query and response schema so
+    only an identical call can hit. An in process LRU sits in front of an
+    optional redis tier shared by every worker, both expire after ttl_seconds
+    and the LRU is bounded to max_entries
+
+    Structured responses are stored as their pydantic json and validated back
+    into the schema on a hit, a value that no longer validates is a miss
+    """
+    def __init__(self, kv_db: KV_DB | None = None, max_entries: int = 1024, ttl_seconds: int = 7 * 24 * 3600, namespace: str = "llm_cache"):
+        self.kv_db = kv_db
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._stats: dict[str, CallSiteStats] = {}
+
+    def key(self, llm_input: LLMInput) -> str | None:
+        """The cache key for a call, None when the call cant be cached"""
+        if not isinstance(llm_input.user_query, str):
+            # Image parts and other rich content arent addressable by text
+            return None
+
+        schema = llm_input.response_schema
+        material = json.dumps({
+            "model": llm_input.model,
+            "system_query": llm_input.system_query,
+            "user_query": llm_input.user_query,
+            "response_schema": schema.model_json_schema() if schema else None,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _stat(self, call_site: str) -> CallSiteStats:
+        stat = self._stats.get(call_site)
+        if stat is None:
+            stat = CallSiteStats(call_site=call_site)
+            self._stats[call_site] = stat
+        return stat
+
+    def _remember(self, key: str, payload: str):
+        self._entries[key] = (time.time() + self.ttl_seconds, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _decode(payload: str, schema: type[BaseModel] | None) -> str | BaseModel | None:
+        envelope = json.loads(payload)
+        if envelope["kind"] == "model":
+            if schema is None:
+                return None
+            return schema.model_validate_json(envelope["data"])
+        return str(envelope["data"])
+
+    def get(self, key: str, schema: type[BaseModel] | None, call_site: str = "default") -> str | BaseModel | None:
+        """A cached response, None on a miss"""
+        stat = self._stat(call_site)
+        tier = "memory"
+        entry = self._entries.get(key)
+        payload = None
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                payload = None
+            else:
+                self._entries.move_to_end(key)
+
+        if payload is None and self.kv_db is not None:
+            tier = "redis"
+            try:
+                payload = self.kv_db.get_value(f"{self.namespace}:{key}")
+            except Exception as e:
+                logger.warning("LLM cache redis read failed", error=str(e))
+                payload = None
+
+        if payload is None:
+            stat.misses += 1
+            return None
+
+        try:
+            value = self._decode(payload, schema)
+        except Exception as e:
+            # Schema changed since it was cached, treat it as a miss and overwrite
+            logger.debug("Cached llm response no longer validates", call_site=call_site, error=str(e))
+            value = None
+
+        if value is None:
+            stat.misses += 1
+            return None
+
+        if tier == "redis":
+            self._remember(key, payload)
+            stat.redis_hits += 1
+        else:
+            stat.memory_hits += 1
+
+        logger.debug("LLM cache hit", call_site=call_site, tier=tier)
+        return value
+
+    def set(self, key: str, value: str | BaseModel):
+        if isinstance(value, BaseModel):
+            payload = json.dumps({"kind": "model", "data": value.model_dump_json()})
+        else:
+            payload = json.dumps({"kind": "text", "data": value})
+
+        self._remember(key, payload)
+        if self.kv_db is not None:
+            try:
+                self.kv_db.set_value(f"{self.namespace}:{key}", payload, ttl_seconds=self.ttl_seconds)
+            except Exception as e:
+                logger.warning("LLM cache redis write failed", error=str(e))
+
+    def stats(self) -> list[CallSiteStats]:
+        return list(self._stats.values())
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,255 @@
+import asyncio
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+import httpx
+import numpy as np
+import openai
+import structlog
+from pydantic import BaseModel
+
+from product_agent.models.image_transformer import ImageTransformer
+from .client import LLM, LLMError
+from ...models.llm_input import LLMInput
+
+logger = structlog.get_logger(__name__)
+
+TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError, httpx.TimeoutException, openai.APITimeoutError)
+
+def _status_code(error: BaseException) -> int | None:
+    """The http status of a provider error, openai uses status_code and google code"""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Timeouts, rate limits and provider side errors, the ones another model can fix"""
+    if isinstance(error, TIMEOUT_ERRORS):
+        return True
+
+    status_code = _status_code(error)
+    return status_code is not None and (status_code == 429 or 500 <= status_code < 600)
+
+class ModelLatencyStats(BaseModel):
+    """Rolling window health of one model"""
+    model:          str
+    requests:       int
+    errors:         int
+    samples:        int
+    p50_seconds:    float | None
+    p95_seconds:    float | None
+    error_rate:     float
+    degraded:       bool
+
+class RoutingDecisionCount(BaseModel):
+    process:        str
+    decision:       str
+    model:          str
+    count:          int
+
+class RouterMetrics(BaseModel):
+    models:         list[ModelLatencyStats]
+    decisions:      list[RoutingDecisionCount]
+
+class ModelHealthRegistry:
+    """
+    Rolling latency and error windows per model, shared by every router
+
+    A model whose error rate over the last window calls reaches
+    error_rate_threshold is marked degraded for cooldown_seconds, routers send
+    its traffic to their fallback until then and it comes back on a fresh window
+    """
+    def __init__(self, window: int = 200, min_samples: int = 20, error_rate_threshold: float = 0.5, cooldown_seconds: float = 60.0):
+        self.window = window
+        self.min_samples = min_samples
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._latencies: dict[str, deque[float]] = {}
+        # True where the call failed
+        self._outcomes: dict[str, deque[bool]] = {}
+        self._degraded_until: dict[str, float] = {}
+        self._requests: Counter[str] = Counter()
+        self._errors: Counter[str] = Counter()
+        self._decisions: Counter[tuple[str, str, str]] = Counter()
+
+    def _window(self, windows: dict[str, deque], model: str) -> deque:
+        window = windows.get(model)
+        if window is None:
+            window = deque(maxlen=self.window)
+            windows[model] = window
+        return window
+
+    def record_success(self, model: str, seconds: float):
+        self._requests[model] += 1
+        self._window(self._latencies, model).append(seconds)
+        self._window(self._outcomes, model).append(False)
+
+    def record_error(self, model: str):
+        self._requests[model] += 1
+        self._errors[model] += 1
+        outcomes = self._window(self._outcomes, model)
+        outcomes.append(True)
+
+        if len(outcomes) >= self.min_samples and self.error_rate(model) >= self.error_rate_threshold:
+            self._degraded_until[model] = time.monotonic() + self.cooldown_seconds
+            outcomes.clear()
+            logger.warning("Model degraded, shifting traffic to fallbacks", model=model, cooldown_seconds=self.cooldown_seconds)
+
+    def record_decision(self, process: str, decision: str, model: str):
+        self._decisions[(process, decision, model)] += 1
+        logger.debug("Routing decision", process=process, decision=decision, model=model)
+
+    def is_degraded(self, model: str) -> bool:
+        return self._degraded_until.get(model, 0.0) > time.monotonic()
+
+    def samples(self, model: str) -> int:
+        return len(self._latencies.get(model, ()))
+
+    def percentile(self, model: str, percentile: float) -> float | None:
+        latencies = self._latencies.get(model)
+        if not latencies:
+            return None
+        return float(np.percentile(latencies, percentile))
+
+    def error_rate(self, model: str) -> float:
+        outcomes = self._outcomes.get(model)
+        if not outcomes:
+            return 0.0
+        return sum(outcomes) / len(outcomes)
+
+    def stats(self, model: str) -> ModelLatencyStats:
+        return ModelLatencyStats(
+            model=model,
+            requests=self._requests[model],
+            errors=self._errors[model],
+            samples=self.samples(model),
+            p50_seconds=self.percentile(model, 50),
+            p95_seconds=self.percentile(model, 95),
+            error_rate=self.error_rate(model),
+            degraded=self.is_degraded(model),
+        )
+
+    def metrics(self) -> RouterMetrics:
+        return RouterMetrics(
+            models=[self.stats(model) for model in self._requests],
+            decisions=[
+                RoutingDecisionCount(process=process, decision=decision, model=model, count=count)
+                for (process, decision, model), count in self._decisions.items()
+            ]
+        )
+
+@dataclass
+class RouteTarget:
+    """A model and the client that serves it"""
+    client: LLM
+    model:  str
+
+class ModelRouter:
+    """
+    An LLM that routes one process between its primary and fallback model
+
+    - Timeouts, 429s and 5xx errors from the first model are retried on the other
+    - While the primary is degraded the fallback is tried first
+    - Once the first model has enough samples, a request still running after
+      its hedge_percentile latency is hedged on the other model and whichever
+      answers first wins
+
+    Decisions are recorded on the shared ModelHealthRegistry
+    """
+    def __init__(
+        self,
+        process: str,
+        primary: RouteTarget,
+        fallback: RouteTarget | None,
+        health: ModelHealthRegistry,
+        timeout_seconds: float = 120.0,
+        hedge_percentile: float | None = 95
+    ):
+        self.process = process
+        self.primary = primary
+        self.fallback = fallback
+        self.health = health
+        self.timeout_seconds = timeout_seconds
+        self.hedge_percentile = hedge_percentile
+
+    async def _call(self, target: RouteTarget, llm_input: LLMInput) -> str | BaseModel:
+        # Each target gets its own copy carrying its model
+        routed_input = llm_input.model_copy(update={"model": target.model})
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(target.client.invoke(routed_input), timeout=self.timeout_seconds)
+        except Exception as e:
+            if is_retryable_error(e):
+                self.health.record_error(target.model)
+            raise
+
+        self.health.record_success(target.model, time.perf_counter() - started)
+        return result
+
+    def _hedge_delay(self, target: RouteTarget) -> float | None:
+        if self.hedge_percentile is None or self.health.samples(target.model) < self.health.min_samples:
+            return None
+        return self.health.percentile(target.model, self.hedge_percentile)
+
+    async def _hedged(self, first: RouteTarget, second: RouteTarget, llm_input: LLMInput, hedge_after: float) -> str | BaseModel:
+        first_call = asyncio.create_task(self._call(first, llm_input))
+        done, _ = await asyncio.wait({first_call}, timeout=hedge_after)
+        if done:
+            return first_call.result()
+
+        self.health.record_decision(self.process, "hedged", second.model)
+        hedge_call = asyncio.create_task(self._call(second, llm_input))
+        pending = {first_call, hedge_call}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for call in done:
+                    if call.exception() is None:
+                        if call is hedge_call:
+                            self.health.record_decision(self.process, "hedge_won", second.model)
+                        return call.result()
+        finally:
+            for call in pending:
+                call.cancel()
+
+        # Both models have been tried, dont fall back again
+        raise LLMError(f"{first.model} and hedge {second.model} both failed") from first_call.exception()
+
+    async def invoke(self, llm_input: LLMInput) -> str | BaseModel:
+        first, second = self.primary, self.fallback
+        if second is not None and self.health.is_degraded(first.model):
+            first, second = second, first
+            self.health.record_decision(self.process, "shifted", first.model)
+        else:
+            self.health.record_decision(self.process, "primary", first.model)
+
+        hedge_after = None
+        if second is not None and not self.health.is_degraded(second.model):
+            hedge_after = self._hedge_delay(first)
+        try:
+            if hedge_after is None or second is None:
+                return await self._call(first, llm_input)
+            return await self._hedged(first, second, llm_input, hedge_after)
+
+        except Exception as e:
+            if second is None or not is_retryable_error(e):
+                raise
+
+            logger.warning("Model failed, using fallback", process=self.process, model=first.model, fallback=second.model, error=str(e))
+            self.health.record_decision(self.process, "fallback_on_error", second.model)
+            return await self._call(second, llm_input)
+
+    async def transform_for_images(self, data: ImageTransformer):
+        """
+        Image parts are shaped for the primary's provider
+
+        Not routed, the parts only fit the provider that built them so a
+        fallback on another provider couldnt take them. Counted as its own
+        decision so it still shows in the metrics
+        """
+        self.health.record_decision(self.process, "image_transform", self.primary.model)
+        return await self.primary.client.transform_for_images(data)
@@ -0,0 +1,111 @@
+import structlog
+from pydantic import BaseModel
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.utils.json import parse_partial_json
+
+from .utils import _parse_response
+
+logger = structlog.get_logger(__name__)
+
+class PartialResult(BaseModel):
+    """What a streamed structured response holds so far"""
+    partial:            dict
+    completed_fields:   list[str]
+    newly_completed:    list[str]
+    # Set on the last result once the whole response has been validated
+    final:              BaseModel | None = None
+
+class StreamingJsonParser:
+    """
+    Parses a streamed json object as it arrives
+
+    A top level field counts as completed once the comma after it (or the
+    closing brace) has streamed, so its value wont change anymore and callers
+    can act on it before the rest of the object is generated
+    """
+    def __init__(self, response_schema: type[BaseModel]):
+        self.output_parser = PydanticOutputParser(pydantic_object=response_schema)
+        self.text = ""
+        self.partial: dict = {}
+        self.completed_fields: list[str] = []
+
+        # Scanner state, only text after the first brace is scanned
+        self._scanned = 0
+        self._start: int | None = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._members_closed = 0
+        self._closed = False
+
+    def _scan(self):
+        for i in range(self._scanned, len(self.text)):
+            char = self.text[i]
+            if self._closed:
+                break
+
+            if self._start is None:
+                # Skip code fences or preamble before the object
+                if char == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._members_closed += 1
+                    self._closed = True
+            elif char == "," and self._depth == 1:
+                self._members_closed += 1
+
+        self._scanned = len(self.text)
+
+    def feed(self, chunk: str) -> PartialResult | None:
+        """Add a chunk, returns a result when a field has completed"""
+        self.text += chunk
+        self._scan()
+        if self._start is None:
+            return None
+
+        parsed = parse_partial_json(self.text[self._start:])
+        if isinstance(parsed, dict):
+            self.partial = parsed
+
+        completed = list(self.partial)[:self._members_closed]
+        newly_completed = completed[len(self.completed_fields):]
+        if not newly_completed:
+            return None
+
+        self.completed_fields = completed
+        return PartialResult(
+            partial=self.partial,
+            completed_fields=list(completed),
+            newly_completed=newly_completed
+        )
+
+    def finish(self) -> PartialResult:
+        """Validate the full response into the schema"""
+        final = _parse_response(llm_response=self.text, parser=self.output_parser)
+        completed = list(type(final).model_fields)
+        result = PartialResult(
+            partial=final.model_dump(mode="json"),
+            completed_fields=completed,
+            newly_completed=[field for field in completed if field not in self.completed_fields],
+            final=final
+        )
+        self.completed_fields = completed
+        return result
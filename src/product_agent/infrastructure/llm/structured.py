@@ -0,0 +1,65 @@
+import copy
+import re
+from functools import cache
+import structlog
+from pydantic import BaseModel
+
+logger = structlog.get_logger(__name__)
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+def _is_free_form_object(node: dict) -> bool:
+    """A dict field, strict mode needs every object's properties spelled out"""
+    return node.get("type") == "object" and ("properties" not in node or node.get("additionalProperties") not in (None, False))
+
+def supports_strict(json_schema: dict) -> bool:
+    """Whether openai's strict json_schema mode can express this schema"""
+    if isinstance(json_schema, dict):
+        if _is_free_form_object(json_schema):
+            return False
+        return all(supports_strict(value) for value in json_schema.values())
+    if isinstance(json_schema, list):
+        return all(supports_strict(value) for value in json_schema)
+    return True
+
+def _to_strict(node):
+    """Every object closed with all properties required, defaults and ref siblings dropped"""
+    if isinstance(node, dict):
+        if "$ref" in node:
+            # Strict mode rejects keywords alongside a reference
+            return {"$ref": node["$ref"]}
+        node = {key: _to_strict(value) for key, value in node.items() if key != "default"}
+        if node.get("type") == "object" and "properties" in node:
+            node["additionalProperties"] = False
+            node["required"] = list(node["properties"])
+        return node
+    if isinstance(node, list):
+        return [_to_strict(value) for value in node]
+    return node
+
+@cache
+def openai_response_format(response_schema: type[BaseModel]) -> dict:
+    """
+    The response_format for a schema, compiled once per model class
+
+    Strict when the schema allows it so the output is guaranteed to match,
+    otherwise the schema still guides generation and is validated on our side
+    """
+    json_schema = response_schema.model_json_schema()
+    strict = supports_strict(json_schema)
+    if strict:
+        json_schema = _to_strict(copy.deepcopy(json_schema))
+
+    logger.debug("Compiled response format", schema=response_schema.__name__, strict=strict)
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": response_schema.__name__,
+            "schema": json_schema,
+            "strict": strict,
+        }
+    }
+
+def parse_structured(content: str, response_schema: type[BaseModel]) -> BaseModel:
+    """Validate a native json response, tolerating a code fence around it"""
+    return response_schema.model_validate_json(_CODE_FENCE.sub("", content))
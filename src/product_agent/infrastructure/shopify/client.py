@@ -1,13 +1,32 @@
+import asyncio
 import datetime
+import json
 import structlog
 from pydantic import BaseModel
 import httpx
-from typing import Literal, Protocol
-from product_agent.models.shopify import DraftProduct, DraftResponse, Fields, AllShopifyProducts, ShopifyProductSchema
-from .types import Inventory, Inputs, SkuSearchResponse, Product
+from typing import Protocol
+from collections.abc import AsyncIterator
+from product_agent.models.shopify import DraftProduct, DraftResponse, Fields, ShopifyProductSchema
+from .types import Inventory, Inputs, SkuSearchResponse, InventoryItemResult, InventoryBatchResult
 from .exceptions import ShopifyError
+from .pool import ShopifyConnectionPool, shopify_pool
+from .sku_index import SkuIndex
 
 logger = structlog.get_logger(__name__)
+
+# Requested cost estimates used to reserve budget before a call is sent
+# the bucket is settled with shopify's actual cost once the response lands
+MUTATION_COST = 10
+VARIANT_SEARCH_COST = 3
+# first: 50 variants each with a nested product
+SKU_BATCH_SEARCH_COST = 102
+
+# Search terms OR'd into one productVariants query, keeps the query string well under shopify's limits
+SKUS_PER_SEARCH = 50
+
+# Batching limits for the inventory path
+ACTIVATION_ALIASES_PER_REQUEST = 25
+QUANTITIES_PER_REQUEST = 250
     
 class Shop(Protocol):
     """An interface with e-commerce methods """
@@ -17,12 +36,54 @@ class Shop(Protocol):
     def get_products_from_store(self, fields: Fields | None = None) -> list:
         ...
 
+    def stream_products_from_store(self, fields: Fields | None = None, page_size: int = 250, bulk: bool = False, updated_at_min: str | None = None) -> AsyncIterator[list[ShopifyProductSchema]]:
+        ...
+
     def fill_inventory(self, inventory_data: Inventory):
         ...
+
+    async def fill_inventories(self, inventory_data: list[Inventory]) -> InventoryBatchResult:
+        ...
     
     async def search_by_sku(self, sku: int) -> SkuSearchResponse | None:
         ...
 
+    async def search_by_skus(self, skus: list[int | str], barcodes: list[int | str] | None = None) -> dict[str, SkuSearchResponse] | None:
+        ...
+
+def bulk_product_to_rest(record: dict) -> dict:
+    """Shape a bulk export product line like the REST api so one schema parses both"""
+    tags = record.get("tags")
+    return {
+        "id": int(record["legacyResourceId"]) if record.get("legacyResourceId") else None,
+        "title": record.get("title"),
+        "body_html": record.get("bodyHtml"),
+        "vendor": record.get("vendor"),
+        "product_type": record.get("productType"),
+        "tags": ", ".join(tags) if isinstance(tags, list) else tags,
+        "status": record["status"].lower() if record.get("status") else None,
+        "updated_at": record.get("updatedAt"),
+        "variants": [],
+    }
+
+def bulk_variant_to_rest(record: dict, product_id: int | None) -> dict:
+    """Shape a bulk export variant line like the REST api"""
+    options = [option.get("value") for option in record.get("selectedOptions") or []]
+    inventory_item = record.get("inventoryItem") or {}
+    return {
+        "id": int(record["legacyResourceId"]) if record.get("legacyResourceId") else None,
+        "product_id": product_id,
+        "title": record.get("title"),
+        "price": record.get("price"),
+        "sku": record.get("sku"),
+        "barcode": record.get("barcode"),
+        "position": record.get("position"),
+        "inventory_item_id": int(inventory_item["legacyResourceId"]) if inventory_item.get("legacyResourceId") else None,
+        "option1": options[0] if len(options) > 0 else None,
+        "option2": options[1] if len(options) > 1 else None,
+        "option3": options[2] if len(options) > 2 else None,
+    }
+
 class Location(BaseModel):
     """A singular location"""
     name: str
@@ -47,7 +108,9 @@ class ShopifyClient:
         locations: Locations,
         access_token: str,
         shop_name: str,
-        api_version: str = "2024-10"
+        api_version: str = "2024-10",
+        pool: ShopifyConnectionPool | None = None,
+        sku_index: SkuIndex | None = None
     ):
         """Init the shopify class"""
         logger.debug("Initialising Shopify Client...")
@@ -58,19 +121,76 @@ class ShopifyClient:
         self.api_version = api_version
         self.rest_url = f"https://{shop_name}.myshopify.com/admin/api/{api_version}"
         self.graph_url = f"https://{shop_name}.myshopify.com/admin/api/{api_version}/graphql.json"
-        self._client = None
+        self._pool = pool if pool is not None else shopify_pool
+        # Local exact match index, the live api is only asked on a miss
+        self.sku_index = sku_index
         logger.info("Initialised Client From Concrete")
 
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        """The shops pooled HTTP client, shared across every job for this shop"""
+        return self._pool.get_client(self.shop_name)
+
+    @property
+    def _headers(self) -> dict:
+        return {
+            "X-Shopify-Access-Token": self.access_token,
+            "Content-Type": "application/json"
+        }
+
+    async def _graphql(self, query: str, variables: dict, requested_cost: float, max_retries: int = 3) -> httpx.Response:
+        """
+        Send a graphql call through the shops cost bucket
+
+        Waits for budget before sending, settles the bucket from
+        extensions.cost.throttleStatus and retries THROTTLED responses
+        once the bucket has restored enough
+        """
+        bucket = self._pool.bucket(self.shop_name)
+        attempt = 0
+        while True:
+            reserved = await bucket.acquire(requested_cost)
+            try:
+                response = await self._client.post(
+                    url=self.graph_url,
+                    headers=self._headers,
+                    json={"query": query, "variables": variables}
+                )
+            except Exception:
+                bucket.settle(reserved, None)
+                raise
+
+            if response.status_code != 200:
+                bucket.settle(reserved, None)
+                return response
+
+            response_dict = response.json()
+            extensions = response_dict.get("extensions")
+            errors = response_dict.get("errors") or []
+            throttled = any(
+                isinstance(error, dict) and error.get("extensions", {}).get("code") == "THROTTLED"
+                for error in errors
+            )
+            if not throttled or attempt >= max_retries:
+                bucket.settle(reserved, extensions)
+                return response
+
+            bucket.throttled(reserved, extensions)
+            wait = bucket.retry_after(requested_cost)
+            attempt += 1
+            logger.warning("Shopify graphql throttled, retrying", shop_name=self.shop_name, attempt=attempt, wait_seconds=round(wait, 3))
+            await asyncio.sleep(wait)
+
     async def __aenter__(self):
-        """Create HTTP client when entering context"""
-        logger.debug("Creating HTTP client for shop", shop_name=self.shop_name)
-        self._client = httpx.AsyncClient(timeout=30.0)
+        """
+        Kept for backwards compatibility
+
+        The transport is owned by the connection pool so there is nothing to open
+        """
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Close HTTP client when exiting context"""
-        logger.debug("Closing HTTP client for shop", shop_name=self.shop_name)
-        await self._client.aclose()
+        """The pool is closed by the app lifespan, not per job"""
         return False
 
     async def make_a_product_draft(self, product_listing: DraftProduct) -> DraftResponse:
@@ -118,10 +238,7 @@ class ShopifyClient:
         }
 
         # Make REST API call
-        headers = {
-            "X-Shopify-Access-Token": self.access_token,
-            "Content-Type": "application/json"
-        }
+        headers = self._headers
 
         response = await self._client.post(
             f"{self.rest_url}/products.json",
@@ -206,18 +323,13 @@ mutation InventoryActivateAtLocation($inventoryItemId: ID!, $locationId: ID!) {
 
         inventory_item_id = f"gid://shopify/InventoryItem/{inventory_item_id}" if "gid://shopify/InventoryItem/" not in inventory_item_id else inventory_item_id
 
-        headers = {
-            "X-Shopify-Access-Token": self.access_token,
-            "Content-Type": "application/json"
-        }
-
         for location in self.locations.locations:
             variables = {
                 "inventoryItemId": inventory_item_id,
                 "locationId": location.id,
             }
 
-            response = await self._client.post(url=self.graph_url, headers=headers, json={"query": mutation, "variables": variables})
+            response = await self._graphql(mutation, variables, requested_cost=MUTATION_COST)
             if response.status_code != 200:
                 logger.error("incorrect status code %s", response.status_code)
                 return False
@@ -234,18 +346,89 @@ mutation InventoryActivateAtLocation($inventoryItemId: ID!, $locationId: ID!) {
         return True
 
     async def fill_inventory(self, inventory_data: Inventory) -> bool:
-        """Hitting the inventory api"""
-        logger.debug("Starting inventory service for request - product_id: %s, stores_changing: %s", inventory_data.inventory_item_id, [stores.name_of_store for stores in inventory_data.stores])
+        """Hitting the inventory api for a single inventory item"""
+        result = await self.fill_inventories(inventory_data=[inventory_data])
+        item = result.items[0]
+        if not item.succeeded:
+            raise ShopifyError(f"Failed to fill inventory for {item.inventory_item_id}: {item.errors}")
+
+        return True
+
+    def _inventory_item_gid(self, inventory_item_id: str) -> str:
+        return inventory_item_id if inventory_item_id.startswith("gid://") else f"gid://shopify/InventoryItem/{inventory_item_id}"
+
+    def _location_gid(self, location_id: str) -> str:
+        return location_id if location_id.startswith("gid://") else f"gid://shopify/Location/{location_id}"
+
+    async def _activate_inventory_items(self, results: dict[str, InventoryItemResult]):
+        """
+        Activate every item at every location
+
+        One aliased inventoryBulkToggleActivation per item, chunked so each
+        request stays well inside the graphql cost budget
+        """
+        location_updates = [
+            {"locationId": self._location_gid(location.id), "activate": True}
+            for location in self.locations.locations
+        ]
+        item_ids = list(results.keys())
+
+        for start in range(0, len(item_ids), ACTIVATION_ALIASES_PER_REQUEST):
+            chunk = item_ids[start:start + ACTIVATION_ALIASES_PER_REQUEST]
+            variable_defs = ["$updates: [InventoryBulkToggleActivationInput!]!"]
+            fields = []
+            variables: dict = {"updates": location_updates}
+            for idx, item_id in enumerate(chunk):
+                variable_defs.append(f"$item{idx}: ID!")
+                variables[f"item{idx}"] = self._inventory_item_gid(item_id)
+                fields.append(f"""
+  item{idx}: inventoryBulkToggleActivation(inventoryItemId: $item{idx}, inventoryItemUpdates: $updates) {{
+    inventoryItem {{
+      id
+    }}
+    userErrors {{
+      field
+      message
+    }}
+  }}""")
+
+            mutation = f"mutation ActivateInventoryItems({', '.join(variable_defs)}) {{{''.join(fields)}\n}}"
+            response = await self._graphql(mutation, variables, requested_cost=MUTATION_COST * len(chunk))
+            if response.status_code != 200:
+                logger.error("Bad inventory activation status code", status_code=response.status_code, body=response.text)
+                for item_id in chunk:
+                    results[item_id].errors.append(f"Activation request failed with status code {response.status_code}")
+                continue
+
+            response_dict = response.json()
+            errors = response_dict.get("errors", None)
+            if errors:
+                logger.error("GraphQL errors activating inventory", errors=errors)
+                for item_id in chunk:
+                    results[item_id].errors.append(f"GraphQL errors: {errors}")
+                continue
+
+            data = response_dict.get("data") or {}
+            for idx, item_id in enumerate(chunk):
+                activation = data.get(f"item{idx}") or {}
+                user_errors = activation.get("userErrors", [])
+                if user_errors:
+                    results[item_id].errors.extend(error.get("message", str(error)) for error in user_errors)
+                    continue
 
+                results[item_id].activated = activation.get("inventoryItem") is not None
+
+    async def _set_inventory_quantities(self, inventory_data: list[Inventory], results: dict[str, InventoryItemResult]):
+        """
+        Set every item x location quantity with as few inventorySetQuantities calls as possible
+
+        userErrors point at the failing quantity by index, we map them back to the item
+        """
         mutation = """
 mutation InventorySet($input: InventorySetQuantitiesInput!) {
   inventorySetQuantities(input: $input) {
     inventoryAdjustmentGroup {
       reason
-      changes {
-        name
-        delta
-      }
     }
     userErrors {
       field
@@ -254,120 +437,326 @@ mutation InventorySet($input: InventorySetQuantitiesInput!) {
   }
 }
 """
-        headers = {
-            "X-Shopify-Access-Token": self.access_token,
-            "Content-Type": "application/json"
-        }
-
-        made_available_at_all = await self.make_available_at_all_locations(inventory_item_id=inventory_data.inventory_item_id)
-        if not made_available_at_all:
-            return
-
-        logger.debug("Result Of Making Stores Available: %s", made_available_at_all)
-
-        for inventory in inventory_data.stores:
-            # Get the actual location ID from the location name
-            location_id = self.locations_map.get(inventory.name_of_store)
-            if not location_id:
-                raise ShopifyError(f"Location '{inventory.name_of_store}' not found in locations map")
+        quantities = []
+        quantity_owners = []
+        for inventory in inventory_data:
+            result = results[inventory.inventory_item_id]
+            if not result.activated:
+                continue
 
-            # Ensure product_id and location_id are in GID format
-            inventory_item_gid = inventory_data.inventory_item_id if inventory_data.inventory_item_id.startswith("gid://") else f"gid://shopify/InventoryItem/{inventory_data.inventory_item_id}"
-            location_gid = location_id if location_id.startswith("gid://") else f"gid://shopify/Location/{location_id}"
+            if not inventory.stores:
+                # Nothing asked for, activation alone completes the item
+                result.quantities_set = True
+                continue
 
+            for store in inventory.stores:
+                location_id = self.locations_map.get(store.name_of_store)
+                if not location_id:
+                    result.errors.append(f"Location '{store.name_of_store}' not found in locations map")
+                    continue
+
+                quantities.append({
+                    "inventoryItemId": self._inventory_item_gid(inventory.inventory_item_id),
+                    "locationId": self._location_gid(location_id),
+                    "quantity": store.inventory_number
+                })
+                quantity_owners.append(inventory.inventory_item_id)
+
+        for start in range(0, len(quantities), QUANTITIES_PER_REQUEST):
+            chunk = quantities[start:start + QUANTITIES_PER_REQUEST]
+            owners = quantity_owners[start:start + QUANTITIES_PER_REQUEST]
             variables = {
                 "input": {
                     "reason": "received",
                     "name": "available",
                     "ignoreCompareQuantity": True,
-                    "quantities": [
-                        {
-                            "inventoryItemId": inventory_item_gid,
-                            "locationId": location_gid,
-                            "quantity": inventory.inventory_number
-                        }
-                    ]
+                    "quantities": chunk
                 }
             }
 
-            response = await self._client.post(url=self.graph_url, json={"query": mutation, "variables": variables}, headers=headers)
+            response = await self._graphql(mutation, variables, requested_cost=MUTATION_COST)
+            failed_request = None
             if response.status_code != 200:
-                logger.error("Response for store %s - Status Code: %s, Body: %s", inventory.name_of_store, response.status_code, response.json(), exc_info=True)
-                raise ShopifyError(f"Bad inventory request status_code {response.status_code}")
+                failed_request = f"Bad inventory request status_code {response.status_code}"
+            else:
+                response_dict = response.json()
+                logger.debug("Response of batched inventorySetQuantities", response=response_dict, quantities=len(chunk))
+                if response_dict.get("errors"):
+                    failed_request = f"GraphQL errors: {response_dict['errors']}"
+
+            if failed_request:
+                logger.error("Batched inventory set failed", error=failed_request)
+                for owner in set(owners):
+                    results[owner].errors.append(failed_request)
+                continue
 
-            response_dict = response.json()
-            logger.debug("Response Of Query At Location", location=inventory.name_of_store, response=response_dict)
+            inventory_set_result = (response_dict.get("data") or {}).get("inventorySetQuantities") or {}
+            failed_owners = set()
+            for user_error in inventory_set_result.get("userErrors", []):
+                field = user_error.get("field") or []
+                # field looks like ["input", "quantities", "3", "locationId"]
+                index = next((int(part) for part in field if str(part).isdigit()), None)
+                if index is not None and index < len(owners):
+                    owner = owners[index]
+                    results[owner].errors.append(user_error.get("message", str(user_error)))
+                    failed_owners.add(owner)
+                    continue
+
+                # An error we cant place fails every item in the call
+                for owner in set(owners):
+                    results[owner].errors.append(user_error.get("message", str(user_error)))
+                    failed_owners.add(owner)
+
+            for owner in set(owners) - failed_owners:
+                results[owner].quantities_set = True
+
+    async def fill_inventories(self, inventory_data: list[Inventory]) -> InventoryBatchResult:
+        """
+        Batched inventory path for a whole product
 
-            # Check for GraphQL errors
-            errors = response_dict.get("errors", None)
-            if errors:
-                logger.error("GraphQL errors for store %s: %s", inventory.name_of_store, errors, exc_info=True)
-                raise ShopifyError(f"GraphQL errors: {errors}")
+        Activates every item at every location and sets every item x location
+        quantity in as few graphql mutations as possible, results are reported
+        per item so partial failures stay visible
+        """
+        logger.debug("Starting fill_inventories", items=len(inventory_data))
+        results: dict[str, InventoryItemResult] = {
+            inventory.inventory_item_id: InventoryItemResult(inventory_item_id=inventory.inventory_item_id)
+            for inventory in inventory_data
+        }
+        if not results:
+            return InventoryBatchResult(items=[])
 
-            data = response_dict.get("data", {})
-            inventory_set_result = data.get("inventorySetQuantities", {})
-            logger.debug("Set Inventory", inventory_set_result=inventory_set_result, name_of_store=inventory.name_of_store)
-            user_errors = inventory_set_result.get("userErrors", [])
-            if user_errors:
-                logger.error("User errors for store %s: %s", inventory.name_of_store, user_errors, exc_info=True)
-                raise ShopifyError(f"User errors: {user_errors}")
+        await self._activate_inventory_items(results)
+        await self._set_inventory_quantities(inventory_data, results)
 
-            logger.info("Completed request for store: %s, request_data: %s", inventory.name_of_store, response_dict)
+        batch_result = InventoryBatchResult(items=list(results.values()))
+        logger.info("Completed fill_inventories", items=len(batch_result.items), failed=len(batch_result.failed()))
+        return batch_result
 
-        return True
+    def _next_page_url(self, link_header: str) -> str | None:
+        """Parse the Link header for rel="next" """
+        if not link_header:
+            return None
 
-    async def get_products_from_store(self, fields: Fields | None = None) -> list:
-        """Get all the products from a store with specific tags"""
-        try:
-            all_products = []
+        for link in link_header.split(","):
+            if 'rel="next"' in link:
+                # Extract URL from <...>
+                return link.split(";")[0].strip()[1:-1]
 
-            logger.debug("Sending with fields", fields=fields)
+        return None
 
-            # Build query parameters
-            params = {"limit": 250}
-            if fields is not None:
-                params["fields"] = fields.shopify_transform_fields()
+    async def _get_products_page(self, url: str, params: dict | None) -> tuple[list[dict], str | None]:
+        """Fetch one REST page of products, returns the raw products and the next page url"""
+        response = await self._client.get(url, headers=self._headers, params=params)
+        if response.status_code != 200:
+            logger.error("Failed to get products", status_code=response.status_code, response=response.text)
+            raise ShopifyError(f"Failed to get products page: {response.status_code}")
 
-            headers = {
-                "X-Shopify-Access-Token": self.access_token,
-                "Content-Type": "application/json"
-            }
+        products = response.json().get("products", [])
+        return products, self._next_page_url(response.headers.get("Link", ""))
 
-            url = f"{self.rest_url}/products.json"
+    async def stream_products_from_store(
+        self,
+        fields: Fields | None = None,
+        page_size: int = 250,
+        bulk: bool = False,
+        updated_at_min: str | None = None
+    ) -> AsyncIterator[list[ShopifyProductSchema]]:
+        """
+        Yield validated products from the store a page at a time
 
-            # Pagination loop
-            while url:
-                response = await self._client.get(url, headers=headers, params=params if url == f"{self.rest_url}/products.json" else None)
+        The next page is fetched while the caller works on the current one
+        so fetching overlaps with downstream work like embedding, only a page
+        or two of the catalogue is ever held in memory
 
-                if response.status_code != 200:
-                    logger.error("Failed to get products", status_code=response.status_code, response=response.text)
-                    return None
+        Args:
+            fields: Which product fields the REST api should return
+            page_size: Products per page, 250 is the REST maximum
+            bulk: Use a Shopify bulk operation (JSONL export), for very large stores
+            updated_at_min: Only products changed at or after this ISO timestamp
+        """
+        if bulk:
+            async for page in self._stream_products_bulk(page_size=page_size, updated_at_min=updated_at_min):
+                yield page
+            return
 
-                response_data = response.json()
-                products = response_data.get("products", [])
+        logger.debug("Streaming products with fields", fields=fields, page_size=page_size)
+        params: dict[str, int | str] = {"limit": min(page_size, 250)}
+        if fields is not None:
+            params["fields"] = fields.shopify_transform_fields()
+        if updated_at_min is not None:
+            params["updated_at_min"] = updated_at_min
 
+        next_page: asyncio.Task[tuple[list[dict], str | None]] | None = asyncio.create_task(self._get_products_page(f"{self.rest_url}/products.json", params))
+        pages = 0
+        try:
+            while next_page is not None:
+                products, next_url = await next_page
+                # Page info urls carry their own params
+                next_page = asyncio.create_task(self._get_products_page(next_url, None)) if next_url and products else None
                 if not products:
                     break
 
-                all_products.extend(products)
+                pages += 1
+                yield [ShopifyProductSchema.from_rest_api(product) for product in products]
+        finally:
+            # The caller stopped early, dont leave a fetch running
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
+        logger.info("Finished streaming products", pages=pages)
+
+    async def _run_bulk_products_query(self, updated_at_min: str | None = None) -> str | None:
+        """Start a bulk export of every product and variant, returns the bulk operation id"""
+        mutation = """
+mutation RunBulkProductExport($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation {
+      id
+      status
+    }
+    userErrors {
+      field
+      message
+    }
+  }
+}
+"""
+        # Search syntax inside the bulk query, eg products(query: "updated_at:>='2024-01-01T00:00:00Z'")
+        products_args = f'(query: "updated_at:>=\'{updated_at_min}\'")' if updated_at_min else ""
+        bulk_query = "\n{\n  products" + products_args + """ {
+    edges {
+      node {
+        id
+        legacyResourceId
+        title
+        bodyHtml
+        vendor
+        productType
+        tags
+        status
+        updatedAt
+        variants {
+          edges {
+            node {
+              id
+              legacyResourceId
+              title
+              price
+              sku
+              barcode
+              position
+              inventoryItem {
+                legacyResourceId
+              }
+              selectedOptions {
+                name
+                value
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+        response = await self._graphql(mutation, {"query": bulk_query}, requested_cost=MUTATION_COST)
+        if response.status_code != 200:
+            raise ShopifyError(f"Failed to start bulk export: {response.status_code}")
+
+        result = (response.json().get("data") or {}).get("bulkOperationRunQuery") or {}
+        user_errors = result.get("userErrors", [])
+        if user_errors:
+            raise ShopifyError(f"Bulk export rejected: {user_errors}")
+
+        return (result.get("bulkOperation") or {}).get("id")
+
+    async def _wait_for_bulk_operation(self, poll_interval: float) -> str | None:
+        """Poll the current bulk operation until it finishes, returns the JSONL url"""
+        query = """
+query CurrentBulkOperation {
+  currentBulkOperation(type: QUERY) {
+    id
+    status
+    errorCode
+    objectCount
+    url
+  }
+}
+"""
+        while True:
+            response = await self._graphql(query, {}, requested_cost=VARIANT_SEARCH_COST)
+            if response.status_code != 200:
+                raise ShopifyError(f"Failed to poll bulk export: {response.status_code}")
+
+            operation = (response.json().get("data") or {}).get("currentBulkOperation") or {}
+            status = operation.get("status")
+            logger.debug("Bulk export status", status=status, object_count=operation.get("objectCount"))
+            if status == "COMPLETED":
+                # url is None when the store has no products
+                return operation.get("url")
 
-                # Check for next page via Link header
-                link_header = response.headers.get("Link", "")
-                next_url = None
+            if status in ("FAILED", "CANCELED", "EXPIRED"):
+                raise ShopifyError(f"Bulk export {status}: {operation.get('errorCode')}")
 
-                if link_header:
-                    # Parse Link header for rel="next"
-                    links = link_header.split(",")
-                    for link in links:
-                        if 'rel="next"' in link:
-                            # Extract URL from <...>
-                            next_url = link.split(";")[0].strip()[1:-1]
-                            break
+            await asyncio.sleep(poll_interval)
 
-                url = next_url
+    async def _stream_products_bulk(self, page_size: int, poll_interval: float = 2.0, updated_at_min: str | None = None) -> AsyncIterator[list[ShopifyProductSchema]]:
+        """
+        Bulk operations mode for very large stores
+
+        Shopify builds a JSONL file of the catalogue, we stream it line by line
+        variants follow their product with a __parentId so a product is complete
+        as soon as the next product line arrives
+        """
+        operation_id = await self._run_bulk_products_query(updated_at_min=updated_at_min)
+        logger.info("Started bulk product export", operation_id=operation_id)
+        url = await self._wait_for_bulk_operation(poll_interval=poll_interval)
+        if url is None:
+            return
+
+        # Raw products of the page being built, keyed by gid so variants find their parent
+        page_records: dict[str, dict] = {}
+        # The JSONL url is pre signed, shopify auth headers are not wanted
+        async with self._client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise ShopifyError(f"Failed to download bulk export: {response.status_code}")
+
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                parent_id = record.get("__parentId")
+                if parent_id is not None:
+                    parent = page_records.get(parent_id)
+                    if parent is None:
+                        logger.warning("Bulk export variant arrived after its product page was flushed", parent_id=parent_id)
+                        continue
+
+                    parent["variants"].append(bulk_variant_to_rest(record, product_id=parent["id"]))
+                    continue
+
+                # Children follow their parent, a full page is complete once the next product starts
+                if len(page_records) >= page_size:
+                    yield [ShopifyProductSchema.from_rest_api(product) for product in page_records.values()]
+                    page_records = {}
+
+                page_records[record["id"]] = bulk_product_to_rest(record)
+
+        if page_records:
+            yield [ShopifyProductSchema.from_rest_api(product) for product in page_records.values()]
+
+    async def get_products_from_store(self, fields: Fields | None = None) -> list:
+        """Get all the products from a store with specific tags"""
+        try:
+            all_products = []
+            async for page in self.stream_products_from_store(fields=fields):
+                all_products.extend(page)
 
             logger.info("Successfully got all the products", length_product=len(all_products))
-            return [ShopifyProductSchema.from_rest_api(product) for product in all_products]
+            return all_products
 
         except Exception as e:
             logger.error("failed to get shopify products", error=e, exc_info=True)
@@ -376,6 +765,11 @@ mutation InventorySet($input: InventorySetQuantitiesInput!) {
     async def search_by_sku(self, sku: int) -> SkuSearchResponse | None:
         """Function that enables sku searching in your shop"""
         logger.debug("Starting search_by_sku", sku=sku)
+        if self.sku_index is not None:
+            indexed = self.sku_index.lookup_sku(sku)
+            if indexed is not None:
+                logger.debug("search_by_sku served from the sku index", sku=sku)
+                return indexed
         query = """
 query SearchVariantBySku($q: String!) {
     productVariants(first: 1, query: $q) {
@@ -395,20 +789,11 @@ query SearchVariantBySku($q: String!) {
 }
         """
 
-        headers = {
-            "X-Shopify-Access-Token": self.access_token,
-            "Content-Type": "application/json"
-        }
-
         variables = {
             "q": f'sku:"{sku}"'
         }
 
-        response = await self._client.post(
-            url=self.graph_url,
-            headers=headers,
-            json={"query": query, "variables": variables}
-        )
+        response = await self._graphql(query, variables, requested_cost=VARIANT_SEARCH_COST)
 
         if response.status_code != 200:
             logger.error("Failed to search by SKU", sku=sku, status_code=response.status_code)
@@ -428,5 +813,119 @@ query SearchVariantBySku($q: String!) {
             return None
 
         node = edges[0].get("node")
-        return SkuSearchResponse(**node) if node else None
+        if not node:
+            return None
+
+        match = SkuSearchResponse(**node)
+        if self.sku_index is not None:
+            self.sku_index.record(match)
+        return match
+
+    async def _search_variants_page(self, search: str, cursor: str | None) -> tuple[list[dict], str | None]:
+        """One page of a productVariants search, returns the nodes and the next cursor"""
+        query = """
+query SearchVariants($q: String!, $cursor: String) {
+    productVariants(first: 50, query: $q, after: $cursor) {
+        edges {
+            node {
+                id
+                title
+                sku
+                barcode
+                price
+                product {
+                    id
+                    title
+                }
+            }
+        }
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+    }
+}
+        """
+
+        response = await self._graphql(query, {"q": search, "cursor": cursor}, requested_cost=SKU_BATCH_SEARCH_COST)
+        if response.status_code != 200:
+            raise ShopifyError(f"Failed to search variants: {response.status_code}")
+
+        response_dict = response.json()
+        errors = response_dict.get("errors", None)
+        if errors:
+            raise ShopifyError(f"GraphQL errors searching variants: {errors}")
+
+        variants = response_dict.get("data", {}).get("productVariants", {})
+        nodes = [edge["node"] for edge in variants.get("edges", []) if edge.get("node")]
+        page_info = variants.get("pageInfo", {})
+        next_cursor = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+        return nodes, next_cursor
+
+    async def search_by_skus(self, skus: list[int | str], barcodes: list[int | str] | None = None) -> dict[str, SkuSearchResponse] | None:
+        """
+        Check many skus and barcodes in a handful of requests
+
+        Terms are OR'd into one productVariants search per SKUS_PER_SEARCH terms
+        and every page is followed, rather than a round trip per sku
+
+        Returns:
+            Map of every searched sku or barcode that already exists to the variant it matched,
+            searched values missing from the map dont exist, None if the search failed
+        """
+        wanted_skus = {str(sku) for sku in skus if sku is not None and str(sku)}
+        wanted_barcodes = {str(barcode) for barcode in barcodes or [] if barcode is not None and str(barcode)}
+        logger.debug("Starting search_by_skus", skus=len(wanted_skus), barcodes=len(wanted_barcodes))
+
+        existing = {}
+        if self.sku_index is not None:
+            existing.update(self.sku_index.lookup_skus(list(wanted_skus)))
+            existing.update(self.sku_index.lookup_barcodes(list(wanted_barcodes)))
+
+            # Only misses and stale entries go to the live api
+            wanted_skus -= set(existing)
+            wanted_barcodes -= set(existing)
+            if not wanted_skus and not wanted_barcodes:
+                logger.info("Completed search_by_skus from the sku index", existing=len(existing))
+                return existing
+
+        terms = [f'sku:"{sku}"' for sku in sorted(wanted_skus)] + [f'barcode:"{barcode}"' for barcode in sorted(wanted_barcodes)]
+        searches = [
+            " OR ".join(terms[i:i + SKUS_PER_SEARCH])
+            for i in range(0, len(terms), SKUS_PER_SEARCH)
+        ]
+
+        async def run_search(search: str) -> list[dict]:
+            nodes = []
+            cursor = None
+            while True:
+                page, cursor = await self._search_variants_page(search, cursor)
+                nodes.extend(page)
+                if cursor is None:
+                    return nodes
+
+        try:
+            results = await asyncio.gather(*[run_search(search) for search in searches])
+        except ShopifyError as e:
+            logger.error("Failed search_by_skus", error=str(e))
+            return None
 
+        matches = []
+        for node in (node for nodes in results for node in nodes):
+            match = SkuSearchResponse(**node)
+            # shopify's search is fuzzy on some fields, only keep exact matches
+            matched = False
+            if match.sku in wanted_skus:
+                existing.setdefault(match.sku, match)
+                matched = True
+            if match.barcode and match.barcode in wanted_barcodes:
+                existing.setdefault(match.barcode, match)
+                matched = True
+            if matched:
+                matches.append(match)
+
+        if matches and self.sku_index is not None:
+            self.sku_index.record_many(matches)
+
+        logger.info("Completed search_by_skus", searched=len(terms), requests=len(searches), existing=len(existing))
+        return existing
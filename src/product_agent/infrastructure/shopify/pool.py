@@ -0,0 +1,90 @@
+import asyncio
+import httpx
+import structlog
+
+from .throttle import GraphQLCostBucket, ThrottleMetrics
+
+logger = structlog.get_logger(__name__)
+
+class ShopifyConnectionPool:
+    """
+    Long lived HTTP transports for shopify, one per shop
+
+    Every ShopifyClient for the same shop shares one httpx.AsyncClient
+    so TLS handshakes and keep-alive connections are reused across jobs
+    The shops graphql cost bucket lives here too so every job respects one budget
+    The app lifespan owns the pool and closes it on shutdown
+    """
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 30.0,
+        http2: bool = True,
+        verify: bool | str = True
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self.http2 = http2
+        self.verify = verify
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._buckets: dict[str, GraphQLCostBucket] = {}
+        self._lock = asyncio.Lock()
+
+    def get_client(self, shop_name: str) -> httpx.AsyncClient:
+        """Get the shops shared client, creating it on first use"""
+        client = self._clients.get(shop_name)
+        if client is not None and not client.is_closed:
+            return client
+
+        logger.debug("Creating pooled HTTP client for shop", shop_name=shop_name, http2=self.http2)
+        client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=self.limits,
+            timeout=self.timeout,
+            verify=self.verify
+        )
+        self._clients[shop_name] = client
+        return client
+
+    def bucket(self, shop_name: str) -> GraphQLCostBucket:
+        """Get the shops graphql cost bucket, creating it on first use"""
+        bucket = self._buckets.get(shop_name)
+        if bucket is None:
+            bucket = GraphQLCostBucket(shop_name=shop_name)
+            self._buckets[shop_name] = bucket
+        return bucket
+
+    def throttle_metrics(self) -> list[ThrottleMetrics]:
+        """Queue depth, wait time and budget for every shop"""
+        return [bucket.metrics() for bucket in self._buckets.values()]
+
+    async def close_shop(self, shop_name: str):
+        """Close a single shops transport, eg when a tenant is removed"""
+        async with self._lock:
+            client = self._clients.pop(shop_name, None)
+            if client is not None:
+                await client.aclose()
+                logger.info("Closed pooled HTTP client for shop", shop_name=shop_name)
+
+    async def aclose(self):
+        """Close every shops transport, called from the app lifespan"""
+        async with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+
+        for _, client in clients:
+            await client.aclose()
+
+        logger.info("Closed shopify connection pool", shops_closed=len(clients))
+
+    def __len__(self):
+        return len(self._clients)
+
+# Process wide pool, shared by every ShopifyClient unless one is injected
+shopify_pool = ShopifyConnectionPool()
@@ -0,0 +1,209 @@
+import json
+import time
+from collections.abc import Sequence
+import structlog
+from pydantic import BaseModel
+
+from product_agent.db.redis import KV_DB
+from product_agent.models.shopify import Fields, ShopifyProductSchema
+from .types import SkuSearchResponse, Product
+
+logger = structlog.get_logger(__name__)
+
+class SkuIndexEntry(BaseModel):
+    """Where a sku or barcode lives in the store"""
+    sku:            str | None
+    barcode:        str | None
+    variant_id:     str | None
+    product_id:     str | None
+    product_title:  str
+    indexed_at:     float
+
+    def to_search_response(self) -> SkuSearchResponse:
+        return SkuSearchResponse(
+            sku=self.sku or "",
+            barcode=self.barcode,
+            product=Product(title=self.product_title, id=self.product_id)
+        )
+
+class SkuIndex:
+    """
+    Exact match index from sku and barcode to the product and variant holding it
+
+    Redis hashes are the only copy so every worker, and the webhook consumer
+    writing to it, sees the same index. A lookup is one HMGET rather than an
+    admin api search, a third hash maps each product to its skus and barcodes
+    so removing a product doesnt scan the index.
+
+    Built once from the store with build and kept fresh by the incremental
+    catalogue sync, a miss or an entry older than max_age_seconds is left for
+    the caller to check against the live api
+    """
+    def __init__(self, kv_db: KV_DB, shop_name: str, max_age_seconds: float | None = None):
+        self.kv_db = kv_db
+        self.shop_name = shop_name
+        self.max_age_seconds = max_age_seconds
+
+    @property
+    def sku_database(self) -> str:
+        return f"sku_index:{self.shop_name}:skus"
+
+    @property
+    def barcode_database(self) -> str:
+        return f"sku_index:{self.shop_name}:barcodes"
+
+    @property
+    def product_database(self) -> str:
+        return f"sku_index:{self.shop_name}:products"
+
+    def _fresh(self, entry: SkuIndexEntry | None) -> SkuIndexEntry | None:
+        if entry is None:
+            return None
+        if self.max_age_seconds is not None and time.time() - entry.indexed_at > self.max_age_seconds:
+            return None
+        return entry
+
+    def _entries(self, database_name: str, keys: list[str]) -> dict[str, SkuIndexEntry]:
+        values = self.kv_db.hget_many(database_name, keys)
+        return {
+            key: SkuIndexEntry.model_validate_json(value)
+            for key, value in zip(keys, values, strict=True)
+            if value is not None
+        }
+
+    def _lookup(self, database_name: str, keys: list[int | str]) -> dict[str, SkuSearchResponse]:
+        entries = self._entries(database_name, list(dict.fromkeys(str(key) for key in keys)))
+        return {
+            key: entry.to_search_response()
+            for key, entry in entries.items()
+            if self._fresh(entry) is not None
+        }
+
+    def lookup_skus(self, skus: list[int | str]) -> dict[str, SkuSearchResponse]:
+        """The indexed variant of every sku that hit, misses and stale entries are left out"""
+        return self._lookup(self.sku_database, skus)
+
+    def lookup_barcodes(self, barcodes: list[int | str]) -> dict[str, SkuSearchResponse]:
+        """The indexed variant of every barcode that hit, misses and stale entries are left out"""
+        return self._lookup(self.barcode_database, barcodes)
+
+    def lookup_sku(self, sku: int | str) -> SkuSearchResponse | None:
+        """The indexed variant for a sku, None on a miss or a stale entry"""
+        return self.lookup_skus([sku]).get(str(sku))
+
+    def lookup_barcode(self, barcode: int | str) -> SkuSearchResponse | None:
+        """The indexed variant for a barcode, None on a miss or a stale entry"""
+        return self.lookup_barcodes([barcode]).get(str(barcode))
+
+    def _product_keys(self, product_ids: list[str]) -> dict[str, dict[str, list[str]]]:
+        """product id -> {"skus": [...], "barcodes": [...]} as last written"""
+        values = self.kv_db.hget_many(self.product_database, product_ids)
+        return {
+            product_id: json.loads(value)
+            for product_id, value in zip(product_ids, values, strict=True)
+            if value is not None
+        }
+
+    def _write(self, entries: list[SkuIndexEntry]):
+        skus = {entry.sku: entry for entry in entries if entry.sku}
+        barcodes = {entry.barcode: entry for entry in entries if entry.barcode}
+
+        # Merged with what each product already has, a key is listed once however often it is written
+        product_ids = list(dict.fromkeys(entry.product_id for entry in entries if entry.product_id))
+        products = self._product_keys(product_ids)
+        for entry in entries:
+            if not entry.product_id:
+                continue
+            keys = products.setdefault(entry.product_id, {"skus": [], "barcodes": []})
+            if entry.sku and entry.sku not in keys["skus"]:
+                keys["skus"].append(entry.sku)
+            if entry.barcode and entry.barcode not in keys["barcodes"]:
+                keys["barcodes"].append(entry.barcode)
+
+        self.kv_db.hset_many(self.sku_database, {key: entry.model_dump_json() for key, entry in skus.items()})
+        self.kv_db.hset_many(self.barcode_database, {key: entry.model_dump_json() for key, entry in barcodes.items()})
+        self.kv_db.hset_many(self.product_database, {product_id: json.dumps(keys) for product_id, keys in products.items()})
+
+    def record_many(self, matches: list[SkuSearchResponse]):
+        """Write live api hits through so the next lookup skips the api"""
+        indexed_at = time.time()
+        self._write([
+            SkuIndexEntry(
+                sku=match.sku or None,
+                barcode=match.barcode,
+                variant_id=None,
+                # graphql hands back gids, the index is keyed on the rest id
+                product_id=match.product.id.rsplit("/", 1)[-1] if match.product.id else None,
+                product_title=match.product.title,
+                indexed_at=indexed_at
+            )
+            for match in matches
+        ])
+
+    def record(self, match: SkuSearchResponse):
+        """Write a live api hit through so the next lookup skips the api"""
+        self.record_many([match])
+
+    def remove_products(self, product_ids: Sequence[int | str]):
+        """Drop every sku and barcode belonging to these products"""
+        unique_ids = list(dict.fromkeys(str(product_id) for product_id in product_ids))
+        products = self._product_keys(unique_ids)
+        skus = [sku for keys in products.values() for sku in keys["skus"]]
+        barcodes = [barcode for keys in products.values() for barcode in keys["barcodes"]]
+
+        # Only drop keys still pointing at one of these products, a sku may have moved since
+        removed = set(unique_ids)
+        stale_skus = [key for key, entry in self._entries(self.sku_database, skus).items() if entry.product_id in removed]
+        stale_barcodes = [key for key, entry in self._entries(self.barcode_database, barcodes).items() if entry.product_id in removed]
+        self.kv_db.hdel_many(self.sku_database, stale_skus)
+        self.kv_db.hdel_many(self.barcode_database, stale_barcodes)
+        self.kv_db.hdel_many(self.product_database, list(products))
+
+    def index_products(self, products: list[ShopifyProductSchema]) -> int:
+        """
+        Index every variant of these products, products need their variants fetched
+
+        A products old entries are dropped first so a renamed sku doesnt linger
+        """
+        products = [product for product in products if product.id is not None]
+        self.remove_products([str(product.id) for product in products])
+
+        indexed_at = time.time()
+        entries = [
+            SkuIndexEntry(
+                sku=variant.sku or None,
+                barcode=variant.barcode or None,
+                variant_id=str(variant.id) if variant.id is not None else None,
+                product_id=str(product.id),
+                product_title=product.title or "",
+                indexed_at=indexed_at
+            )
+            for product in products
+            for variant in product.variants
+            if variant.sku or variant.barcode
+        ]
+        self._write(entries)
+        logger.debug("Indexed products", shop_name=self.shop_name, products=len(products), entries=len(entries))
+        return len(entries)
+
+    async def build(self, shop) -> int:
+        """
+        Rebuild the index from the whole store
+
+        Products no longer in the store are dropped once every page is indexed
+        """
+        logger.info("Starting sku index build", shop_name=self.shop_name)
+        previous_products = set(self.kv_db.hgetall_data(self.product_database))
+
+        seen_products: set[str] = set()
+        entries = 0
+        async for page in shop.stream_products_from_store(fields=Fields(id=True, title=True, variants=True)):
+            entries += self.index_products(page)
+            seen_products.update(str(product.id) for product in page)
+
+        self.remove_products(list(previous_products - seen_products))
+        logger.info("Completed sku index build", shop_name=self.shop_name, products=len(seen_products), entries=entries)
+        return entries
+
+    def __len__(self):
+        return len(self.kv_db.hgetall_data(self.sku_database))
@@ -0,0 +1,161 @@
+import asyncio
+import time
+import structlog
+from pydantic import BaseModel, computed_field
+
+logger = structlog.get_logger(__name__)
+
+class ThrottleMetrics(BaseModel):
+    """Snapshot of a shops graphql cost bucket"""
+    shop_name:              str
+    currently_available:    float
+    maximum_available:      float
+    restore_rate:           float
+    queue_depth:            int
+    in_flight_cost:         float
+    admitted:               int
+    throttled:              int
+    total_wait_seconds:     float
+    max_wait_seconds:       float
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def average_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.admitted if self.admitted else 0.0
+
+class GraphQLCostBucket:
+    """
+    Leaky bucket mirroring shopify's graphql cost throttle for one shop
+
+    Calls reserve their requested cost before they are sent so concurrent calls
+    can never spend more than the bucket holds, the reservation is settled with
+    the actual cost and throttleStatus from the response extensions
+
+    Admission is FIFO, a big query at the head of the queue is not starved by
+    cheaper ones behind it
+    """
+    def __init__(
+        self,
+        shop_name: str,
+        maximum_available: float = 1000.0,
+        restore_rate: float = 50.0
+    ):
+        self.shop_name = shop_name
+        self.maximum_available = maximum_available
+        self.restore_rate = restore_rate
+        self._available = maximum_available
+        self._last_refill = time.monotonic()
+        self._in_flight = 0.0
+        self._lock = asyncio.Lock()
+        # Set whenever budget comes back early so the head of the queue re-checks
+        self._budget_returned = asyncio.Event()
+
+        # Metrics
+        self._queue_depth = 0
+        self._admitted = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available = min(self.maximum_available, self._available + elapsed * self.restore_rate)
+
+    async def acquire(self, requested_cost: float) -> float:
+        """
+        Wait until the bucket can afford requested_cost and reserve it
+
+        Returns:
+            The cost reserved, pass it back to settle or release
+        """
+        # A query can never cost more than the bucket size, shopify rejects it anyway
+        cost = min(requested_cost, self.maximum_available)
+        enqueued_at = time.monotonic()
+        self._queue_depth += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self._available >= cost:
+                        self._available -= cost
+                        self._in_flight += cost
+                        break
+
+                    self._budget_returned.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._budget_returned.wait(),
+                            timeout=(cost - self._available) / self.restore_rate
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._queue_depth -= 1
+
+        waited = time.monotonic() - enqueued_at
+        self._admitted += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        if waited > 0.5:
+            logger.info("Waited for shopify graphql cost budget", shop_name=self.shop_name, waited_seconds=round(waited, 3), requested_cost=cost, queue_depth=self._queue_depth)
+
+        return cost
+
+    def settle(self, reserved_cost: float, extensions: dict | None):
+        """
+        Settle a reservation with the cost shopify reports
+
+        throttleStatus is the source of truth for what is left, calls still in
+        flight keep their reservation on top of it
+        """
+        self._in_flight = max(0.0, self._in_flight - reserved_cost)
+        cost = (extensions or {}).get("cost") or {}
+        throttle_status = cost.get("throttleStatus")
+        if not throttle_status:
+            # No cost info (eg a transport error), refund what was not used
+            self._available = min(self.maximum_available, self._available + reserved_cost)
+            self._budget_returned.set()
+            return
+
+        self._refill()
+        self.maximum_available = float(throttle_status.get("maximumAvailable", self.maximum_available))
+        self.restore_rate = float(throttle_status.get("restoreRate", self.restore_rate))
+        reported = float(throttle_status.get("currentlyAvailable", self._available))
+        self._available = max(0.0, min(self.maximum_available, reported - self._in_flight))
+        self._budget_returned.set()
+
+        logger.debug(
+            "Settled graphql cost",
+            shop_name=self.shop_name,
+            requested_cost=cost.get("requestedQueryCost"),
+            actual_cost=cost.get("actualQueryCost"),
+            currently_available=reported
+        )
+
+    def throttled(self, reserved_cost: float, extensions: dict | None):
+        """Shopify said THROTTLED, drain the bucket to what it reports"""
+        self._throttled += 1
+        self.settle(reserved_cost, extensions)
+
+    def retry_after(self, requested_cost: float) -> float:
+        """Seconds until requested_cost is affordable again"""
+        self._refill()
+        missing = min(requested_cost, self.maximum_available) - self._available
+        return max(missing / self.restore_rate, 0.0)
+
+    def metrics(self) -> ThrottleMetrics:
+        self._refill()
+        return ThrottleMetrics(
+            shop_name=self.shop_name,
+            currently_available=self._available,
+            maximum_available=self.maximum_available,
+            restore_rate=self.restore_rate,
+            queue_depth=self._queue_depth,
+            in_flight_cost=self._in_flight,
+            admitted=self._admitted,
+            throttled=self._throttled,
+            total_wait_seconds=self._total_wait,
+            max_wait_seconds=self._max_wait,
+        )
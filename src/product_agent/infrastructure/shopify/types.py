@@ -20,11 +20,35 @@ class Inventory(BaseModel):
     # example our internal inventory db
     # or route to admin acc on GUI for inventory input
         
+class InventoryItemResult(BaseModel):
+    """Outcome of the batched inventory path for a single inventory item"""
+    inventory_item_id: str
+    activated: bool = False
+    quantities_set: bool = False
+    errors: list[str] = []
+
+    @property
+    def succeeded(self) -> bool:
+        return self.activated and self.quantities_set and not self.errors
+
+class InventoryBatchResult(BaseModel):
+    """Per item results so partial failures stay visible"""
+    items: list[InventoryItemResult]
+
+    @property
+    def all_succeeded(self) -> bool:
+        return all(item.succeeded for item in self.items)
+
+    def failed(self) -> list[InventoryItemResult]:
+        return [item for item in self.items if not item.succeeded]
+
 class Product(BaseModel):
     "Product dict that holds title"
     title: str
+    id: str | None = None
 
 class SkuSearchResponse(BaseModel):
     """Search response from shopify's graph ql"""
     sku: str
-    product: Product
\ No newline at end of file
+    barcode: str | None = None
+    product: Product
@@ -0,0 +1,26 @@
+import base64
+import hashlib
+import hmac
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Product topics the catalogue consumer understands
+PRODUCT_TOPICS = ("products/create", "products/update", "products/delete")
+
+def verify_webhook_hmac(body: bytes, hmac_header: str | None, secret: str | None) -> bool:
+    """
+    Check the X-Shopify-Hmac-Sha256 header against the raw request body
+
+    Shopify signs the exact bytes it sent, so the body must not be re-serialised first
+    """
+    if not hmac_header or not secret:
+        return False
+
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    expected = base64.b64encode(digest).decode("utf-8")
+    return hmac.compare_digest(expected, hmac_header)
+
+def shop_name_from_domain(shop_domain: str) -> str:
+    """X-Shopify-Shop-Domain is shop.myshopify.com, everything else is keyed on the shop name"""
+    return shop_domain.removesuffix(".myshopify.com")
@@ -1,31 +1,116 @@
 import datetime
-import logging
 import traceback
 import structlog
 from typing import Protocol
-from qdrant_client.models import PayloadSchemaType, PointStruct, FieldCondition, MatchValue, Filter, VectorParams, Distance
-from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    PayloadSchemaType, PointStruct, FieldCondition, MatchValue, Filter, VectorParams, Distance, PointIdsList, QueryRequest, ScoredPoint,
+    BinaryQuantization, BinaryQuantizationConfig, QuantizationSearchParams, ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams,
+    Disabled, VectorParamsDiff
+)
+from qdrant_client import AsyncQdrantClient, QdrantClient
 
 from product_agent.infrastructure.vector_db.schemas import DbResponse
-from product_agent.infrastructure.vector_db.types import VectorFilter
+from product_agent.infrastructure.vector_db.types import CollectionConfig, VectorFilter
 
 logger = structlog.get_logger(__name__)
 
 class VectorDb(Protocol):
     """Defining the schema of the vector database"""
-    def upsert_points(self, collection_name: str, points: list[PointStruct]) -> DbResponse | None:
+    def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        """wait=False returns once the write is acknowledged, before it is applied"""
         ...
     def search_points(self, collection_name: str, query_vector: list[float], vector_filter: VectorFilter | None = None, k: int = 5) -> list:
         """query_vector = the vector we want to match to
             k = the number of results we want to return
         """
         ...
+    def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        ...
+    def retrieve_payloads(self, collection_name: str, point_ids: list, keys: list[str] | None = None) -> dict:
+        """point id -> payload for the ids that exist, keys limits the payload fields returned"""
+        ...
+    def scroll_point_ids(self, collection_name: str, vector_filter: VectorFilter | None = None) -> list:
+        """Every point id in the collection, or only those whose payload matches vector_filter"""
+        ...
+
+class AsyncVectorDb(Protocol):
+    """The VectorDb schema for async callers, plus many queries in one round trip"""
+    async def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        ...
+    async def search_points(self, collection_name: str, query_vector: list[float], vector_filter: VectorFilter | None = None, k: int = 5) -> list:
+        ...
+    async def search_batch(self, collection_name: str, query_vectors: list[list[float]], vector_filter: VectorFilter | None = None, k: int = 5) -> list[list]:
+        """One list of results per query vector, in the same order"""
+        ...
+    async def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        ...
+
+def _payload_filter(vector_filter: VectorFilter | None) -> Filter | None:
+    if vector_filter is None:
+        return None
+
+    return Filter(
+        must=[
+            FieldCondition(
+                key=vector_filter.key,
+                match=MatchValue(value=vector_filter.value)
+            )
+        ]
+    )
+
+def quantization_config(config: CollectionConfig) -> ScalarQuantization | BinaryQuantization | None:
+    """The qdrant quantization for a collection config"""
+    if config.quantization == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=config.quantile, always_ram=config.quantized_in_ram)
+        )
+    if config.quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=config.quantized_in_ram))
+    return None
+
+def search_params(config: CollectionConfig) -> SearchParams | None:
+    """Per query params, rescoring and oversampling only mean something on a quantized collection"""
+    if config.quantization == "none":
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(rescore=config.rescore, oversampling=config.oversampling))
+
+def _upsert_response(collection_name: str, points: list[PointStruct], status) -> DbResponse:
+    # acknowledged is the success status of a wait=False upsert
+    if status in ("completed", "acknowledged"):
+        logger.info("Completed Upsert Into Vector Db", collection_name=collection_name)
+        return DbResponse(
+            records_inserted=len(points),
+            collection_name=collection_name,
+            time=datetime.datetime.now(),
+            error=None,
+            traceback=None
+        )
+
+    logger.error(f"Upsert failed with status: {status}")
+    return DbResponse(
+        records_inserted=0,
+        collection_name=collection_name,
+        time=datetime.datetime.now(),
+        error=f"Upsert status: {status}",
+        traceback=None
+    )
+
+def _error_response(collection_name: str, e: Exception) -> DbResponse:
+    return DbResponse(
+        records_inserted=0,
+        collection_name=collection_name,
+        time=datetime.datetime.now(),
+        error=str(e),
+        traceback=traceback.format_exc()
+    )
 
 class vector_database:
     """Concrete vector database impl"""
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, collection_config: CollectionConfig | None = None):
         logger.debug("Starting to initialise vector_database")
 
+        # Collections are created with it and searches use its quantization params
+        self.collection_config = collection_config or CollectionConfig()
         self.client = QdrantClient(
             url=api_url, 
             api_key=api_key,
@@ -39,26 +124,61 @@ class vector_database:
         logger.debug("Starting get_collections")
         return self.client.get_collection("shopify_products")
 
-    def create_collection(self, collection_name: str, index_payload: bool = False, index_wanted: str | None = None):
+    def create_collection(self, collection_name: str, index_payload: bool = False, index_wanted: str | None = None, config: CollectionConfig | None = None):
         """
         Create a collection in the vector_database
         Does the database need indexing via the payload
+
+        config sets the quantization, on disk storage and the payload fields
+        indexed, defaulting to the config the client was built with
         """
-        logger.debug("Starting create_collection", collection_name=collection_name)
+        config = config or self.collection_config
+        logger.debug("Starting create_collection", collection_name=collection_name, **config.model_dump())
         created = self.client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE))
+            vectors_config=VectorParams(size=config.size, distance=Distance.COSINE, on_disk=config.on_disk),
+            quantization_config=quantization_config(config))
         if not created:
             logger.error("Failed to create collection", collection_name=collection_name)
             return created
 
-        logger.info("Created Collection", collection_name=collection_name, indexing=index_payload)
-        if index_payload:
-            payload_index = self.create_payload_index(collection_name=collection_name, field_name=index_wanted) 
-            logger.debug("Created payload_index", payload_index_response=payload_index.model_dump_json(), key=index_wanted)
+        payload_indexes = dict(config.payload_indexes)
+        if index_payload and index_wanted is not None:
+            payload_indexes.setdefault(index_wanted, "keyword")
+
+        logger.info("Created Collection", collection_name=collection_name, indexing=list(payload_indexes))
+        for field_name, field_schema in payload_indexes.items():
+            payload_index = self.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=field_schema)
+            logger.debug("Created payload_index", payload_index_response=payload_index.model_dump_json(), key=field_name)
 
         return created
 
+    def update_collection(self, collection_name: str, config: CollectionConfig | None = None):
+        """
+        Apply a config to a collection that already exists
+
+        create_collection only configures new collections, this switches the
+        quantization and on disk storage in place and adds any payload index the
+        collection is missing. qdrant rebuilds the quantized vectors in the
+        background, searches keep working while it does
+        """
+        config = config or self.collection_config
+        logger.debug("Starting update_collection", collection_name=collection_name, **config.model_dump())
+        updated = self.client.update_collection(
+            collection_name=collection_name,
+            # "" is the collections single unnamed vector
+            vectors_config={"": VectorParamsDiff(on_disk=config.on_disk)},
+            quantization_config=quantization_config(config) or Disabled.DISABLED
+        )
+
+        indexed = self.client.get_collection(collection_name).payload_schema or {}
+        missing = {field_name: field_schema for field_name, field_schema in config.payload_indexes.items() if field_name not in indexed}
+        for field_name, field_schema in missing.items():
+            self.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=field_schema)
+
+        logger.info("Updated Collection", collection_name=collection_name, updated=updated, indexes_added=list(missing))
+        return updated
+
     def delete_collection(self, collection_name: str):
         logger.debug("About to deleted collection", collection=collection_name)
         deleted = self.client.delete_collection(collection_name=collection_name)
@@ -73,71 +193,210 @@ class vector_database:
         # new method, return a Query Response object
         logger.debug("Starting search_points", collection_name=collection_name, query_vector_length=len(query_vector), filtering=vector_filter is not None)
 
-        if vector_filter is not None:
-            return self.client.query_points(
-                collection_name=collection_name, 
-                query=query_vector, 
-                limit=k,
-                query_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key=vector_filter.key,
-                            match=MatchValue(value=vector_filter.value)
-                        )
-                    ]
-                )).points
-
         return self.client.query_points(
                     collection_name=collection_name, 
                     query=query_vector, 
-                    limit=k).points
+                    limit=k,
+                    query_filter=_payload_filter(vector_filter),
+                    search_params=search_params(self.collection_config)).points
 
-    def upsert_points(self, collection_name: str, points: list[PointStruct]) -> DbResponse | None:
-        logger.debug("Starting upsert_points", collection_name=collection_name, length_of_upsert=len(points))
+    def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        logger.debug("Starting upsert_points", collection_name=collection_name, length_of_upsert=len(points), wait=wait)
         try:
             update_result = self.client.upsert(
                 collection_name = collection_name,
                 points = points,
+                wait = wait,
             )
 
             logger.debug("Vector Upsert Result", update_result=update_result.model_dump_json())
-
-            if update_result.status == "completed":
-                logger.info("Completed Upsert Into Vector Db", collection_name=collection_name)
-                return DbResponse(
-                    records_inserted=len(points),
-                    collection_name=collection_name,
-                    time=datetime.datetime.now(),
-                    error=None,
-                    traceback=None
-                )
-            else:
-                logger.error(f"Upsert failed with status: {update_result.status}")
-                return DbResponse(
-                    records_inserted=0,
-                    collection_name=collection_name,
-                    time=datetime.datetime.now(),
-                    error=f"Upsert status: {update_result.status}",
-                    traceback=None
-                )
-        
+            return _upsert_response(collection_name, points, update_result.status)
 
         except Exception as e:
+            return _error_response(collection_name, e)
+
+    def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        """Delete points by id, eg products removed from the store"""
+        logger.debug("Starting delete_points", collection_name=collection_name, length_of_delete=len(point_ids))
+        try:
+            update_result = self.client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=point_ids),
+            )
+            logger.info("Deleted points from vector db", collection_name=collection_name, status=update_result.status)
             return DbResponse(
                 records_inserted=0,
                 collection_name=collection_name,
                 time=datetime.datetime.now(),
-                error=str(e),
-                traceback=traceback.format_exc()
+                error=None,
+                traceback=None
+            )
+
+        except Exception as e:
+            return _error_response(collection_name, e)
+
+    def retrieve_payloads(self, collection_name: str, point_ids: list, keys: list[str] | None = None, batch_size: int = 256) -> dict:
+        """point id -> payload for the ids that exist, keys limits the payload fields returned"""
+        logger.debug("Starting retrieve_payloads", collection_name=collection_name, length_of_ids=len(point_ids))
+        payloads = {}
+        for start in range(0, len(point_ids), batch_size):
+            records = self.client.retrieve(
+                collection_name=collection_name,
+                ids=point_ids[start:start + batch_size],
+                with_payload=keys if keys is not None else True,
+                with_vectors=False
             )
+            payloads.update({str(record.id): record.payload or {} for record in records})
+        return payloads
 
-    def create_payload_index(self, collection_name: str, field_name: str):
+    def scroll_point_ids(self, collection_name: str, vector_filter: VectorFilter | None = None, batch_size: int = 1024) -> list:
+        """Every point id in the collection, or only those matching vector_filter, without payloads or vectors"""
+        logger.debug("Starting scroll_point_ids", collection_name=collection_name, vector_filter=vector_filter)
+        point_ids: list = []
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=_payload_filter(vector_filter),
+                limit=batch_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            point_ids.extend(record.id for record in records)
+            if offset is None:
+                return point_ids
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: str = "keyword"):
         """To search by a payload key, you need to first index it to stop 1M row searches"""
         return self.client.create_payload_index(
             collection_name=collection_name,
             field_name=field_name,
-            field_schema=PayloadSchemaType.KEYWORD
+            field_schema=PayloadSchemaType(field_schema)
+        )
+
+class async_vector_database:
+    """
+    Concrete async vector database impl
+
+    Built on AsyncQdrantClient so searches run on the event loop instead of a
+    thread pool. search_batch sends several query vectors, eg a product query
+    and its requery categories, in one query_batch_points round trip
+
+    search_timeout_seconds bounds each search server side, timeout_seconds
+    bounds every http call
+    """
+    def __init__(
+        self,
+        api_url: str | None = None,
+        api_key: str | None = None,
+        timeout_seconds: int = 30,
+        search_timeout_seconds: int = 10,
+        location: str | None = None,
+        collection_config: CollectionConfig | None = None
+    ):
+        logger.debug("Starting to initialise async_vector_database")
+
+        self.search_timeout_seconds = search_timeout_seconds
+        self.collection_config = collection_config or CollectionConfig()
+        # location=":memory:" runs qdrant in process, for tests
+        self.client = AsyncQdrantClient(
+            location=location,
+            url=api_url,
+            api_key=api_key,
+            timeout=timeout_seconds
+        )
+        logger.info("Initialised async_vector_database")
+
+    async def create_collection(self, collection_name: str, config: CollectionConfig | None = None):
+        config = config or self.collection_config
+        logger.debug("Starting create_collection", collection_name=collection_name, **config.model_dump())
+        created = await self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=config.size, distance=Distance.COSINE, on_disk=config.on_disk),
+            quantization_config=quantization_config(config))
+
+        for field_name, field_schema in config.payload_indexes.items():
+            await self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType(field_schema)
+            )
+        logger.info("Created Collection", collection_name=collection_name, created=created, indexing=list(config.payload_indexes))
+        return created
+
+    async def search_points(self,
+        collection_name: str,
+        query_vector: list[float],
+        vector_filter: VectorFilter | None = None,
+        k: int = 5) -> list[ScoredPoint]:
+        logger.debug("Starting search_points", collection_name=collection_name, query_vector_length=len(query_vector), filtering=vector_filter is not None)
+        response = await self.client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            limit=k,
+            query_filter=_payload_filter(vector_filter),
+            search_params=search_params(self.collection_config),
+            with_payload=True,
+            timeout=self.search_timeout_seconds
         )
+        return response.points
 
+    async def search_batch(self,
+        collection_name: str,
+        query_vectors: list[list[float]],
+        vector_filter: VectorFilter | None = None,
+        k: int = 5) -> list[list[ScoredPoint]]:
+        """One list of results per query vector, in the same order"""
+        logger.debug("Starting search_batch", collection_name=collection_name, queries=len(query_vectors), filtering=vector_filter is not None)
+        if len(query_vectors) == 0:
+            return []
 
+        query_filter = _payload_filter(vector_filter)
+        params = search_params(self.collection_config)
+        responses = await self.client.query_batch_points(
+            collection_name=collection_name,
+            requests=[
+                QueryRequest(query=list(query_vector), limit=k, filter=query_filter, params=params, with_payload=True)
+                for query_vector in query_vectors
+            ],
+            timeout=self.search_timeout_seconds
+        )
+        logger.info("Completed search_batch", collection_name=collection_name, queries=len(query_vectors))
+        return [response.points for response in responses]
+
+    async def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        logger.debug("Starting upsert_points", collection_name=collection_name, length_of_upsert=len(points), wait=wait)
+        try:
+            update_result = await self.client.upsert(
+                collection_name=collection_name,
+                points=points,
+                wait=wait,
+            )
+            return _upsert_response(collection_name, points, update_result.status)
+
+        except Exception as e:
+            return _error_response(collection_name, e)
+
+    async def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        """Delete points by id, eg products removed from the store"""
+        logger.debug("Starting delete_points", collection_name=collection_name, length_of_delete=len(point_ids))
+        try:
+            update_result = await self.client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=point_ids),
+            )
+            logger.info("Deleted points from vector db", collection_name=collection_name, status=update_result.status)
+            return DbResponse(
+                records_inserted=0,
+                collection_name=collection_name,
+                time=datetime.datetime.now(),
+                error=None,
+                traceback=None
+            )
+
+        except Exception as e:
+            return _error_response(collection_name, e)
 
+    async def close(self):
+        await self.client.close()
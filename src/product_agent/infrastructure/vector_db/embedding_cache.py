@@ -0,0 +1,144 @@
+import hashlib
+import re
+from collections import OrderedDict
+import numpy as np
+import structlog
+from pydantic import BaseModel
+
+from product_agent.db.redis import KV_DB
+from .embeddings import Embeddor
+
+logger = structlog.get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalise_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+class EmbeddingCacheStats(BaseModel):
+    memory_hits:    int = 0
+    redis_hits:     int = 0
+    misses:         int = 0
+
+class CachedEmbeddor:
+    """
+    An Embeddor that remembers vectors it has already paid for
+
+    Keyed by (model, sha256 of the normalised text). An in process LRU sits in
+    front of an optional redis tier shared by every worker, vectors are stored
+    there as packed float32 bytes (6kb for 1536 dims rather than ~30kb of json)
+
+    Batch calls look every text up first and only embed the misses, in one call
+    """
+    def __init__(
+        self,
+        embeddor: Embeddor,
+        kv_db: KV_DB | None = None,
+        model: str | None = None,
+        max_entries: int = 10_000,
+        ttl_seconds: int = 30 * 24 * 3600,
+        namespace: str = "embedding"
+    ):
+        self.embeddor = embeddor
+        self.kv_db = kv_db
+        self.model = model or getattr(embeddor, "model", "default")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.stats = EmbeddingCacheStats()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{self.model}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Cached vectors for keys, memory first then one redis round trip"""
+        found = {}
+        for key in keys:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                found[key] = vector
+        self.stats.memory_hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.kv_db is not None:
+            try:
+                values = self.kv_db.get_bytes_many(missing)
+            except Exception as e:
+                logger.warning("Embedding cache redis read failed", error=str(e))
+                values = [None] * len(missing)
+
+            for key, value in zip(missing, values, strict=True):
+                if value is None:
+                    continue
+                vector = np.frombuffer(value, dtype=np.float32)
+                self._remember(key, vector)
+                found[key] = vector
+                self.stats.redis_hits += 1
+
+        return found
+
+    def _store(self, vectors: dict[str, np.ndarray]):
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+
+        if self.kv_db is not None and vectors:
+            try:
+                self.kv_db.set_bytes_many({key: vector.tobytes() for key, vector in vectors.items()}, ttl_seconds=self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Embedding cache redis write failed", error=str(e))
+
+    def embed_document(self, document: str) -> list[float]:
+        """Single embed function"""
+        if document == "":
+            raise ValueError("Input document is empty")
+
+        key = self.key(document)
+        cached = self._lookup([key]).get(key)
+        if cached is not None:
+            logger.debug("Embedding cache hit", key=key)
+            vector: list[float] = cached.tolist()
+            return vector
+
+        self.stats.misses += 1
+        vector = self.embeddor.embed_document(document=document)
+        self._store({key: np.asarray(vector, dtype=np.float32)})
+        return vector
+
+    def embed_documents(self, documents: list[str]) -> np.ndarray | None:
+        """Multiple embed function, only texts not already cached are embedded"""
+        if not documents:
+            return np.empty((0, 0), dtype=np.float32)
+
+        keys = [self.key(document) for document in documents]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        # One embed per distinct missing text, duplicates in the batch share it
+        misses = {}
+        for key, document in zip(keys, documents, strict=True):
+            if key not in found and key not in misses:
+                misses[key] = document
+        self.stats.misses += len(misses)
+
+        if misses:
+            embeddings = self.embeddor.embed_documents(documents=list(misses.values()))
+            if embeddings is None:
+                return None
+
+            embedded = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(misses, embeddings, strict=True)}
+            self._store(embedded)
+            found.update(embedded)
+
+        logger.debug("Embedded documents through cache", documents=len(documents), embedded=len(misses))
+        return np.stack([found[key] for key in keys])
+
+    def __len__(self):
+        return len(self._entries)
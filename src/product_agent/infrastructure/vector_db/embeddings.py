@@ -1,9 +1,13 @@
-from typing import Protocol
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Protocol, cast
+import numpy as np
+import openai
 from langchain_openai import OpenAIEmbeddings
-from langgraph.store.base import embed
 import structlog
-import inspect
-from .exceptions import EmbeddingsError
+
+from product_agent.infrastructure.llm.prompt_budget import TokenCounter
 
 logger = structlog.get_logger(__name__)
 
@@ -11,15 +15,45 @@ class Embeddor(Protocol):
     def embed_document(self, document: str) -> list[float]:
         ...
 
-    def embed_documents(self, documents: list[str]) -> list[list[float]] | None: 
+    def embed_documents(self, documents: list[str]) -> np.ndarray | None:
+        """A (len(documents), dimensions) float32 matrix in input order"""
         ...
 
 class Embeddings:
-    def __init__(self, api_key: str):
+    """
+    OpenAI embeddings
+
+    embed_documents splits its input into batches that fit the api's per
+    request input and token limits, embeds them with bounded concurrency and
+    retries only the batches that failed, vectors come back as base64 float32
+    and are written straight into one contiguous matrix
+    """
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        max_batch_documents: int = 1000,
+        max_batch_tokens: int = 100_000,
+        max_document_tokens: int = 8191,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 1.0
+    ):
+        self.model = model
         self.client = OpenAIEmbeddings(
-            model="text-embedding-3-small",
+            model=model,
             api_key=api_key
         )
+        # Retries are per batch here, not inside the sdk
+        self._openai = openai.OpenAI(api_key=api_key, max_retries=0)
+        self._counter = TokenCounter(encoding_name="cl100k_base")
+
+        self.max_batch_documents = max_batch_documents
+        self.max_batch_tokens = max_batch_tokens
+        self.max_document_tokens = max_document_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
 
     def embed_document(self, document: str) -> list[float]:
         """Single embed function"""
@@ -28,23 +62,73 @@ class Embeddings:
             raise ValueError("Input document is empty")
 
         return_embed = self.client.embed_query(text=document)
-        
+
         logger.info("Successfully Recieved Embeddings From Single Embeddings Models")
         return return_embed
 
-    def embed_documents(self, documents: list[str]) -> list[list[float]] | None:
-        """Multiple embed function"""
-        logger.debug("Starting embed_documents", documents=documents[:15])
-
-        try:
-            embeddings = self.client.embed_documents(texts=documents)
-            if not embeddings:
-                logger.error("no embeddings returned from documents", length_of_documents=len(documents))
-                raise EmbeddingsError("No embeddings returned")
-
-            logger.info("Successfully Recieved Embeddings From Multi Embeddings Models")
-            return embeddings
-        
-        except Exception as e:
-            logger.error("Failed to embed documents", error=e, documents=documents)
+    def _batches(self, documents: list[str]) -> tuple[list[str], list[tuple[int, int]]]:
+        """Documents cut to the per input limit and (start, end) ranges that fit a request"""
+        texts = []
+        batches = []
+        start, batch_tokens = 0, 0
+        for i, document in enumerate(documents):
+            tokens = self._counter.count(document)
+            if tokens > self.max_document_tokens:
+                document = self._counter.truncate(document, self.max_document_tokens)
+                tokens = self.max_document_tokens
+            texts.append(document)
+
+            if i > start and (i - start >= self.max_batch_documents or batch_tokens + tokens > self.max_batch_tokens):
+                batches.append((start, i))
+                start, batch_tokens = i, 0
+            batch_tokens += tokens
+
+        if start < len(documents):
+            batches.append((start, len(documents)))
+        return texts, batches
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        response = self._openai.embeddings.create(model=self.model, input=texts, encoding_format="base64")
+        vectors = sorted(response.data, key=lambda item: item.index)
+        # The sdk types embedding as a float list, with base64 encoding it is the encoded string
+        return np.stack([np.frombuffer(base64.b64decode(cast(str, item.embedding)), dtype=np.float32) for item in vectors])
+
+    def embed_documents(self, documents: list[str]) -> np.ndarray | None:
+        """Multiple embed function, None if a batch still fails after its retries"""
+        logger.debug("Starting embed_documents", length_of_documents=len(documents))
+        if not documents:
+            return np.empty((0, 0), dtype=np.float32)
+
+        texts, batches = self._batches(documents)
+        matrix = None
+        pending = batches
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                futures = {pool.submit(self._embed_batch, texts[start:end]): (start, end) for start, end in pending}
+                for future in as_completed(futures):
+                    start, end = futures[future]
+                    try:
+                        vectors = future.result()
+                    except Exception as e:
+                        logger.warning("Embedding batch failed", start=start, end=end, attempt=attempt, error=str(e))
+                        failed.append((start, end))
+                        continue
+
+                    if matrix is None:
+                        matrix = np.empty((len(documents), vectors.shape[1]), dtype=np.float32)
+                    matrix[start:end] = vectors
+
+            pending = failed
+            if not pending:
+                break
+
+        if pending:
+            logger.error("Failed to embed documents", failed_batches=len(pending), batches=len(batches), length_of_documents=len(documents))
             return None
+
+        logger.info("Successfully Recieved Embeddings From Multi Embeddings Models", batches=len(batches))
+        return matrix
@@ -0,0 +1,356 @@
+import asyncio
+import datetime
+import json
+from pathlib import Path
+import numpy as np
+import structlog
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, ScoredPoint
+
+from product_agent.infrastructure.vector_db.client import VectorDb
+from product_agent.infrastructure.vector_db.schemas import DbResponse
+from product_agent.infrastructure.vector_db.types import VectorFilter
+
+logger = structlog.get_logger(__name__)
+
+def _matches(payload_value, value: str) -> bool:
+    """Payload filter match, a list matches when any of its values does like a qdrant keyword index"""
+    if isinstance(payload_value, list):
+        return value in payload_value
+    return bool(payload_value == value)
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    """Unit length rows so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalised: np.ndarray = vectors / norms
+    return normalised
+
+class _Collection:
+    """Rows of one collection, the matrix grows by doubling and stays contiguous"""
+    def __init__(self, dimensions: int, capacity: int = 1024):
+        self.matrix = np.empty((capacity, dimensions), dtype=np.float32)
+        self.size = 0
+        self.ids: list = []
+        self.payloads: list[dict] = []
+        self.rows: dict = {}
+        # (key, value) -> bool mask over rows, dropped whenever rows change
+        self.masks: dict[tuple[str, str], np.ndarray] = {}
+
+    @property
+    def dimensions(self) -> int:
+        return self.matrix.shape[1]
+
+    def _reserve(self, rows: int):
+        if rows <= len(self.matrix):
+            return
+        capacity = max(rows, 2 * len(self.matrix))
+        matrix = np.empty((capacity, self.dimensions), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+
+    def upsert(self, ids: list, vectors: np.ndarray, payloads: list[dict]):
+        vectors = _normalise(vectors)
+        new = [i for i, point_id in enumerate(ids) if point_id not in self.rows]
+        self._reserve(self.size + len(new))
+
+        for i, point_id in enumerate(ids):
+            row = self.rows.get(point_id)
+            if row is None:
+                row = self.size
+                self.rows[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(payloads[i])
+                self.size += 1
+            else:
+                self.payloads[row] = payloads[i]
+            self.matrix[row] = vectors[i]
+        self.masks.clear()
+
+    def delete(self, point_ids: list) -> int:
+        """Swap remove so the live rows stay a prefix of the matrix"""
+        deleted = 0
+        for point_id in point_ids:
+            row = self.rows.pop(point_id, None)
+            if row is None:
+                continue
+
+            last = self.size - 1
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                self.ids[row] = self.ids[last]
+                self.payloads[row] = self.payloads[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.payloads.pop()
+            self.size -= 1
+            deleted += 1
+
+        self.masks.clear()
+        return deleted
+
+    def mask(self, key: str, value: str) -> np.ndarray:
+        mask = self.masks.get((key, value))
+        if mask is None:
+            mask = np.fromiter((_matches(payload.get(key), value) for payload in self.payloads), dtype=bool, count=self.size)
+            self.masks[(key, value)] = mask
+        return mask
+
+    def index_payload(self, key: str):
+        """Precompute the mask of every value of a payload key"""
+        values = set()
+        for payload in self.payloads:
+            payload_value = payload.get(key)
+            if isinstance(payload_value, str):
+                values.add(payload_value)
+            elif isinstance(payload_value, list):
+                values.update(item for item in payload_value if isinstance(item, str))
+        for value in values:
+            self.mask(key, value)
+
+class InMemoryVectorDb:
+    """
+    In process VectorDb over a contiguous float32 matrix
+
+    A few thousand products at 1536 dims is tens of MB, small enough to search
+    with one matrix-vector product and an argpartition rather than a network
+    round trip. Rows are normalised on the way in so scores are cosine
+    similarities like a cosine qdrant collection, payloads sit in a side table
+    and payload filters are bool masks cached per (key, value)
+
+    Pass source to keep qdrant the source of truth, writes go there first and
+    are only applied here when they succeed, searches never leave the process
+    """
+    def __init__(self, source: VectorDb | None = None):
+        self.source = source
+        self._collections: dict[str, _Collection] = {}
+        logger.info("Initialised InMemoryVectorDb", write_through=source is not None)
+
+    def _collection(self, collection_name: str, dimensions: int) -> _Collection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = _Collection(dimensions)
+            self._collections[collection_name] = collection
+        elif collection.dimensions != dimensions:
+            raise ValueError(f"Collection {collection_name} has {collection.dimensions} dimensions, got {dimensions}")
+        return collection
+
+    def load(self, collection_name: str, ids: list, vectors, payloads: list[dict] | None = None) -> int:
+        """Load rows without writing through to the source"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one vector per id")
+        if len(ids) == 0:
+            return 0
+
+        payloads = payloads if payloads is not None else [{} for _ in ids]
+        self._collection(collection_name, vectors.shape[1]).upsert(list(ids), vectors, payloads)
+        return len(ids)
+
+    def load_embedding_examples(self, collection_name: str, path: str | Path) -> int:
+        """
+        Load the store_data/embedding_examples json format, either a mapping
+        of title to vector or a single {"text": ..., "embed": [...]} document
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if "text" in data and "embed" in data:
+            data = {data["text"]: data["embed"]}
+
+        titles = list(data)
+        # The embedding examples have no ids, ids follow the file order after anything already loaded
+        collection = self._collections.get(collection_name)
+        start = collection.size if collection is not None else 0
+        loaded = self.load(
+            collection_name,
+            ids=list(range(start, start + len(titles))),
+            vectors=[data[title] for title in titles],
+            payloads=[{"title": title} for title in titles]
+        )
+        logger.info("Loaded embedding examples", collection_name=collection_name, path=str(path), loaded=loaded)
+        return loaded
+
+    def load_from_qdrant(self, client: QdrantClient, collection_name: str, batch_size: int = 256) -> int:
+        """Copy a qdrant collection in, page by page with vectors and payloads"""
+        loaded = 0
+        offset = None
+        while True:
+            records, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if records:
+                loaded += self.load(
+                    collection_name,
+                    ids=[record.id for record in records],
+                    vectors=[record.vector for record in records],
+                    payloads=[record.payload or {} for record in records]
+                )
+            if offset is None:
+                break
+
+        logger.info("Loaded collection from qdrant", collection_name=collection_name, loaded=loaded)
+        return loaded
+
+    def index_payload(self, collection_name: str, key: str):
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            collection.index_payload(key)
+
+    def _top_k(self, collection: _Collection, scores: np.ndarray, rows: np.ndarray | None, k: int) -> list[ScoredPoint]:
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        if rows is not None:
+            top_rows = rows[top]
+        else:
+            top_rows = top
+        return [
+            ScoredPoint(
+                id=collection.ids[row],
+                version=0,
+                score=float(score),
+                payload=collection.payloads[row]
+            )
+            for row, score in zip(top_rows, scores[top], strict=True)
+        ]
+
+    def _candidates(self, collection: _Collection, vector_filter: VectorFilter | None) -> tuple[np.ndarray, np.ndarray | None]:
+        """The matrix rows to score, and their row numbers when filtered"""
+        live = collection.matrix[:collection.size]
+        if vector_filter is None:
+            return live, None
+
+        rows = np.flatnonzero(collection.mask(vector_filter.key, vector_filter.value))
+        return live[rows], rows
+
+    def search_points(self, collection_name: str, query_vector: list[float], vector_filter: VectorFilter | None = None, k: int = 5) -> list[ScoredPoint]:
+        collection = self._collections.get(collection_name)
+        if collection is None or collection.size == 0 or k <= 0:
+            return []
+
+        query = _normalise(np.asarray(query_vector, dtype=np.float32))
+        matrix, rows = self._candidates(collection, vector_filter)
+        if len(matrix) == 0:
+            return []
+        return self._top_k(collection, matrix @ query, rows, k)
+
+    def search_batch(self, collection_name: str, query_vectors: list[list[float]], vector_filter: VectorFilter | None = None, k: int = 5) -> list[list[ScoredPoint]]:
+        """One list of results per query vector, scored in one matrix product"""
+        collection = self._collections.get(collection_name)
+        if collection is None or collection.size == 0 or k <= 0 or len(query_vectors) == 0:
+            return [[] for _ in query_vectors]
+
+        queries = _normalise(np.asarray(query_vectors, dtype=np.float32))
+        matrix, rows = self._candidates(collection, vector_filter)
+        if len(matrix) == 0:
+            return [[] for _ in query_vectors]
+
+        scores = queries @ matrix.T
+        return [self._top_k(collection, row_scores, rows, k) for row_scores in scores]
+
+    def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        logger.debug("Starting upsert_points", collection_name=collection_name, length_of_upsert=len(points))
+        if self.source is not None:
+            response = self.source.upsert_points(collection_name=collection_name, points=points, wait=wait)
+            if response is None or response.error is not None:
+                return response
+
+        try:
+            self.load(
+                collection_name,
+                ids=[point.id for point in points],
+                vectors=[point.vector for point in points],
+                payloads=[point.payload or {} for point in points]
+            )
+        except ValueError as e:
+            return DbResponse(
+                records_inserted=0,
+                collection_name=collection_name,
+                time=datetime.datetime.now(),
+                error=str(e),
+                traceback=None
+            )
+
+        return DbResponse(
+            records_inserted=len(points),
+            collection_name=collection_name,
+            time=datetime.datetime.now(),
+            error=None,
+            traceback=None
+        )
+
+    def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        logger.debug("Starting delete_points", collection_name=collection_name, length_of_delete=len(point_ids))
+        if self.source is not None:
+            response = self.source.delete_points(collection_name=collection_name, point_ids=point_ids)
+            if response is None or response.error is not None:
+                return response
+
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            collection.delete(point_ids)
+
+        return DbResponse(
+            records_inserted=0,
+            collection_name=collection_name,
+            time=datetime.datetime.now(),
+            error=None,
+            traceback=None
+        )
+
+    def retrieve_payloads(self, collection_name: str, point_ids: list, keys: list[str] | None = None) -> dict:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            return {}
+
+        payloads = {}
+        for point_id in point_ids:
+            row = collection.rows.get(point_id)
+            if row is None:
+                continue
+            payload = collection.payloads[row]
+            payloads[point_id] = {key: payload[key] for key in keys if key in payload} if keys is not None else payload
+        return payloads
+
+    def scroll_point_ids(self, collection_name: str, vector_filter: VectorFilter | None = None) -> list:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            return []
+        if vector_filter is None:
+            return list(collection.ids)
+        return [collection.ids[row] for row in np.flatnonzero(collection.mask(vector_filter.key, vector_filter.value))]
+
+    def count(self, collection_name: str) -> int:
+        collection = self._collections.get(collection_name)
+        return collection.size if collection is not None else 0
+
+class AsyncInMemoryVectorDb:
+    """
+    AsyncVectorDb view of an InMemoryVectorDb, so async callers search the hot index
+
+    Searches are a matrix product in process and run inline on the loop, writes
+    can go through to qdrant so they run in a thread
+    """
+    def __init__(self, db: InMemoryVectorDb):
+        self.db = db
+
+    async def search_points(self, collection_name: str, query_vector: list[float], vector_filter: VectorFilter | None = None, k: int = 5) -> list[ScoredPoint]:
+        return self.db.search_points(collection_name, query_vector, vector_filter=vector_filter, k=k)
+
+    async def search_batch(self, collection_name: str, query_vectors: list[list[float]], vector_filter: VectorFilter | None = None, k: int = 5) -> list[list[ScoredPoint]]:
+        """One list of results per query vector, in the same order"""
+        return self.db.search_batch(collection_name, query_vectors, vector_filter=vector_filter, k=k)
+
+    async def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        return await asyncio.to_thread(self.db.upsert_points, collection_name, points, wait)
+
+    async def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        return await asyncio.to_thread(self.db.delete_points, collection_name, point_ids)
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, Field
 
 class VectorFilter(BaseModel):
     """A filter for searching the vector database by payload"""
@@ -6,4 +7,29 @@ class VectorFilter(BaseModel):
     value:  str
 
     def to_dict(self):
-        return {self.key: self.value}
\ No newline at end of file
+        return {self.key: self.value}
+
+# Payload fields searches filter on, keyword indexed so a filter never scans the collection
+# tags is stored as a list, a keyword index on a list matches any of its values
+PRODUCT_PAYLOAD_INDEXES = {
+    "product_type": "keyword",
+    "vendor": "keyword",
+    "tags": "keyword",
+    "tenant_id": "keyword",
+}
+
+class CollectionConfig(BaseModel):
+    """
+    How a collection stores its vectors and which payload fields it indexes
+
+    Applied when a collection is created, an existing collection keeps its
+    settings until vector_database.update_collection is run against it
+    """
+    size:               int = 1536
+    on_disk:            bool = False # full vectors on disk, pair with quantization so search stays in ram
+    quantization:       Literal["none", "scalar", "binary"] = "none"
+    quantile:           float = 0.99 # scalar only, clips outliers before mapping to int8
+    quantized_in_ram:   bool = True
+    rescore:            bool = True # re-rank quantized candidates with the full vectors
+    oversampling:       float = 2.0 # candidates fetched per result before rescoring
+    payload_indexes:    dict[str, str] = Field(default_factory=lambda: dict(PRODUCT_PAYLOAD_INDEXES))
@@ -1,5 +1,4 @@
 from pydantic import BaseModel, Field, computed_field, model_validator
-from typing import List
 import datetime
 
 from product_agent.infrastructure.shopify.types import Inventory
@@ -43,11 +42,11 @@ class DraftProduct(BaseModel):
     # will add rag to this, to see what other similar products are doing in these fields
     type: str = Field(description="type of product, is it a Probiotic, Protein Powder, Tea")
     vendor: str = Field(description="the brand name of the product")
-    tags: List[str] = Field(description="a few tags about the  product -> Valerian, Teas, Sleeping Disorders & Support Sleep Support, Lemon Verbena, Lavender, Chamomile")
+    tags: list[str] = Field(description="a few tags about the  product -> Valerian, Teas, Sleeping Disorders & Support Sleep Support, Lemon Verbena, Lavender, Chamomile")
 
     lead_option: str = Field(description="the parent variant type if size and flavours, people browse by size and then choose their flavour")
     baby_options: list[str] | None = None
-    variants: List[Variant]
+    variants: list[Variant]
 
     @model_validator(mode="after")
     def validate_length(self):
@@ -172,7 +171,8 @@ class ShopifyProductSchema(BaseModel):
     product_type: str | None = None
     tags: str | None = None
     status: str | None = None
-    variants: List[ShopifyVariantSchema] = Field(default_factory=list)
+    updated_at: str | None = None
+    variants: list[ShopifyVariantSchema] = Field(default_factory=list)
 
     @classmethod
     def from_shopify_resource(cls, resource) -> "ShopifyProductSchema":
@@ -192,6 +192,7 @@ class ShopifyProductSchema(BaseModel):
             product_type=getattr(resource, 'product_type', None),
             tags=getattr(resource, 'tags', None),
             status=getattr(resource, 'status', None),
+            updated_at=getattr(resource, 'updated_at', None),
             variants=variants,
         )
 
@@ -213,6 +214,7 @@ class ShopifyProductSchema(BaseModel):
             product_type=data.get("product_type"),
             tags=data.get("tags"),
             status=data.get("status"),
+            updated_at=data.get("updated_at"),
             variants=variants,
         )
 
@@ -227,6 +229,8 @@ class Fields(BaseModel):
     collections:    bool | None = None
     tags:           bool | None = None
     status:         bool | None = None
+    updated_at:     bool | None = None
+    variants:       bool | None = None
 
     def shopify_transform_fields(self) -> str:
         """Shopify require a string in a specific format"""
@@ -238,4 +242,4 @@ class Fields(BaseModel):
 
 class AllShopifyProducts(BaseModel):
     """A list containing all the products returned"""
-    products: List[ShopifyProductSchema]
+    products: list[ShopifyProductSchema]
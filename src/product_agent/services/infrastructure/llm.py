@@ -1,6 +1,66 @@
+from collections.abc import Awaitable, Callable
 from product_agent.infrastructure.llm.client import LLM
+from product_agent.infrastructure.llm.streaming import PartialResult
+from product_agent.infrastructure.llm.response_cache import LLMResponseCache
 from product_agent.models.llm_input import LLMInput
 
-async def llm_service(llm_input: LLMInput, llm: LLM):
-    """A service layer impl of llms invoke"""
-    return await llm.invoke(llm_input)
\ No newline at end of file
+async def llm_service(llm_input: LLMInput, llm: LLM, cache: LLMResponseCache | None = None, call_site: str = "default"):
+    """
+    A service layer impl of llms invoke
+
+    Pass a cache for deterministic calls, an identical earlier call is returned without invoking
+    """
+    if cache is None:
+        return await llm.invoke(llm_input)
+
+    key = cache.key(llm_input)
+    if key is None:
+        return await llm.invoke(llm_input)
+
+    cached = cache.get(key, llm_input.response_schema, call_site=call_site)
+    if cached is not None:
+        return cached
+
+    response = await llm.invoke(llm_input)
+    if response is not None:
+        cache.set(key, response)
+    return response
+
+async def llm_stream_service(
+    llm_input: LLMInput,
+    llm: LLM,
+    on_partial: Callable[[PartialResult], Awaitable[None]],
+    cache: LLMResponseCache | None = None,
+    call_site: str = "default"
+):
+    """
+    Structured llm call that reports fields as they complete
+
+    on_partial is awaited each time top level fields complete and once more
+    with the final model. Clients without astream (and cache hits) report
+    once with the whole response
+    """
+    key = cache.key(llm_input) if cache is not None else None
+    if cache is not None and key is not None:
+        cached = cache.get(key, llm_input.response_schema, call_site=call_site)
+        if cached is not None:
+            await on_partial(_whole_response(cached))
+            return cached
+
+    astream = getattr(llm, "astream", None)
+    if astream is None:
+        response = await llm.invoke(llm_input)
+        await on_partial(_whole_response(response))
+    else:
+        response = None
+        async for result in astream(llm_input):
+            await on_partial(result)
+            response = result.final
+
+    if cache is not None and key is not None and response is not None:
+        cache.set(key, response)
+    return response
+
+def _whole_response(response) -> PartialResult:
+    fields = list(type(response).model_fields)
+    return PartialResult(partial=response.model_dump(mode="json"), completed_fields=fields, newly_completed=fields, final=response)
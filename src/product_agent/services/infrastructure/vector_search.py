@@ -1,12 +1,19 @@
-import logging
+import asyncio
+import hashlib
+import json
+import uuid
+from collections.abc import AsyncIterator, Callable
+import numpy as np
+import structlog
 from pydantic import BaseModel
 
-from product_agent.infrastructure.vector_db.client import VectorDb
+from product_agent.infrastructure.vector_db.client import AsyncVectorDb, VectorDb
 from product_agent.infrastructure.vector_db.embeddings import Embeddor
+from product_agent.infrastructure.vector_db.types import VectorFilter
 
-from qdrant_client.models import PointStruct
+from qdrant_client.models import PointStruct, ScoredPoint
 
-logger = logging.getLogger(__name__)
+logger = structlog.get_logger(__name__)
 
 def similarity_search_svc(
     vector_query: list[float], results_wanted: int, vector_db: VectorDb) -> list[PointStruct]:
@@ -26,6 +33,30 @@ def similarity_search_svc(
     logger.info("Completed similarity_search_svc", length_points_list=len(points))
     return points
 
+async def similarity_search_batch_svc(
+    vector_queries: list[list[float]], results_wanted: int, vector_db: AsyncVectorDb) -> list[list[ScoredPoint]] | None:
+    """Searches several query vectors in one round trip, one result list per query"""
+    logger.debug("Started similarity_search_batch_svc", queries=len(vector_queries))
+
+    try:
+        results = await vector_db.search_batch(collection_name="shopify_products", query_vectors=vector_queries, k=results_wanted)
+    except Exception as e:
+        logger.error("Batch vector search failed", exc_info=e)
+        return None
+
+    logger.info("Completed similarity_search_batch_svc", queries=len(vector_queries), results=[len(points) for points in results])
+    return results
+
+def merge_search_results(results: list[list[ScoredPoint]], results_wanted: int) -> list[ScoredPoint]:
+    """The best scoring points across several searches, each point once"""
+    best: dict = {}
+    for points in results:
+        for point in points:
+            if point.id not in best or point.score > best[point.id].score:
+                best[point.id] = point
+
+    return sorted(best.values(), key=lambda point: point.score, reverse=True)[:results_wanted]
+
 class SimilarityResult(BaseModel):
     """A return schema for the similarity service"""
     score:          float
@@ -53,60 +84,239 @@ async def product_similarity_threshold_svc(
     logger.info("Similarity threshold service returned no similar products")
     return None
 
-async def batch_products_to_vector_db(products: list, database: VectorDb, embedder: Embeddor, collection_name: str):
-    """Business Logic For Adding Products To Vector Db """
+# Stable namespace so a products point id never changes between runs
+PRODUCT_POINT_NAMESPACE = uuid.UUID("6f1c7f2e-6a59-4a64-9a38-8b1d0a0f2c11")
+
+def product_point_id(product_id: int | str) -> str:
+    """Deterministic vector point id for a shopify product"""
+    return str(uuid.uuid5(PRODUCT_POINT_NAMESPACE, f"shopify-product:{product_id}"))
+
+def product_tags(product) -> list[str]:
+    """Shopify's comma separated tags as a list, a keyword index then matches any one tag"""
+    tags = product.tags or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return [tag.strip() for tag in tags if tag and tag.strip()]
+
+def product_payload(product, tenant_id: str | None = None) -> dict:
+    """
+    The payload stored alongside a products vector
+
+    tenant_id is the shop the product belongs to, so searches over a shared
+    collection can filter to one shop through its payload index
+    """
+    return {
+        "id": product.id,
+        "title": product.title,
+        "body_html": product.body_html,
+        "product_type": product.product_type,
+        "vendor": product.vendor,
+        "tags": product_tags(product),
+        "tenant_id": tenant_id
+    }
+
+def product_content_hash(product, tenant_id: str | None = None) -> str:
+    """Hash of everything a point is built from, the embedded title and the payload"""
+    content = json.dumps(product_payload(product, tenant_id), sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def product_point(product, vector, tenant_id: str | None = None) -> PointStruct:
+    """A products point, its content hash travels in the payload so re-syncs can skip it"""
+    return PointStruct(
+        id=product_point_id(product.id),
+        vector=np.asarray(vector, dtype=np.float32).tolist(),
+        payload={**product_payload(product, tenant_id), "content_hash": product_content_hash(product, tenant_id)}
+    )
+
+def tenant_filter(tenant_id: str | None) -> VectorFilter | None:
+    """Limits a search or scroll to one shops points, None when there is no tenant"""
+    return VectorFilter(key="tenant_id", value=tenant_id) if tenant_id is not None else None
+
+def delete_stale_points(database: VectorDb, collection_name: str, live_point_ids: set[str], tenant_id: str | None = None) -> int | None:
+    """
+    Delete every point not in live_point_ids, returns how many or None on failure
+
+    With a tenant_id only that shops points are considered, other shops in the collection are left alone
+    """
+    point_ids = database.scroll_point_ids(collection_name=collection_name, vector_filter=tenant_filter(tenant_id))
+    stale_ids = [point_id for point_id in point_ids if str(point_id) not in live_point_ids]
+    if not stale_ids:
+        return 0
+
+    db_resp = database.delete_points(collection_name=collection_name, point_ids=stale_ids)
+    if db_resp is None or db_resp.error is not None:
+        logger.error("Failed to delete stale points", error=db_resp.error if db_resp else None)
+        return None
+
+    logger.info("Deleted stale points", collection_name=collection_name, deleted=len(stale_ids))
+    return len(stale_ids)
+
+class VectorSyncProgress(BaseModel):
+    """Progress of one batch_products_to_vector_db run"""
+    collection_name:    str
+    products:           int = 0
+    unchanged:          int = 0
+    batches:            int = 0
+    batches_embedded:   int = 0
+    batches_committed:  int = 0
+    points_committed:   int = 0
+
+async def _embed_batches(
+    batches: list[list],
+    embedder: Embeddor,
+    queue: asyncio.Queue,
+    progress: VectorSyncProgress
+):
+    """Producer, embeds one batch ahead of the upserts, put blocks while the queue is full"""
+    for batch in batches:
+        try:
+            embeddings = await asyncio.to_thread(embedder.embed_documents, [product.title for product in batch])
+        except Exception as e:
+            logger.error("Embedding batch failed", error=str(e))
+            embeddings = None
+
+        # None tells the consumer to stop, it would otherwise wait on the queue forever
+        if embeddings is None or len(embeddings) != len(batch):
+            await queue.put(None)
+            return
+
+        progress.batches_embedded += 1
+        await queue.put((batch, np.asarray(embeddings, dtype=np.float32)))
+
+async def _upsert_batches(
+    database: VectorDb,
+    collection_name: str,
+    queue: asyncio.Queue,
+    progress: VectorSyncProgress,
+    on_progress: Callable[[VectorSyncProgress], None] | None,
+    tenant_id: str | None = None
+) -> str | None:
+    """Consumer, upserts each embedded batch as it arrives, returns an error message on failure"""
+    for batch_number in range(1, progress.batches + 1):
+        item = await queue.get()
+        if item is None:
+            return "No embeddings returned"
+
+        batch, embeddings = item
+        points = [product_point(product, vector, tenant_id) for product, vector in zip(batch, embeddings, strict=True)]
+        # Only the last batch waits to be applied, qdrant applies writes in order so it is a barrier for the rest
+        last = batch_number == progress.batches
+        db_resp = await asyncio.to_thread(database.upsert_points, collection_name=collection_name, points=points, wait=last)
+        if not db_resp:
+            return "No database response on upsert"
+        if db_resp.error is not None:
+            return db_resp.error
+
+        progress.batches_committed += 1
+        progress.points_committed += len(points)
+        logger.info("Committed Batch", batch_number=batch_number, batches=progress.batches, points_committed=progress.points_committed)
+        if on_progress is not None:
+            on_progress(progress)
+    return None
+
+async def batch_products_to_vector_db(
+    products: list,
+    database: VectorDb,
+    embedder: Embeddor,
+    collection_name: str,
+    delete_stale: bool = False,
+    batch_size: int = 50,
+    max_pending_batches: int = 2,
+    on_progress: Callable[[VectorSyncProgress], None] | None = None,
+    tenant_id: str | None = None
+):
+    """
+    Business Logic For Adding Products To Vector Db
+
+    Point ids come from the shopify product id and every payload carries a
+    content hash, products whose hash is already stored are skipped so a
+    re-sync only embeds and sends what changed. That is also how a crashed
+    run resumes, batches it committed are skipped. delete_stale removes points
+    for products not in the list, only pass it with the whole catalogue
+
+    Embedding and upserting are pipelined, batch N+1 is embedded while batch N
+    is upserted without waiting for it to be applied. At most
+    max_pending_batches embedded batches wait for an upsert, so embeddings
+    never pile up in memory when qdrant is the slower side
+
+    tenant_id, the shop the products belong to, is written into every payload
+    """
     logger.debug("Started batch_products_to_vector_db service", collection_name=collection_name, length_of_products=len(products))
 
-    batch_size = 50
-    batch_number = 1
     try:
         # These product titles are generated from an Agent currnetly or a product generation cycle
         # and is Brand Name + Product Name
         # If at scale this is used elsewhere, it needs to be brand name + product name for Evelyn Faye
-        product_titles = [product.title for product in products]
-        embeddings = embedder.embed_documents(documents=product_titles)
-        if not embeddings:
-            logger.error("no embeddings returned", stack_info=True)
+        products = [product for product in products if product.title]
+        point_ids = [product_point_id(product.id) for product in products]
+        content_hashes = [product_content_hash(product, tenant_id) for product in products]
+
+        stored = database.retrieve_payloads(collection_name=collection_name, point_ids=point_ids, keys=["content_hash"])
+        changed_products = [
+            product for product, point_id, content_hash in zip(products, point_ids, content_hashes, strict=True)
+            if (stored.get(point_id) or {}).get("content_hash") != content_hash
+        ]
+        batches = [changed_products[i:i+batch_size] for i in range(0, len(changed_products), batch_size)]
+        progress = VectorSyncProgress(
+            collection_name=collection_name,
+            products=len(products),
+            unchanged=len(products) - len(changed_products),
+            batches=len(batches)
+        )
+        logger.info("Diffed products against vector db", products=len(products), changed=len(changed_products), batches=len(batches))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+        producer = asyncio.create_task(_embed_batches(batches, embedder, queue, progress))
+        try:
+            error = await _upsert_batches(database, collection_name, queue, progress, on_progress, tenant_id)
+            if error is None:
+                await producer
+        finally:
+            producer.cancel()
+
+        if error is not None:
+            logger.error("Error Adding Vectors To Vector Db", error=error, **progress.model_dump())
+            return None
+
+        if delete_stale and delete_stale_points(database, collection_name, set(point_ids), tenant_id) is None:
             return None
 
-        logger.debug("Length of embeddings recieved: %s", len(embeddings))
-        logger.info("Recieved Embeddings")
-
-        for i in range(0, len(products), batch_size):
-            logger.info("Starting Batch", batch_number=batch_number, batch_size=batch_size)
-            batch_products = products[i:i+batch_size]
-            batch_embeddings = embeddings[i:i+batch_size]
-
-            points = [
-                PointStruct(
-                    id=i+idx,  # Global ID across all batches
-                    vector=vector,
-                    payload={
-                        "id": product.id,
-                        "title": product.title,
-                        "body_html": product.body_html,
-                        "product_type": product.product_type,
-                        "vendor": product.vendor,
-                        "tags": product.tags
-                    }
-                )
-                for idx, (vector, product) in enumerate(zip(batch_embeddings, batch_products))
-            ]
-
-            db_resp = database.upsert_points(collection_name=collection_name, points=points)
-            if not db_resp:
-                logger.error("No database response on upsert")
-                return None
-
-            if db_resp.error is not None:
-                logger.error(f"Error Adding Vectors To Vector Db", error=db_resp.error, stack_info=True)            
-                return None
-
-            logger.debug("db_resp returned", db_resp=db_resp)
-            batch_number += 1
-
-        logger.info("Successfully Uploaded Vectors To Vector Database")
+        logger.info("Successfully Uploaded Vectors To Vector Database", **progress.model_dump())
         return "Success" # will change this to be more professional shortly
     except Exception as e:
-        logger.error(f"Error Adding Vectors To Vector Db", error=e, stack_info=True)
+        logger.error("Error Adding Vectors To Vector Db", error=e, stack_info=True)
         return None
+
+async def stream_products_to_vector_db(pages: AsyncIterator[list], database: VectorDb, embedder: Embeddor, collection_name: str, delete_stale: bool = True, tenant_id: str | None = None):
+    """
+    Add a streamed catalogue to the vector db a page at a time
+
+    Pages come from Shop.stream_products_from_store, memory stays bounded to
+    a page of products and its embeddings however big the store is. Once every
+    page is in, points for products that were not streamed are deleted
+    """
+    logger.debug("Started stream_products_to_vector_db service", collection_name=collection_name)
+
+    products_sent = 0
+    live_point_ids: set[str] = set()
+    async for page in pages:
+        sent = await batch_products_to_vector_db(
+            products=page,
+            database=database,
+            embedder=embedder,
+            collection_name=collection_name,
+            tenant_id=tenant_id
+        )
+        if sent is None:
+            logger.error("Failed streaming page to vector db", products_sent=products_sent)
+            return None
+
+        products_sent += len(page)
+        live_point_ids.update(product_point_id(product.id) for product in page)
+        logger.info("Streamed page to vector db", page_size=len(page), products_sent=products_sent)
+
+    if delete_stale and delete_stale_points(database, collection_name, live_point_ids, tenant_id) is None:
+        return None
+
+    logger.info("Successfully Streamed Store To Vector Database", products_sent=products_sent)
+    return "Success"
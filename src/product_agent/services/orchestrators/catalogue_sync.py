@@ -0,0 +1,340 @@
+"""
+Catalogue sync orchestrator that keeps the vector collection in step with the store.
+
+Rather than re-embedding the whole store every run:
+- an updated_at watermark per shop in the kv store, so only products changed since the last run are fetched
+- the content hash each point carries in its payload, so only products whose point would change are re-embedded
+Deleted products arrive through the product webhooks, a periodic full pass
+diffs the stores ids against the collection to catch any a webhook missed.
+schedule_catalogue_sync runs it on an interval from the api.
+"""
+import asyncio
+import datetime
+import structlog
+from pydantic import BaseModel
+
+from product_agent.db.redis import KV_DB
+from product_agent.infrastructure.shopify.client import Shop
+from product_agent.infrastructure.shopify.sku_index import SkuIndex
+from product_agent.infrastructure.vector_db.client import VectorDb
+from product_agent.infrastructure.vector_db.embeddings import Embeddor
+from product_agent.models.shopify import Fields, ShopifyProductSchema
+
+from ..infrastructure.vector_search import product_content_hash, product_point, product_point_id, tenant_filter
+
+logger = structlog.get_logger(__name__)
+
+WATERMARK_DATABASE = "catalogue:watermarks"
+
+SYNC_FIELDS = Fields(
+    id=True,
+    title=True,
+    body_html=True,
+    vendor=True,
+    product_type=True,
+    tags=True,
+    status=True,
+    updated_at=True,
+    variants=True,
+)
+
+def product_embedding_text(product: ShopifyProductSchema) -> str:
+    """
+    The text we embed for a product
+
+    Brand Name + Product Name, the same as batch_products_to_vector_db
+    """
+    return product.title or ""
+
+class CatalogueSyncResult(BaseModel):
+    """Summary of one sync run"""
+    shop_name:          str
+    collection_name:    str
+    previous_watermark: str | None
+    watermark:          str | None
+    products_seen:      int = 0
+    products_embedded:  int = 0
+    products_unchanged: int = 0
+    products_deleted:   int = 0
+    error:              str | None = None
+
+def parse_updated_at(value: str | None) -> datetime.datetime | None:
+    """
+    A shopify updated_at as an aware datetime, None when missing or unparseable
+
+    REST returns a local offset (2026-01-02T10:00:00+11:00) and the bulk export
+    returns utc with a Z, so they only order correctly once parsed
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        logger.warning("Unparseable updated_at", updated_at=value)
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def read_watermark(kv_db: KV_DB, shop_name: str) -> str | None:
+    """The updated_at of the newest product seen by the last successful run"""
+    watermark = kv_db.hgetall_data(WATERMARK_DATABASE).get(shop_name)
+    return watermark or None
+
+def _embed_and_upsert(
+    products: list[ShopifyProductSchema],
+    texts: list[str],
+    vector_db: VectorDb,
+    embeddor: Embeddor,
+    shop_name: str,
+    collection_name: str
+) -> str | None:
+    """Embed changed products and upsert them, returns an error message on failure"""
+    embeddings = embeddor.embed_documents(documents=texts)
+    if embeddings is None:
+        return "No embeddings returned"
+    points = [product_point(product, vector, tenant_id=shop_name) for vector, product in zip(embeddings, products, strict=True)]
+    db_resp = vector_db.upsert_points(collection_name=collection_name, points=points)
+    if db_resp is None:
+        return "No database response on upsert"
+
+    return db_resp.error
+
+def _upsert_changed_products(
+    products: list[ShopifyProductSchema],
+    vector_db: VectorDb,
+    embeddor: Embeddor,
+    shop_name: str,
+    collection_name: str,
+    result: CatalogueSyncResult
+) -> str | None:
+    """
+    Re-embed the products whose point would change, returns an error message on failure
+
+    Diffed against the content hash stored in each points payload, the same
+    check as batch_products_to_vector_db, so the collection is the only record
+    of what was embedded
+    """
+    products = [product for product in products if product.id is not None and product_embedding_text(product)]
+    if not products:
+        return None
+
+    point_ids = [product_point_id(product.id) for product in products if product.id is not None]
+    stored = vector_db.retrieve_payloads(collection_name=collection_name, point_ids=point_ids, keys=["content_hash"])
+    # updated_at moves for inventory and price edits too, skip when the point would be the same
+    changed_products = [
+        product for product, point_id in zip(products, point_ids, strict=True)
+        if (stored.get(point_id) or {}).get("content_hash") != product_content_hash(product, tenant_id=shop_name)
+    ]
+    result.products_unchanged += len(products) - len(changed_products)
+    if not changed_products:
+        return None
+
+    error = _embed_and_upsert(
+        changed_products,
+        [product_embedding_text(product) for product in changed_products],
+        vector_db,
+        embeddor,
+        shop_name,
+        collection_name
+    )
+    if error is not None:
+        return error
+
+    result.products_embedded += len(changed_products)
+    return None
+
+def _delete_products(
+    product_ids: list[str],
+    vector_db: VectorDb,
+    collection_name: str,
+    result: CatalogueSyncResult,
+    sku_index: SkuIndex | None = None
+) -> str | None:
+    """Delete products vectors and index entries, returns an error message on failure"""
+    if not product_ids:
+        return None
+
+    db_resp = vector_db.delete_points(
+        collection_name=collection_name,
+        point_ids=[product_point_id(product_id) for product_id in product_ids]
+    )
+    if db_resp is None:
+        return "No database response on delete"
+    if db_resp.error is not None:
+        return db_resp.error
+
+    if sku_index is not None:
+        sku_index.remove_products(product_ids)
+    result.products_deleted += len(product_ids)
+    return None
+
+def _stored_product_ids(vector_db: VectorDb, shop_name: str, collection_name: str) -> list[str]:
+    """Product ids of every point this shop has in the collection"""
+    point_ids = vector_db.scroll_point_ids(collection_name=collection_name, vector_filter=tenant_filter(shop_name))
+    payloads = vector_db.retrieve_payloads(collection_name=collection_name, point_ids=point_ids, keys=["id"])
+    return [str(payload["id"]) for payload in payloads.values() if payload.get("id") is not None]
+
+async def _live_product_ids(shop: Shop) -> set[str]:
+    """Every product id currently in the store, ids only so it stays cheap"""
+    live_ids: set[str] = set()
+    async for page in shop.stream_products_from_store(fields=Fields(id=True)):
+        live_ids.update(str(product.id) for product in page)
+    return live_ids
+
+async def incremental_catalogue_sync(
+    shop: Shop,
+    vector_db: VectorDb,
+    embeddor: Embeddor,
+    kv_db: KV_DB,
+    shop_name: str,
+    collection_name: str,
+    detect_deletions: bool = False,
+    sku_index: SkuIndex | None = None
+) -> CatalogueSyncResult:
+    """
+    Bring the vector collection up to date with only the work that changed
+
+    Args:
+        shop: Shop dependency to stream products from
+        vector_db: Vector database holding the collection
+        embeddor: Embeddings dependency, only called for changed text
+        kv_db: Key value store holding the watermark
+        shop_name: Which shop's state to use
+        collection_name: Vector collection to sync into
+        detect_deletions: Full pass, stream every product id in the store and delete the shops
+            points that are no longer in it. Costs a walk of the whole store, so webhooks
+            handle deletions and this only runs periodically
+        sku_index: Optional sku index kept fresh from the same pages
+
+    Returns:
+        CatalogueSyncResult, the watermark only moves forward when the run succeeds
+    """
+    previous_watermark = read_watermark(kv_db, shop_name)
+    logger.info(
+        "Starting incremental catalogue sync",
+        shop_name=shop_name,
+        collection_name=collection_name,
+        watermark=previous_watermark
+    )
+
+    result = CatalogueSyncResult(
+        shop_name=shop_name,
+        collection_name=collection_name,
+        previous_watermark=previous_watermark,
+        watermark=previous_watermark,
+    )
+    newest = previous_watermark
+    newest_at = parse_updated_at(previous_watermark)
+
+    async for page in shop.stream_products_from_store(fields=SYNC_FIELDS, updated_at_min=previous_watermark):
+        if sku_index is not None:
+            # Variant edits dont change the embedded text, index every changed product
+            await asyncio.to_thread(sku_index.index_products, page)
+
+        result.products_seen += len(page)
+        for product in page:
+            updated_at = parse_updated_at(product.updated_at)
+            if updated_at is not None and (newest_at is None or updated_at > newest_at):
+                newest, newest_at = product.updated_at, updated_at
+
+        # Embedding and vector calls are blocking, keep them off the event loop
+        error = await asyncio.to_thread(_upsert_changed_products, page, vector_db, embeddor, shop_name, collection_name, result)
+        if error is not None:
+            logger.error("Incremental sync failed to upsert page", shop_name=shop_name, error=error)
+            result.error = error
+            return result
+
+    stored_ids = await asyncio.to_thread(_stored_product_ids, vector_db, shop_name, collection_name) if detect_deletions else []
+    if stored_ids:
+        live_ids = await _live_product_ids(shop)
+        removed_ids = [product_id for product_id in stored_ids if product_id not in live_ids]
+        error = await asyncio.to_thread(_delete_products, removed_ids, vector_db, collection_name, result, sku_index)
+        if error is not None:
+            logger.error("Incremental sync failed to delete removed products", shop_name=shop_name, error=error)
+            result.error = error
+            return result
+
+    if newest is not None and newest != previous_watermark:
+        kv_db.hset_many(WATERMARK_DATABASE, {shop_name: newest})
+    result.watermark = newest
+
+    logger.info("Completed incremental catalogue sync", **result.model_dump())
+    return result
+
+def apply_catalogue_changes(
+    products: list[ShopifyProductSchema],
+    deleted_ids: list[str],
+    vector_db: VectorDb,
+    embeddor: Embeddor,
+    kv_db: KV_DB,
+    shop_name: str,
+    collection_name: str,
+    sku_index: SkuIndex | None = None
+) -> CatalogueSyncResult:
+    """
+    Apply a batch of pushed changes, eg from product webhooks, without fetching anything
+
+    Uses the same point ids and content hashes as incremental_catalogue_sync so the two
+    agree, the watermark is left alone as pushed events can arrive out of order
+    """
+    logger.debug("Starting apply_catalogue_changes", shop_name=shop_name, products=len(products), deleted=len(deleted_ids))
+    watermark = read_watermark(kv_db, shop_name)
+    result = CatalogueSyncResult(
+        shop_name=shop_name,
+        collection_name=collection_name,
+        previous_watermark=watermark,
+        watermark=watermark,
+        products_seen=len(products),
+    )
+
+    if sku_index is not None and products:
+        sku_index.index_products(products)
+
+    error = _upsert_changed_products(products, vector_db, embeddor, shop_name, collection_name, result)
+    if error is None:
+        error = _delete_products(deleted_ids, vector_db, collection_name, result, sku_index)
+
+    if error is not None:
+        logger.error("Failed to apply catalogue changes", shop_name=shop_name, error=error)
+        result.error = error
+        return result
+
+    logger.info("Applied catalogue changes", **result.model_dump())
+    return result
+
+async def schedule_catalogue_sync(
+    shop: Shop,
+    vector_db: VectorDb,
+    embeddor: Embeddor,
+    kv_db: KV_DB,
+    shop_name: str,
+    collection_name: str,
+    interval_seconds: float,
+    full_pass_every: int = 24,
+    sku_index: SkuIndex | None = None
+):
+    """
+    Run incremental_catalogue_sync every interval_seconds until cancelled
+
+    The first run and every full_pass_every-th run after it are full passes
+    that also detect deletions, the rest only fetch what changed since the
+    watermark. A failed run is logged and retried on the next tick
+    """
+    logger.info("Starting Catalogue Sync Schedule..", shop_name=shop_name, interval_seconds=interval_seconds, full_pass_every=full_pass_every)
+    run = 0
+    while True:
+        try:
+            await incremental_catalogue_sync(
+                shop=shop,
+                vector_db=vector_db,
+                embeddor=embeddor,
+                kv_db=kv_db,
+                shop_name=shop_name,
+                collection_name=collection_name,
+                detect_deletions=run % full_pass_every == 0,
+                sku_index=sku_index
+            )
+        except Exception as e:
+            logger.error("Scheduled catalogue sync failed", shop_name=shop_name, error=e, exc_info=True)
+
+        run += 1
+        await asyncio.sleep(interval_seconds)
@@ -5,7 +5,7 @@ web scraping with LLM-based information extraction.
 
 import asyncio
 import inspect
-import logging
+import structlog
 from product_agent.services.infrastructure.llm import llm_service
 from pydantic import BaseModel
 
@@ -13,31 +13,69 @@ from product_agent.core.agent_configs.scraper import SCRAPER_AGENT_SYSTEM_PROMPT
 from product_agent.models.llm_input import LLMInput
 from product_agent.infrastructure.firecrawl.client import Scraper
 from product_agent.infrastructure.llm.client import LLM
+from product_agent.infrastructure.llm.response_cache import LLMResponseCache
+from product_agent.infrastructure.llm.markdown_cache import MarkdownExtractionCache
+from product_agent.infrastructure.llm.prompt_budget import PromptSection, TokenCounter, assemble_prompt
 from product_agent.core.exceptions import NoScraperResult
-from product_agent.models.scraper import ScraperResponse, ScraperSynthesisResponse
+from product_agent.models.scraper import ScraperSynthesisResponse
 
 from ..infrastructure.scraping import scrape_results_svc
 
-logger = logging.getLogger(__name__)
+logger = structlog.get_logger(__name__)
 
 class ScrapedResults(BaseModel):
     successful_scrapes:     list
     failed_urls:            list
 
-async def analyse_markdowns_with_llm_svc(markdowns: list[str], llm: LLM, model: str) -> ScrapedResults:
-    """Analysing markdown with LLMs in the service layer"""
+async def analyse_markdowns_with_llm_svc(markdowns: list[str],
+    llm: LLM,
+    model: str,
+    cache: LLMResponseCache | None = None,
+    markdown_cache: MarkdownExtractionCache | None = None,
+    token_budget: int | None = None,
+    urls: list[str] | None = None) -> ScrapedResults:
+    """
+    Analysing markdown with LLMs in the service layer
+
+    Args:
+        cache: Optional response cache, reuses earlier identical analyses
+        markdown_cache: Optional near duplicate cache, a page that is mostly the
+            same as one already analysed (including one earlier in this batch)
+            reuses that analysis instead of calling the llm
+        token_budget: Optional cap on prompt tokens, longer markdowns are cut
+            down to fit alongside the system prompt
+        urls: Optional url of each markdown, in the same order. A reused analysis
+            is returned under its own page's url, without them reused pages are
+            dropped rather than returned under another page's url
+    """
     logger.debug("Starting %s", inspect.stack()[0][3], len_urls=len(markdowns))
-    coros = []
-    for markdown in markdowns:
+    counter = TokenCounter()
+
+    def analyse(markdown: str):
+        user_query = f"Analyse this markdown for product details and return json\n\n{markdown}"
+        if token_budget is not None:
+            user_query = assemble_prompt(
+                sections=[
+                    PromptSection(name="instructions", text="Analyse this markdown for product details and return json"),
+                    PromptSection(name="markdown", text=markdown, trim_priority=1),
+                ],
+                budget=token_budget - counter.count(SCRAPER_AGENT_SYSTEM_PROMPT),
+                process="scraper_synthesis",
+                counter=counter
+            ).text
+
         llm_config = LLMInput(
             model=model,
             system_query=SCRAPER_AGENT_SYSTEM_PROMPT,
-            user_query=f"Analyse this markdown for product details and return json\n\n{markdown}",
+            user_query=user_query,
             response_schema=ScraperSynthesisResponse
         )
-        coros.append(llm_service(llm_config, llm))
+        return llm_service(llm_config, llm, cache=cache, call_site="analyse_markdowns")
 
-    scrapes =  await asyncio.gather(*coros)
+    if markdown_cache is None:
+        scrapes = await asyncio.gather(*[analyse(markdown) for markdown in markdowns])
+    else:
+        scrapes = await _analyse_with_markdown_cache(markdowns, markdown_cache, analyse, urls=urls)
 
     success_scrapes = []
     failed_scrapes = []
@@ -54,11 +92,59 @@ async def analyse_markdowns_with_llm_svc(markdowns: list[str], llm: LLM, model:
         failed_urls=failed_scrapes
     )
 
+async def _analyse_with_markdown_cache(markdowns: list[str], markdown_cache: MarkdownExtractionCache, analyse, urls: list[str] | None = None) -> list:
+    """
+    Cache hits skip the llm, near duplicates within the batch share one call
+
+    A reused analysis is copied under this page's url when urls are known,
+    otherwise the page is left out so no result carries another page's url
+    """
+    signatures = [markdown_cache.signature(markdown) for markdown in markdowns]
+    # Index into markdowns of the page each result comes from, and its pending llm call
+    sources: list[int] = []
+    pending: dict[int, asyncio.Task] = {}
+    cached: dict[int, ScraperSynthesisResponse] = {}
+    for i, signature in enumerate(signatures):
+        hit = markdown_cache.lookup(signature)
+        if hit is not None:
+            cached[i] = hit
+            sources.append(i)
+            continue
+
+        duplicate_of = next(
+            (j for j in pending if markdown_cache.similarity(signatures[j], signature) >= markdown_cache.threshold),
+            None
+        )
+        if duplicate_of is not None:
+            sources.append(duplicate_of)
+            continue
+
+        pending[i] = asyncio.ensure_future(analyse(markdowns[i]))
+        sources.append(i)
+
+    logger.debug("Markdown cache checked", llm_calls=len(pending), reused=len(markdowns) - len(pending))
+    results = dict(zip(pending, await asyncio.gather(*pending.values()), strict=True))
+    for i, result in results.items():
+        if result.description is not None:
+            markdown_cache.store(signatures[i], result)
+
+    results.update(cached)
+
+    scrapes = []
+    for i, source in enumerate(sources):
+        result = results[source]
+        if i in pending:
+            scrapes.append(result)
+        elif urls is not None:
+            scrapes.append(result.model_copy(update={"url": urls[i]}))
+    return scrapes
+
 async def scrape_with_llm_svc(search_str: str,
     scraper: Scraper,
     llm: LLM,
     model: str,
-    limit_results=5) -> ScrapedResults:
+    limit_results=5,
+    cache: LLMResponseCache | None = None) -> ScrapedResults:
     """
     Orchestrates web scraping followed by LLM-based product information extraction.
 
@@ -69,6 +155,7 @@ async def scrape_with_llm_svc(search_str: str,
         search_str: The string to put into google search
         scraper: Scraper dependency for web scraping
         llm: LLM dependency for information extraction
+        cache: Optional response cache, a re-run of the same scrape skips the llm
 
     Returns:
         List of LLM responses containing extracted product information from each scraped page
@@ -94,7 +181,9 @@ async def scrape_with_llm_svc(search_str: str,
                 user_query=user_query,
                 response_schema=ScraperSynthesisResponse
             ),
-            llm=llm
+            llm=llm,
+            cache=cache,
+            call_site="scrape_with_llm"
         ))
     
     logger.debug("About to start parralel synthesis", length=len(coros))
@@ -1,18 +1,21 @@
 """Product search orchestrator that coordinates scraping, embedding, and vector search services."""
 
-import logging
+import asyncio
+import structlog
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
+from qdrant_client.models import ScoredPoint
 
 from product_agent.infrastructure.firecrawl.client import Scraper
 from product_agent.infrastructure.vector_db.embeddings import Embeddor
-from product_agent.infrastructure.vector_db.client import VectorDb
+from product_agent.infrastructure.vector_db.client import AsyncVectorDb, VectorDb
 from product_agent.infrastructure.llm.client import LLM
 
 from ..infrastructure.scraping import scrape_results_svc
 from ..infrastructure.embedding import embed_search_svc
-from ..infrastructure.vector_search import similarity_search_svc
+from ..infrastructure.vector_search import similarity_search_svc, similarity_search_batch_svc
 
-logger = logging.getLogger(__name__)
+logger = structlog.get_logger(__name__)
 
 
 def search_products_comprehensive(query: str, scraper: Scraper, embeddor: Embeddor, vector_db: VectorDb, llm: LLM):
@@ -46,3 +49,47 @@ def search_products_comprehensive(query: str, scraper: Scraper, embeddor: Embedd
 
         logger.info("Completed search_products_comprehensive")
         return scraper_response_result, vector_result_result
+
+
+async def search_products_comprehensive_async(
+    query: str,
+    scraper: Scraper,
+    embeddor: Embeddor,
+    vector_db: AsyncVectorDb,
+    requery: list[str] | None = None,
+    results_wanted: int = 4
+):
+    """
+    Async version of search_products_comprehensive
+
+    The scrape runs in a worker thread while the query and any requery
+    strings, eg product categories, are embedded in one call and searched in
+    one batched round trip on the event loop
+
+    Returns:
+        Tuple of (scraper_response, vector_search_results, requery_results)
+        where requery_results maps each requery string to its results
+    """
+    logger.debug("Starting search_products_comprehensive_async", query=query, requery=requery)
+    requery = requery or []
+
+    scraper_task = asyncio.create_task(asyncio.to_thread(scrape_results_svc, query, scraper))
+    try:
+        embeddings = await asyncio.to_thread(embeddor.embed_documents, [str(query), *requery])
+        if embeddings is None:
+            raise ValueError("embeddings cant be none")
+
+        search_results: list[list[ScoredPoint]] | list[None] | None = await similarity_search_batch_svc(
+            vector_queries=np.asarray(embeddings, dtype=np.float32).tolist(),
+            results_wanted=results_wanted,
+            vector_db=vector_db
+        )
+        scraper_response_result = await scraper_task
+    finally:
+        scraper_task.cancel()
+
+    if search_results is None:
+        search_results = [None] * (len(requery) + 1)
+
+    logger.info("Completed search_products_comprehensive_async")
+    return scraper_response_result, search_results[0], dict(zip(requery, search_results[1:], strict=True))
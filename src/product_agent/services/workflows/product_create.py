@@ -1,30 +1,49 @@
-from typing import Protocol, TypedDict
+import asyncio
+from typing import Protocol, TypedDict, cast
+from collections.abc import Awaitable, Callable
 import json
-from product_agent.infrastructure.llm.prompts import PromptVariant
+from product_agent.infrastructure.llm.prompts import PromptVariant, format_product_input
+from product_agent.infrastructure.llm.streaming import PartialResult
+from product_agent.infrastructure.llm.prompt_budget import PromptSection, assemble_prompt, compact_similar_products
 import structlog
 
 from langgraph.graph import START, StateGraph, END
+from langchain_core.runnables import RunnableConfig
 from qdrant_client.models import PointStruct
 from product_agent.models.shopify import DraftProduct, DraftResponse
 from langchain_core.output_parsers import PydanticOutputParser
 from product_agent.core.agent_configs.synthesis import SYNTHESIS_CONFIG
 from product_agent.config import build_service_container, ServiceContainer, build_synthesis_agent
 
-from product_agent.services.agent_workflows.product_creation import ShopifyProductCreateService
-from product_agent.services.infrastructure.vector_search import product_similarity_threshold_svc
+from product_agent.models.llm_input import LLMInput
+from product_agent.models.query import QueryResponse
+from product_agent.models.relevance import VectorRelevanceResponse
+from product_agent.services.infrastructure.llm import llm_service, llm_stream_service
+from product_agent.services.infrastructure.shop import shop_svc
+from product_agent.services.infrastructure.vector_search import merge_search_results
+from product_agent.services.orchestrators.product_search import search_products_comprehensive, search_products_comprehensive_async
 from product_agent.models.scraper import ScraperResponse
+from product_agent.infrastructure.shopify.types import SkuSearchResponse
+from product_agent.core.exceptions import ProductAlreadyExists
 
 logger = structlog.get_logger(__name__)
 
 class AgentProtocol(Protocol):
     """Protocol for abstracting the agent workflow"""
-    def service_workflow(self, query: str):
+    async def service_workflow(self, prompt: PromptVariant, request_id: str, on_partial_draft: Callable[[PartialResult], Awaitable[None]] | None = None) -> DraftResponse | None:
+        """
+        Create a draft product for the request
+
+        on_partial_draft is awaited with the draft so far as it streams, raises
+        ProductAlreadyExists when a requested sku or barcode is already in the store
+        """
         ...
 
 class AgentState(TypedDict):
     """State of agent operations"""
     request_id:             str
-    query:                  PromptVariant # the original query the user writes
+    prompt:                 PromptVariant # the request as the user sent it, brand, product and variants
+    query:                  str # the prompt formatted for the llm and scraper
     adapted_search_string:  str # the upgraded google search query
     validated_data:         dict # dictionary representation of the product and its internal data
     web_scraped_data:       ScraperResponse # the result of the web scraping operation
@@ -32,6 +51,7 @@ class AgentState(TypedDict):
     filled_data:            DraftProduct # fill the draft struct with draft data
     shopify_response:       DraftResponse
     inventory_filled:       bool
+    existing_products:      dict[str, SkuSearchResponse] # skus or barcodes already in the store
 
 class ShopifyProductWorkflow:
     def __init__(self, container: ServiceContainer):
@@ -47,14 +67,19 @@ class ShopifyProductWorkflow:
         self.shop = container.shop
         self.scraper = container.scraper
         self.vector_db = container.vector_db
+        self.async_vector_db = container.async_vector_db
         self.embeddor = container.embeddor
         self.llm = container.llm["open_ai"]
-
-        self.product_create_service = ShopifyProductCreateService(sc=container, tools=None)
+        # Drafts go through the batch api when draft_creation is in batch mode
+        self.draft_llm = container.batch_client("draft_creation") or self.llm
+        self.llm_cache = container.llm_cache
+        self.model_health = container.model_health
+        self.fill_data_token_budget = container.token_budget("draft_creation")
 
         self.agent = build_synthesis_agent(container, SYNTHESIS_CONFIG)
 
         self.workflow = StateGraph(AgentState)
+        self.workflow.add_node("check_if_exists", self.check_if_exists)
         self.workflow.add_node("query_extract", self.query_extract)
         self.workflow.add_node("query_scrape", self.query_scrape)
         self.workflow.add_node("query_synthesis", self.query_synthesis)
@@ -62,11 +87,14 @@ class ShopifyProductWorkflow:
         self.workflow.add_node("post_shopify", self.post_shopify)
         self.workflow.add_node("inventory_filled", self.inventory)
 
-        self.workflow.add_edge(START, "query_extract")
+        self.workflow.add_edge(START, "check_if_exists")
+        # Stop before any scraping or llm spend when a variant is already listed
+        self.workflow.add_conditional_edges("check_if_exists", self.route_existing, {"exists": END, "new": "query_extract"})
         self.workflow.add_edge("query_extract", "query_scrape")
         self.workflow.add_edge("query_scrape", "query_synthesis")
         self.workflow.add_edge("query_synthesis", "fill_data")
-        self.workflow.add_edge("fill_data", "post_shopify")
+        # The drafted skus are checked as they stream, a match stops before posting
+        self.workflow.add_conditional_edges("fill_data", self.route_existing, {"exists": END, "new": "post_shopify"})
         self.workflow.add_edge("post_shopify", "inventory_filled")
         self.workflow.add_edge("inventory_filled", END)
 
@@ -79,26 +107,63 @@ class ShopifyProductWorkflow:
             logger.error("No request id retrieved", state=state)
             raise ValueError("No request id retrieved")
         
-        query = state.get("query", None)
-        if query is None:
+        prompt = state.get("prompt", None)
+        if prompt is None:
             logger.error("No Query schema recieved", state=state)
 
-        query_response = await self.product_create_service.query_extract(request_id, query)
+        llm_input = LLMInput(
+            model="scraper_mini",
+            system_query="Rewrite the product request as the google search most likely to find the product's own pages, keep the brand and product name",
+            user_query=state["query"],
+            response_schema=QueryResponse
+        )
+        query_response = await llm_service(llm_input, self.llm, cache=self.llm_cache, call_site="query_extract")
         return {
             "adapted_search_string": query_response.adapted_search_string,
         }
 
-    def check_if_exists(self, state: AgentState):
-        """Check if product already exists in the store."""
-        # TODO: Implement product existence check
-        # use the services to one line these nodes
-        pass
+    async def check_if_exists(self, state: AgentState):
+        """Check every requested sku and barcode against the store in one batched lookup"""
+        request_id = state.get("request_id", None)
+        logger.debug("Started check_if_exists node", request_id=request_id if request_id else "Unknown")
+
+        prompt = state.get("prompt", None)
+        variants = prompt.variants if prompt is not None else []
+        if not variants:
+            return {"existing_products": {}}
+
+        existing = await self.shop.search_by_skus(
+            skus=[variant.sku for variant in variants],
+            barcodes=[variant.barcode for variant in variants]
+        )
+        if existing is None:
+            # A failed lookup shouldnt block creation, the draft is reviewed before it goes live
+            logger.warning("Existence check failed, continuing", request_id=request_id if request_id else "Unknown")
+            existing = {}
+
+        logger.info("Completed check_if_exists", existing=list(existing), request_id=request_id if request_id else "Unknown")
+        return {"existing_products": existing}
 
-    def query_scrape(self, state: AgentState):
+    def route_existing(self, state: AgentState) -> str:
+        return "exists" if state.get("existing_products") else "new"
+
+    async def query_scrape(self, state: AgentState):
         """A simple scrape search node in the pipeline"""
         request_id = state.get("request_id", None)
         logger.debug("Started query_scrape node", request_id=request_id if request_id else "Unknown")
-        search_products_and_similar = search_products_comprehensive(query=state["query"], scraper=self.scraper, embeddor=self.embeddor, vector_db=self.vector_db, llm=self.llm)
+        if self.async_vector_db is not None:
+            # The adapted search string is searched alongside the query in the same round trip
+            adapted_search_string = state.get("adapted_search_string")
+            scraped, similar, requery_results = await search_products_comprehensive_async(
+                query=state["query"],
+                scraper=self.scraper,
+                embeddor=self.embeddor,
+                vector_db=self.async_vector_db,
+                requery=[adapted_search_string] if adapted_search_string else None
+            )
+            search_products_and_similar = (scraped, merge_search_results([similar or [], *[points or [] for points in requery_results.values()]], 4))
+        else:
+            search_products_and_similar = search_products_comprehensive(query=state["query"], scraper=self.scraper, embeddor=self.embeddor, vector_db=self.vector_db, llm=self.llm)
         
         logger.debug("Similar Products Returned: %s", search_products_and_similar[1])
         logger.info("Completed query_scrape", request_id=request_id if request_id else "Unknown")
@@ -164,22 +229,22 @@ IMPORTANT: If you need to call get_similar_products, DO IT NOW before returning
         logger.info(f"Action taken: {relevance_result.action_taken}", request_id=request_id if request_id else "Unknown")
         logger.debug(f"Reasoning: {relevance_result.reasoning}", request_id=request_id if request_id else "Unknown")
         
+        synthesised_products: list = similar_products
         if relevance_result.action_taken == "requery":
             # Note: The LLM returns simplified dicts, but we need to keep original PointStruct objects
             # For now, just log that a requery happened - the tool should have updated the data
             if not relevance_result.similar_products:
                 raise Exception("Agent claimed to requery but returned empty results")
 
-            similar_products = relevance_result.similar_products
+            synthesised_products = relevance_result.similar_products
             logger.info("Agent performed requery for better similar products", request_id=request_id if request_id else "Unknown")
 
         logger.info("Complete query_synthesis", request_id=request_id if request_id else "Unknown")
         return {
-            "web_scraped_data": web_data,
-            "similar_products": similar_products
+            "similar_products": synthesised_products
         }
 
-    async def fill_data(self, state: AgentState):
+    async def fill_data(self, state: AgentState, config: RunnableConfig):
         """A node that builds out the draft product for our shopify store"""
         request_id = state.get("request_id", None)
         logger.debug("Started fill_data node", request_id=request_id if request_id else "Unknown")
@@ -187,18 +252,7 @@ IMPORTANT: If you need to call get_similar_products, DO IT NOW before returning
         parser = PydanticOutputParser(pydantic_object=DraftProduct)
         format_instructions = parser.get_format_instructions()
 
-        prompt = f"""CREATE PRODUCT LISTING
-
-USER'S VARIANT SPECIFICATIONS (USE THESE EXACTLY):
-{state["validated_data"]}
-
-WEB SCRAPED DATA (for product details):
-{state["web_scraped_data"]}
-
-SIMILAR PRODUCTS (for style/formatting reference):
-{json.dumps(state["similar_products"], default=str)}
-
-INSTRUCTIONS:
+        instructions = """INSTRUCTIONS:
 1. VARIANTS: Create exactly the variants specified in validated_data (with their SKUs, barcodes, prices)
 2. TITLE: Extract complete product name from scraped data -> Vendor Name then product name ALWAYS
 3. DESCRIPTION: Synthesize from scraped data in HTML format
@@ -216,8 +270,8 @@ CRITICAL RULE FOR BABY_OPTIONS:
 EXAMPLE:
 If variants are:
 [
-  {{"option1_value": {{"option_name": "Size", "option_value": "50 g"}}, "option2_value": {{"option_name": "Flavor", "option_value": "Chocolate"}}, ...}},
-  {{"option1_value": {{"option_name": "Size", "option_value": "50 g"}}, "option2_value": {{"option_name": "Flavor", "option_value": "Vanilla"}}, ...}}
+  {"option1_value": {"option_name": "Size", "option_value": "50 g"}, "option2_value": {"option_name": "Flavor", "option_value": "Chocolate"}, ...},
+  {"option1_value": {"option_name": "Size", "option_value": "50 g"}, "option2_value": {"option_name": "Flavor", "option_value": "Vanilla"}, ...}
 ]
 
 Then:
@@ -230,21 +284,65 @@ EXAMPLE - If similar products have:
 
 Then use the SAME style for your product.
 """
-        from ..models.llm_input import LLMInput
+        # Similar products are only a style reference so they go first, then the scraped pages
+        prompt = assemble_prompt(
+            sections=[
+                PromptSection(
+                    name="validated_data",
+                    text=f"CREATE PRODUCT LISTING\n\nUSER'S VARIANT SPECIFICATIONS (USE THESE EXACTLY):\n{state['validated_data']}"
+                ),
+                PromptSection(
+                    name="web_scraped_data",
+                    text=f"WEB SCRAPED DATA (for product details):\n{state['web_scraped_data']}",
+                    trim_priority=2
+                ),
+                PromptSection(
+                    name="similar_products",
+                    text=f"SIMILAR PRODUCTS (for style/formatting reference):\n{json.dumps(compact_similar_products(state['similar_products']), default=str)}",
+                    trim_priority=1
+                ),
+                PromptSection(name="instructions", text=instructions),
+            ],
+            budget=self.fill_data_token_budget,
+            process="draft_creation"
+        )
+
         llm_input = LLMInput(
             model="max_deterministic",
             system_query=None,
-            user_query=prompt,
+            user_query=prompt.text,
             response_schema=DraftProduct,
             verbose=False
         )
-        from product_agent.services.infrastructure.llm import llm_service
-        fill_data_response_text = await llm_service(llm_input, self.llm)
+        on_partial_draft = config.get("configurable", {}).get("on_partial_draft")
+        sku_check = None
+
+        async def on_partial(result: PartialResult):
+            nonlocal sku_check
+            # Variants are final once streamed, check them while the rest generates
+            if "variants" in result.newly_completed and sku_check is None:
+                variants = result.partial.get("variants") or []
+                sku_check = asyncio.create_task(self.shop.search_by_skus(
+                    skus=[variant.get("sku") for variant in variants if variant.get("sku") is not None],
+                    barcodes=[variant.get("barcode") for variant in variants if variant.get("barcode") is not None]
+                ))
+            if on_partial_draft is not None:
+                await on_partial_draft(result)
+
+        try:
+            fill_data_response = await llm_stream_service(llm_input, self.draft_llm, on_partial, cache=self.llm_cache, call_site="fill_data")
+            existing = (await sku_check or {}) if sku_check is not None else {}
+        finally:
+            # A failed stream leaves the check running, dont leak it or its exception
+            if sku_check is not None:
+                sku_check.cancel()
+                await asyncio.gather(sku_check, return_exceptions=True)
 
         logger.debug("Fill Data Response: %s", fill_data_response)
         logger.info("Completed fill_data", request_id=request_id if request_id else "Unknown")
         return {
-            "filled_data": fill_data_response
+            "filled_data": fill_data_response,
+            "existing_products": existing
         }
 
     def post_shopify(self, state: AgentState):
@@ -263,7 +361,7 @@ Then use the SAME style for your product.
             "shopify_response": shop_response
         }
 
-    def inventory(self, state: AgentState):
+    async def inventory(self, state: AgentState):
         request_id = state.get("request_id", None)
         logger.debug("Started inventory node", request_id=request_id if request_id else "Unknown")
 
@@ -271,32 +369,36 @@ Then use the SAME style for your product.
 
         inv_item_ids = draft_response.variant_inventory_item_ids
 
-        completed = 0
-        failed = 0
-        for item in inv_item_ids:
-            try:
-                completed = self.shop.fill_inventory(inventory_data=item)
-                if completed:
-                    completed += 1
-            except Exception as e:
-                logger.error(f"item {item.inventory_item_id} failed to updated inventory", request_id=request_id if request_id else "Unknown")
-                failed += 1
-
-        logger.info(f"Completed inventory, Completed {completed}, Failed {failed}", request_id=request_id if request_id else "Unknown")
-        if failed > 0:
-            return {
-                "inventory_filled": False
-            }
-        
+        # Every variant x location in one batched path rather than a round trip each
+        inventory_result = await self.shop.fill_inventories(inventory_data=inv_item_ids)
+        failed = inventory_result.failed()
+        for item in failed:
+            logger.error(f"item {item.inventory_item_id} failed to updated inventory", errors=item.errors, request_id=request_id if request_id else "Unknown")
+
+        logger.info(f"Completed inventory, Completed {len(inventory_result.items) - len(failed)}, Failed {len(failed)}", request_id=request_id if request_id else "Unknown")
         return {
-                "inventory_filled": True
-            } 
+            "inventory_filled": inventory_result.all_succeeded
+        }
+
+    async def service_workflow(self, prompt: PromptVariant, request_id: str, on_partial_draft: Callable[[PartialResult], Awaitable[None]] | None = None) -> DraftResponse | None:
+        """
+        Run the workflow for one request
 
-    async def service_workflow(self, query: str, request_id: str) -> DraftResponse:
+        on_partial_draft is awaited with the draft so far as fill_data streams it
+        """
         logger.info("Starting service workflow", request_id=request_id if request_id else "Unknown")
 
-        result = self.app.invoke({"query": query, "request_id": request_id})
-        return result.get("shopify_response", None)
+        config: RunnableConfig = {"configurable": {"on_partial_draft": on_partial_draft}}
+        result = await self.app.ainvoke(
+            cast(AgentState, {"prompt": prompt, "query": format_product_input(prompt), "request_id": request_id}),
+            config=config
+        )
+        existing = result.get("existing_products")
+        if existing:
+            raise ProductAlreadyExists(existing=existing)
+
+        response: DraftResponse | None = result.get("shopify_response", None)
+        return response
 
 def create_agent() -> ShopifyProductWorkflow:
     """
@@ -311,4 +413,4 @@ def create_agent() -> ShopifyProductWorkflow:
 
     except AttributeError as e:
         logger.error("Failed to create agent", error=str(e))
-        raise
\ No newline at end of file
+        raise
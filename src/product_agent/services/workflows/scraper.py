@@ -1,15 +1,11 @@
 import inspect
-import json
-from typing import TypedDict, Dict
+from typing import TypedDict
 import structlog
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.state import Command
 
 from product_agent.config.container import ServiceContainer
-from product_agent.core.agent_configs.scraper import SCRAPER_AGENT_SYSTEM_PROMPT
-from product_agent.models.llm_input import LLMInput
-from product_agent.services.infrastructure.llm import llm_service
 from product_agent.services.infrastructure.scraping import getting_urls_svc, batch_scraping_url_svc
 from product_agent.services.orchestrators.content_extraction import analyse_markdowns_with_llm_svc
 
@@ -24,7 +20,8 @@ class ScraperState(TypedDict):
     urls:                       list
     current_index:              int = 0
     markdowns:                  list
-    summaries:                  list[Dict]
+    markdown_urls:              list | None # url of each markdown when the scraper returned one per url
+    summaries:                  list[dict]
     retry_count:                int = 0
     failed_urls:                list
 
@@ -83,8 +80,11 @@ class ScraperWorkflow:
         urls_to_index = state["urls"][ci:index_max]
         logger.debug("Sending %s urls", len(urls_to_index), urls=urls_to_index)
         markdowns = batch_scraping_url_svc(urls=urls_to_index, scraper=self.service_container.scraper)
+        if len(markdowns) != len(urls_to_index):
+            logger.warning("Scraper dropped urls, markdowns cant be matched to their urls", urls=len(urls_to_index), markdowns=len(markdowns))
         return {
             "markdowns": markdowns,
+            "markdown_urls": urls_to_index if len(markdowns) == len(urls_to_index) else None,
             "current_index": index_max
         }
 
@@ -101,7 +101,11 @@ class ScraperWorkflow:
         synthesis_results = await analyse_markdowns_with_llm_svc(
             state["markdowns"],
             llm=llm_config.client,
-            model=llm_config.model
+            model=llm_config.model,
+            cache=self.service_container.llm_cache,
+            markdown_cache=self.service_container.markdown_cache,
+            token_budget=self.service_container.token_budget(node_key),
+            urls=state.get("markdown_urls")
         )
         logger.debug(
             "Returned results from LLM",
@@ -181,4 +185,4 @@ class ScraperWorkflow:
             "summaries": [],
             "retry_count": 0,
             "failed_urls": [],
-        })
\ No newline at end of file
+        })
@@ -10,6 +10,7 @@ from .vector_db_mock import MockVectorDb
 from .embeddings_mock import MockEmbeddor
 from .llm_mock import MockLLM
 from .synthesis_mock import MockSynthesisAgent
+from .kv_mock import MockKV
 
 __all__ = [
     "MockShop",
@@ -18,4 +19,5 @@ __all__ = [
     "MockEmbeddor",
     "MockLLM",
     "MockSynthesisAgent",
+    "MockKV",
 ]
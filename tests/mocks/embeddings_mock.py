@@ -1,4 +1,5 @@
 import random
+import numpy as np
 
 class MockEmbeddor:
     def __init__(self):
@@ -27,11 +28,11 @@ class MockEmbeddor:
         result.extend([random.uniform(-5, 5) for i in range(15)])
         return result
 
-    def embed_documents(self, documents: list[str]) -> list[list[float]] | None:
+    def embed_documents(self, documents: list[str]) -> np.ndarray | None:
         self.callback += 1
         embeds: list = []
-        for document in documents:
+        for _ in documents:
             embeds.append([random.uniform(-3, 3) for i in range (15)])
 
         print("MockedEmbeddor.embed_documents returned embeds")
-        return embeds
\ No newline at end of file
+        return np.asarray(embeds, dtype=np.float32).reshape(len(documents), 15)
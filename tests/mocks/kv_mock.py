@@ -0,0 +1,49 @@
+import json
+import time
+
+class MockKV:
+    """In memory stand in for the redis KV_DB, hashes are plain dicts"""
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.values: dict[str, tuple[str | bytes, float | None]] = {}
+
+    def get_data(self, database_name: str, key: str):
+        return self.hashes.get(database_name, {}).get(key)
+
+    def del_data(self, database_name: str, key: str):
+        return 1 if self.hashes.get(database_name, {}).pop(key, None) is not None else 0
+
+    def hset_data(self, database_name: str, key: str, data: dict):
+        self.hashes.setdefault(database_name, {})[key] = json.dumps(data, default=str)
+        return 1
+
+    def hgetall_data(self, database_name: str) -> dict[str, str]:
+        return dict(self.hashes.get(database_name, {}))
+
+    def hget_many(self, database_name: str, keys: list[str]) -> list[str | None]:
+        return [self.hashes.get(database_name, {}).get(key) for key in keys]
+
+    def hset_many(self, database_name: str, mapping: dict[str, str]):
+        self.hashes.setdefault(database_name, {}).update(mapping)
+        return len(mapping)
+
+    def hdel_many(self, database_name: str, keys: list[str]):
+        removed = [key for key in keys if self.hashes.get(database_name, {}).pop(key, None) is not None]
+        return len(removed)
+
+    def get_value(self, key: str) -> str | None:
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and time.time() >= expires_at:
+            self.values.pop(key, None)
+            return None
+        return value
+
+    def set_value(self, key: str, value: str, ttl_seconds: int | None = None):
+        self.values[key] = (value, time.time() + ttl_seconds if ttl_seconds else None)
+        return True
+
+    def get_bytes_many(self, keys: list[str]) -> list[bytes | None]:
+        return [self.get_value(key) for key in keys]
+
+    def set_bytes_many(self, mapping: dict[str, bytes], ttl_seconds: int | None = None):
+        return [self.set_value(key, value, ttl_seconds) for key, value in mapping.items()]
@@ -5,7 +5,7 @@ from polyfactory.factories.pydantic_factory import ModelFactory
 from product_agent.models.shopify import Fields, AllShopifyProducts
 
 from product_agent.models.shopify import DraftResponse, DraftProduct
-from product_agent.infrastructure.shopify.types import Inventory, Inputs, SkuSearchResponse, Product
+from product_agent.infrastructure.shopify.types import Inventory, Inputs, SkuSearchResponse, Product, InventoryItemResult, InventoryBatchResult
 from product_agent.infrastructure.shopify.exceptions import ShopifyError
 
 logger = structlog.getLogger(__name__)
@@ -55,9 +55,22 @@ class MockShop:
         faked_by_faking_lib_result = FakingShopifyProduct.build()
         return faked_by_faking_lib_result.products
 
+    async def stream_products_from_store(self, fields: Fields | None = None, page_size: int = 250, bulk: bool = False, updated_at_min: str | None = None):
+        """Mock streaming the store, the faked products split into pages"""
+        products = self.get_products_from_store(fields=fields)
+        for start in range(0, len(products), page_size):
+            yield products[start:start + page_size]
+
     def fill_inventory(self, inventory_data: Inventory):
         """Simulating filling stores inventory"""
         print("Inventory Filled")    
+
+    async def fill_inventories(self, inventory_data: list[Inventory]) -> InventoryBatchResult:
+        """Simulating the batched inventory path, every item succeeds"""
+        return InventoryBatchResult(items=[
+            InventoryItemResult(inventory_item_id=item.inventory_item_id, activated=True, quantities_set=True)
+            for item in inventory_data
+        ])
     
     async def search_by_sku(self, sku: int) -> SkuSearchResponse | None:
         """Mock search by SKU in your store"""
@@ -69,3 +82,12 @@ class MockShop:
             sku=str(sku),
             product=Product(title="Optimum Nutrition Gold Standard Whey Protein")
         )
+
+    async def search_by_skus(self, skus: list[int | str], barcodes: list[int | str] | None = None) -> dict[str, SkuSearchResponse] | None:
+        """Mock batch search, same rule as search_by_sku for every sku"""
+        existing = {}
+        for sku in skus:
+            match = await self.search_by_sku(sku=int(sku))
+            if match is not None:
+                existing[str(sku)] = match
+        return existing
@@ -28,7 +28,7 @@ class MockVectorDb:
         self.seen = {}
         self.upsert_call_count = 0
 
-    def upsert_points(self, collection_name: str, points: list[PointStruct]) -> DbResponse | None:
+    def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
         logger.debug("Called: MockVectorDb.upsert_points")
         self.points.extend(points)
         self.upsert_call_count += 1
@@ -66,6 +66,16 @@ class MockVectorDb:
             traceback=None
         )
     
+    def retrieve_payloads(self, collection_name: str, point_ids: list, keys: list[str] | None = None) -> dict:
+        wanted = set(point_ids)
+        return {point.id: point.payload for point in self.points if point.id in wanted}
+
+    def scroll_point_ids(self, collection_name: str, vector_filter=None) -> list:
+        return [
+            point.id for point in self.points
+            if vector_filter is None or (point.payload or {}).get(vector_filter.key) == vector_filter.value
+        ]
+
     def search_points(self, collection_name: str, query_vector: list[float], k: int) -> list:
         # Note: collection_name and query_vector are unused in mock implementation
         # Return 10 hardcoded points with scores from 95 down to 30 for deterministic testing
@@ -228,4 +238,4 @@ class MockVectorDb:
                 ),
             ]
             return mock_points
-        
\ No newline at end of file
+        
@@ -0,0 +1,104 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from product_agent.api.app import close_agent_clients, create_app
+from product_agent.infrastructure.llm.response_cache import LLMResponseCache
+from product_agent.infrastructure.llm.router import ModelHealthRegistry
+from tests.mocks.kv_mock import MockKV
+
+class Closable:
+    def __init__(self, fail: bool = False):
+        self.closed = False
+        self.fail = fail
+
+    async def aclose(self):
+        self.closed = True
+        if self.fail:
+            raise RuntimeError("close failed")
+
+    async def close(self):
+        await self.aclose()
+
+class FakeAgent:
+    def __init__(self, fail_llm: bool = False):
+        self.llm = Closable(fail=fail_llm)
+        self.async_vector_db = Closable()
+        self.model_health = ModelHealthRegistry()
+        self.llm_cache = LLMResponseCache()
+
+# ---------------------------------------------------------------------------
+
+class TestLifespanShutdown:
+    def test_closes_pool_and_agent_clients(self):
+        agent = FakeAgent()
+        pool = Closable()
+        app = create_app(agent=agent, job_database=MockKV(), start_consumer=False, shop_pool=pool)
+
+        with TestClient(app):
+            assert not pool.closed
+
+        assert pool.closed
+        assert agent.llm.closed
+        assert agent.async_vector_db.closed
+
+    def test_failed_pool_close_still_closes_agent_clients(self):
+        agent = FakeAgent()
+        pool = Closable(fail=True)
+        app = create_app(agent=agent, job_database=MockKV(), start_consumer=False, shop_pool=pool)
+
+        with pytest.raises(RuntimeError):
+            with TestClient(app):
+                pass
+
+        assert agent.llm.closed
+        assert agent.async_vector_db.closed
+
+# ---------------------------------------------------------------------------
+
+class TestCloseAgentClients:
+    @pytest.mark.asyncio
+    async def test_failed_close_does_not_skip_the_rest(self):
+        agent = FakeAgent(fail_llm=True)
+
+        await close_agent_clients(agent)
+
+        assert agent.llm.closed
+        assert agent.async_vector_db.closed
+
+    @pytest.mark.asyncio
+    async def test_agent_without_clients(self):
+        await close_agent_clients(object())
+
+# ---------------------------------------------------------------------------
+
+class TestLlmMetricsRoute:
+    def test_reports_router_latency_and_decisions(self):
+        agent = FakeAgent()
+        agent.model_health.record_success("gpt-4o", 0.5)
+        agent.model_health.record_error("gpt-4o")
+        agent.model_health.record_decision("draft_creation", "primary", "gpt-4o")
+        app = create_app(agent=agent, job_database=MockKV(), start_consumer=False, shop_pool=Closable())
+
+        with TestClient(app) as client:
+            response = client.get("/internal/metrics/llm")
+
+        router = response.json()["router"]
+        assert router["models"] == [{
+            "model": "gpt-4o", "requests": 2, "errors": 1, "samples": 1,
+            "p50_seconds": 0.5, "p95_seconds": 0.5, "error_rate": 0.5, "degraded": False
+        }]
+        assert router["decisions"] == [{"process": "draft_creation", "decision": "primary", "model": "gpt-4o", "count": 1}]
+
+    def test_reports_response_cache_hits_per_call_site(self):
+        agent = FakeAgent()
+        agent.llm_cache.set("key", "cached answer")
+        agent.llm_cache.get("key", None, call_site="fill_data")
+        agent.llm_cache.get("other", None, call_site="fill_data")
+        app = create_app(agent=agent, job_database=MockKV(), start_consumer=False, shop_pool=Closable())
+
+        with TestClient(app) as client:
+            response = client.get("/internal/metrics/llm")
+
+        assert response.json()["response_cache"] == [
+            {"call_site": "fill_data", "memory_hits": 1, "redis_hits": 0, "misses": 1, "hit_ratio": 0.5}
+        ]
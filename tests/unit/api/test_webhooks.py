@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from product_agent.api.consumers import consume_catalogue_events
+from product_agent.api.routes.product import router
+from product_agent.infrastructure.shopify.webhooks import verify_webhook_hmac
+from product_agent.services.orchestrators.catalogue_sync import product_point_id
+from tests.mocks.kv_mock import MockKV
+from tests.unit.services.orchestrators.test_catalogue_sync import FakeEmbeddor, FakeVectorDb
+
+SECRET = "webhook-secret"
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+def build_app(queue: asyncio.Queue) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    app.state.catalogue_queue = queue
+    app.state.webhook_secret = SECRET
+    return app
+
+def post_webhook(client: TestClient, topic: str, payload: dict, signature: str | None = None):
+    body = json.dumps(payload).encode()
+    return client.post(
+        "/webhooks/shopify/products",
+        content=body,
+        headers={
+            "X-Shopify-Topic": topic,
+            "X-Shopify-Shop-Domain": "test-shop.myshopify.com",
+            "X-Shopify-Hmac-Sha256": signature if signature is not None else sign(body),
+        }
+    )
+
+# -----------------------------------------------------------------------------
+# Unit Tests
+# -----------------------------------------------------------------------------
+
+class TestWebhookHmac:
+    """Signature checks against the raw body."""
+
+    def test_valid_signature(self):
+        assert verify_webhook_hmac(b'{"id": 1}', sign(b'{"id": 1}'), SECRET)
+
+    def test_tampered_body_or_missing_secret(self):
+        assert not verify_webhook_hmac(b'{"id": 2}', sign(b'{"id": 1}'), SECRET)
+        assert not verify_webhook_hmac(b'{"id": 1}', sign(b'{"id": 1}'), None)
+        assert not verify_webhook_hmac(b'{"id": 1}', None, SECRET)
+
+
+class TestProductWebhookRoute:
+    """The route only verifies and enqueues."""
+
+    def test_signed_update_is_queued(self):
+        queue = asyncio.Queue()
+        client = TestClient(build_app(queue))
+
+        response = post_webhook(client, "products/update", {"id": 7, "title": "Whey", "variants": []})
+
+        assert response.status_code == 200
+        event = queue.get_nowait()
+        assert event.shop_name == "test-shop"
+        assert event.product.title == "Whey"
+
+    def test_bad_signature_is_rejected(self):
+        queue = asyncio.Queue()
+        client = TestClient(build_app(queue))
+
+        response = post_webhook(client, "products/update", {"id": 7}, signature=sign(b"other"))
+
+        assert response.status_code == 401
+        assert queue.empty()
+
+    @pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b'{"title": "Whey"}', b'{"id": 7, "variants": [{"price": {"amount": 1}}]}'])
+    def test_malformed_body_is_acknowledged_and_dropped(self, body):
+        queue = asyncio.Queue()
+        client = TestClient(build_app(queue))
+
+        response = client.post(
+            "/webhooks/shopify/products",
+            content=body,
+            headers={
+                "X-Shopify-Topic": "products/update",
+                "X-Shopify-Shop-Domain": "test-shop.myshopify.com",
+                "X-Shopify-Hmac-Sha256": sign(body),
+            }
+        )
+
+        assert response.status_code == 200
+        assert queue.empty()
+
+    def test_full_queue_asks_shopify_to_retry(self):
+        queue = asyncio.Queue(maxsize=1)
+        queue.put_nowait(object())
+        client = TestClient(build_app(queue))
+
+        assert post_webhook(client, "products/delete", {"id": 7}).status_code == 503
+
+
+class TestCatalogueConsumer:
+    """Events are applied in batches, latest event per product wins."""
+
+    @pytest.mark.asyncio
+    async def test_batch_collapses_updates_and_applies_deletes(self):
+        queue = asyncio.Queue()
+        client = TestClient(build_app(queue))
+        post_webhook(client, "products/create", {"id": 1, "title": "Whey", "variants": [{"id": 11, "sku": "A1", "position": 1}]})
+        post_webhook(client, "products/update", {"id": 1, "title": "Whey Isolate", "variants": [{"id": 11, "sku": "A1", "position": 1}]})
+        post_webhook(client, "products/create", {"id": 2, "title": "Creatine", "variants": []})
+        post_webhook(client, "products/delete", {"id": 2})
+
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        worker = asyncio.create_task(consume_catalogue_events(queue, vector_db, embeddor, kv, "products", batch_wait=0.05))
+        await asyncio.wait_for(queue.join(), timeout=5)
+        worker.cancel()
+
+        assert embeddor.embedded == ["Whey Isolate"]
+        assert set(vector_db.points) == {product_point_id(1)}
+        assert "A1" in kv.hgetall_data("sku_index:test-shop:skus")
@@ -0,0 +1,59 @@
+"""
+Tests for the per request RealServiceContainer builder.
+"""
+import pytest
+
+from product_agent.config.container import RealServiceContainer
+from product_agent.config.dependencies.shop import EcommerceInit
+from product_agent.infrastructure.vector_db.embedding_cache import CachedEmbeddor
+from tests.mocks.kv_mock import MockKV
+from tests.mocks.llm_mock import MockLLM
+
+
+class FakeShopInit(EcommerceInit):
+    shop_name = "test-shop"
+
+    async def build_shop(self, sku_index=None):
+        self.sku_index = sku_index
+        return self
+
+
+@pytest.fixture
+def real_container(monkeypatch):
+    monkeypatch.setenv("QDRANT_URL", "http://localhost:6333")
+    monkeypatch.setenv("QDRANT_API_KEY", "test-key")
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+    monkeypatch.delenv("LLM_BATCH_PROCESSES", raising=False)
+    container = RealServiceContainer()
+    container._kv_db = MockKV()
+    return container
+
+
+async def build(real_container: RealServiceContainer, shop: EcommerceInit):
+    return await real_container.build_service_container(
+        shop=shop,
+        scraper_key="scraper-key",
+        embeddor_key="embeddor-key",
+        gemini_llm=MockLLM(),
+        open_ai_llm=MockLLM(),
+        image_scraper=None,
+        subscription="admin",
+        tenant_id="tenant"
+    )
+
+
+class TestRealServiceContainer:
+    """Every request container gets the same caches as the local builder, shared across requests."""
+
+    @pytest.mark.asyncio
+    async def test_caches_are_wired_and_shared(self, real_container):
+        first = await build(real_container, FakeShopInit())
+        second = await build(real_container, FakeShopInit())
+
+        assert isinstance(first.embeddor, CachedEmbeddor)
+        assert first.embeddor is second.embeddor
+        assert first.llm_cache is not None and first.llm_cache is second.llm_cache
+        assert first.markdown_cache is not None and first.markdown_cache is second.markdown_cache
+        assert first.model_health is second.model_health
+        assert first.shop.sku_index is second.shop.sku_index
+        assert first.token_budget("draft_creation") == 24000
@@ -3,13 +3,18 @@ Tests for the ShopifyProductWorkflow agent.
 
 Unit tests use mock dependencies, integration tests use real services.
 """
+import asyncio
+import os
 import pytest
 import uuid
 
 from product_agent.services.workflows.product_create import ShopifyProductWorkflow
 from product_agent.infrastructure.llm.prompts import format_product_input, PromptVariant
 from product_agent.models.shopify import Option, Variant, InventoryAtStores
-from product_agent.config import ServiceContainer, build_service_container
+from product_agent.infrastructure.shopify.types import SkuSearchResponse, Product
+from product_agent.config import build_service_container
+from product_agent.core.exceptions import ProductAlreadyExists
+from product_agent.infrastructure.llm.streaming import PartialResult
 
 
 # -----------------------------------------------------------------------------
@@ -42,17 +47,13 @@ def sample_prompt_variant():
 
 
 @pytest.fixture
-def workflow_with_mocks(mock_shop, mock_scraper, mock_vector_db, mock_embeddor, mock_llm):
+def workflow_with_mocks(mock_service_container, monkeypatch):
     """Create a ShopifyProductWorkflow with all mock dependencies."""
-    container = ServiceContainer(
-        shop=mock_shop,
-        scraper=mock_scraper,
-        vector_db=mock_vector_db,
-        embeddor=mock_embeddor,
-        llm=mock_llm
-    )
+    # The synthesis agent builds a ChatOpenAI client, which wants a key but makes no calls here
+    if not os.getenv("OPENAI_API_KEY"):
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
 
-    return ShopifyProductWorkflow(container=container)
+    return ShopifyProductWorkflow(container=mock_service_container)
 
 
 # -----------------------------------------------------------------------------
@@ -82,6 +83,109 @@ class TestShopifyProductWorkflow:
         assert "15" in query or "inventory" in query.lower()
 
 
+class RecordingShop:
+    """Answers search_by_skus from a fixed map and remembers what it was asked"""
+    def __init__(self, existing: dict | None):
+        self.existing = existing
+        self.calls = []
+
+    async def search_by_skus(self, skus, barcodes=None):
+        self.calls.append((list(skus), list(barcodes or [])))
+        return self.existing
+
+
+def node_workflow(shop) -> ShopifyProductWorkflow:
+    """A workflow holding only the shop, enough to drive check_if_exists"""
+    workflow = ShopifyProductWorkflow.__new__(ShopifyProductWorkflow)
+    workflow.shop = shop
+    return workflow
+
+
+class TestCheckIfExists:
+    """check_if_exists reads the requested variants from the workflow state."""
+
+    @pytest.mark.asyncio
+    async def test_searches_every_requested_variant(self, sample_prompt_variant):
+        match = SkuSearchResponse(sku="922026", product=Product(title="Oxyshred Protein Lean Bar", id="1"))
+        shop = RecordingShop({"922026": match})
+        workflow = node_workflow(shop)
+
+        result = await workflow.check_if_exists({"prompt": sample_prompt_variant, "request_id": "r1"})
+
+        variant = sample_prompt_variant.variants[0]
+        assert shop.calls == [([variant.sku], [variant.barcode])]
+        assert result == {"existing_products": {"922026": match}}
+        assert workflow.route_existing(result) == "exists"
+
+    @pytest.mark.asyncio
+    async def test_new_product_routes_on(self, sample_prompt_variant):
+        workflow = node_workflow(RecordingShop({}))
+
+        result = await workflow.check_if_exists({"prompt": sample_prompt_variant, "request_id": "r1"})
+
+        assert result == {"existing_products": {}}
+        assert workflow.route_existing(result) == "new"
+
+    @pytest.mark.asyncio
+    async def test_failed_lookup_does_not_block_creation(self, sample_prompt_variant):
+        workflow = node_workflow(RecordingShop(None))
+
+        result = await workflow.check_if_exists({"prompt": sample_prompt_variant, "request_id": "r1"})
+
+        assert result == {"existing_products": {}}
+
+    @pytest.mark.asyncio
+    async def test_existing_variant_stops_the_workflow(self, workflow_with_mocks, sample_prompt_variant):
+        match = SkuSearchResponse(sku="922026", product=Product(title="Oxyshred Protein Lean Bar", id="1"))
+        shop = RecordingShop({"922026": match})
+        workflow_with_mocks.shop = shop
+
+        with pytest.raises(ProductAlreadyExists) as exc_info:
+            await workflow_with_mocks.service_workflow(prompt=sample_prompt_variant, request_id="r1")
+
+        assert exc_info.value.existing == {"922026": match}
+        assert len(shop.calls) == 1
+
+
+class HangingShop:
+    """A sku search that only ends when cancelled"""
+    def __init__(self):
+        self.cancelled = False
+
+    async def search_by_skus(self, skus, barcodes=None):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class FailingStreamLLM:
+    """Streams the variants then fails before the draft completes"""
+    async def astream(self, llm_input):
+        yield PartialResult(partial={"variants": [{"sku": 922026}]}, completed_fields=["variants"], newly_completed=["variants"], final=None)
+        await asyncio.sleep(0)
+        raise RuntimeError("stream dropped")
+
+
+class TestFillData:
+    """fill_data checks the streamed skus while the rest of the draft generates."""
+
+    @pytest.mark.asyncio
+    async def test_failed_stream_cancels_the_sku_check(self):
+        shop = HangingShop()
+        workflow = node_workflow(shop)
+        workflow.draft_llm = FailingStreamLLM()
+        workflow.llm_cache = None
+        workflow.fill_data_token_budget = 24000
+        state = {"request_id": "r1", "validated_data": {}, "web_scraped_data": None, "similar_products": []}
+
+        with pytest.raises(RuntimeError, match="stream dropped"):
+            await workflow.fill_data(state, config={})
+
+        assert shop.cancelled
+
+
 # -----------------------------------------------------------------------------
 # Integration Tests
 # -----------------------------------------------------------------------------
@@ -109,11 +213,10 @@ class TestShopifyProductWorkflowIntegration:
     @pytest.mark.asyncio
     async def test_service_workflow_runs(self, integration_workflow, sample_prompt_variant):
         """Test that the full workflow executes without errors."""
-        query = format_product_input(prompt_variant=sample_prompt_variant)
         request_id = str(uuid.uuid4())
 
         result = await integration_workflow.service_workflow(
-            query=query,
+            prompt=sample_prompt_variant,
             request_id=request_id
         )
 
@@ -1,5 +1,14 @@
+import base64
+import json
+import httpx
+import numpy as np
+import openai
 import pytest
 
+from product_agent.infrastructure.vector_db.embedding_cache import CachedEmbeddor
+from product_agent.infrastructure.vector_db.embeddings import Embeddings
+from tests.mocks.kv_mock import MockKV
+
 
 # -----------------------------------------------------------------------------
 # Test Data Fixtures
@@ -58,12 +67,13 @@ class TestMockEmbeddor:
         with pytest.raises(ValueError):
             mock_embeddor.embed_document(document="")
 
-    def test_embed_documents_returns_list(self, mock_embeddor, sample_documents):
-        """Test that embed_documents returns a list of embeddings."""
+    def test_embed_documents_returns_matrix(self, mock_embeddor, sample_documents):
+        """Test that embed_documents returns a float32 matrix of embeddings."""
         result = mock_embeddor.embed_documents(documents=sample_documents)
 
         assert result is not None
-        assert isinstance(result, list)
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == np.float32
 
     def test_embed_documents_returns_correct_count(self, mock_embeddor, sample_documents):
         """Test that embed_documents returns the correct number of embeddings."""
@@ -72,11 +82,11 @@ class TestMockEmbeddor:
         assert len(result) == len(sample_documents)
 
     def test_embed_documents_returns_vectors(self, mock_embeddor, sample_documents):
-        """Test that each embedding is a list of floats."""
+        """Test that each embedding is a row of the matrix."""
         result = mock_embeddor.embed_documents(documents=sample_documents)
 
+        assert result.ndim == 2
         for embedding in result:
-            assert isinstance(embedding, list)
             assert len(embedding) > 0
 
     def test_embed_single_document(self, mock_embeddor):
@@ -136,3 +146,146 @@ class TestEmbeddingsIntegration:
         assert result is not None
         for value in result[0][:10]:  # Check first 10 values
             assert isinstance(value, float)
+
+
+class CountingEmbeddor:
+    """Deterministic vectors, counts every text sent to be embedded"""
+    def __init__(self):
+        self.model = "test-embedding"
+        self.embedded: list[str] = []
+
+    def embed_document(self, document: str) -> list[float]:
+        self.embedded.append(document)
+        return [float(len(document)), 0.5, -1.25]
+
+    def embed_documents(self, documents: list[str]) -> list[list[float]] | None:
+        return [self.embed_document(document) for document in documents]
+
+class TestCachedEmbeddor:
+    """Unit tests for the embedding cache tiers."""
+
+    def test_repeat_queries_hit_memory(self):
+        inner = CountingEmbeddor()
+        cache = CachedEmbeddor(inner)
+
+        first = cache.embed_document("pre-workout supplement")
+        second = cache.embed_document("  Pre-Workout   supplement ")
+
+        assert first == second == [22.0, 0.5, -1.25]
+        assert inner.embedded == ["pre-workout supplement"]
+        assert cache.stats.memory_hits == 1
+
+    def test_batch_embeds_only_misses(self, sample_documents):
+        inner = CountingEmbeddor()
+        cache = CachedEmbeddor(inner)
+        cache.embed_document(sample_documents[0])
+
+        vectors = cache.embed_documents(sample_documents + [sample_documents[1]])
+
+        assert vectors.shape == (len(sample_documents) + 1, 3)
+        np.testing.assert_array_equal(vectors[-1], vectors[1])
+        # The cached one and the in batch duplicate are not embedded again
+        assert inner.embedded == [sample_documents[0]] + sample_documents[1:]
+
+    def test_redis_tier_stores_packed_float32(self):
+        kv = MockKV()
+        CachedEmbeddor(CountingEmbeddor(), kv_db=kv).embed_document("Whey protein")
+
+        key, (value, _) = next(iter(kv.values.items()))
+        assert key.startswith("embedding:test-embedding:")
+        assert isinstance(value, bytes)
+        assert len(value) == 3 * 4
+
+        inner = CountingEmbeddor()
+        other_worker = CachedEmbeddor(inner, kv_db=kv)
+        assert other_worker.embed_documents(["whey protein"]).tolist() == [[12.0, 0.5, -1.25]]
+        assert inner.embedded == []
+        assert other_worker.stats.redis_hits == 1
+
+    def test_lru_is_bounded(self):
+        cache = CachedEmbeddor(CountingEmbeddor(), max_entries=2)
+        cache.embed_documents(["a", "b", "c"])
+
+        assert len(cache) == 2
+
+
+class FakeEmbeddingsApi:
+    """The openai embeddings endpoint, vectors are [len(text), call number] as base64 float32"""
+    def __init__(self, fail_calls: set[int] | None = None):
+        self.fail_calls = fail_calls or set()
+        self.calls: list[list[str]] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.calls.append(body["input"])
+        call = len(self.calls)
+        if call in self.fail_calls:
+            return httpx.Response(500, json={"error": {"message": "server error"}})
+
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": base64.b64encode(np.array([len(text), call], dtype=np.float32).tobytes()).decode()
+            }
+            for i, text in enumerate(body["input"])
+        ]
+        # Out of order on purpose, the client sorts by index
+        return httpx.Response(200, json={
+            "object": "list",
+            "data": data[::-1],
+            "model": body["model"],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}
+        })
+
+def fake_embeddings(api: FakeEmbeddingsApi, **kwargs) -> Embeddings:
+    embeddor = Embeddings(api_key="test", retry_backoff_seconds=0, **kwargs)
+    embeddor._openai = openai.OpenAI(
+        api_key="test",
+        base_url="https://openai.test/v1",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(api.handler))
+    )
+    return embeddor
+
+class TestEmbeddingsBatching:
+    """Unit tests for batched embed_documents against a fake api."""
+
+    def test_batches_by_document_count_and_keeps_order(self, sample_documents):
+        api = FakeEmbeddingsApi()
+        embeddor = fake_embeddings(api, max_batch_documents=4, max_concurrency=2)
+
+        result = embeddor.embed_documents(sample_documents)
+
+        assert result.dtype == np.float32
+        assert result.flags["C_CONTIGUOUS"]
+        assert result.shape == (len(sample_documents), 2)
+        assert result[:, 0].tolist() == [len(document) for document in sample_documents]
+        assert sorted(len(call) for call in api.calls) == [2, 4]
+
+    def test_batches_by_token_count(self):
+        api = FakeEmbeddingsApi()
+        embeddor = fake_embeddings(api, max_batch_tokens=10)
+        embeddor._counter.count = lambda text: 4
+
+        embeddor.embed_documents(["a", "b", "c", "d", "e"])
+
+        assert sorted(len(call) for call in api.calls) == [1, 2, 2]
+
+    def test_only_failed_batches_are_retried(self, sample_documents):
+        api = FakeEmbeddingsApi(fail_calls={1})
+        embeddor = fake_embeddings(api, max_batch_documents=3, max_concurrency=1)
+
+        result = embeddor.embed_documents(sample_documents)
+
+        assert result is not None
+        assert len(api.calls) == 3
+        assert api.calls[2] == api.calls[0]
+        assert result[:, 0].tolist() == [len(document) for document in sample_documents]
+
+    def test_returns_none_when_retries_run_out(self):
+        api = FakeEmbeddingsApi(fail_calls={1, 2})
+        embeddor = fake_embeddings(api, max_retries=1)
+
+        assert embeddor.embed_documents(["Whey protein"]) is None
+        assert len(api.calls) == 2
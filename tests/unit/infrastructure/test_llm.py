@@ -4,16 +4,26 @@ Tests for LLM client and markdown_summariser function.
 Uses standardized TestCase pattern with data + expected results.
 Unit tests use mock LLM, integration tests use real OpenAI API.
 """
+import asyncio
+import io
+import json
 import random
+import time
+import httpx
 import pytest
 import os
-import sys
 from dotenv import load_dotenv
 from unittest.mock import patch, MagicMock
 
 from product_agent.models.query import QueryResponse
 from product_agent.infrastructure.llm.client import OpenAiClient
-from product_agent.infrastructure.llm.client import GeminiClient
+from product_agent.infrastructure.llm.client import GeminiClient, LLMError
+from product_agent.infrastructure.llm.batch import OpenAiBatchClient
+from product_agent.infrastructure.llm.structured import openai_response_format
+from product_agent.models.scraper import ScraperSynthesisResponse
+from product_agent.models.shopify import DraftProduct
+from product_agent.infrastructure.llm.context_cache import ContextCacheRegistry
+from google.genai import types
 from product_agent.models.llm_input import LLMInput
 
 
@@ -134,6 +144,54 @@ class TestOpenAiClientModelResolution:
         assert "-" in llm_input.model
 
 
+def chat_completion(content: str) -> dict:
+    """A minimal openai chat completion body"""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }
+
+class TestOpenAiClientPool:
+    """Unit tests for cached chat models on a shared async transport."""
+
+    def build_client(self, handler) -> OpenAiClient:
+        client = OpenAiClient(api_key="test-key", base_url="https://openai.test/v1")
+        client._http_async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    @pytest.mark.asyncio
+    async def test_models_are_reused_per_config(self):
+        client = self.build_client(lambda request: httpx.Response(200, json=chat_completion("hi")))
+
+        first = client._get_model("gpt-4o-mini", 0.1, False)
+        assert client._get_model("gpt-4o-mini", 0.1, False) is first
+        assert client._get_model("gpt-4o-mini", 0.5, False) is not first
+
+    @pytest.mark.asyncio
+    async def test_concurrent_invokes_overlap(self):
+        """Five slow calls take about as long as one, ainvoke doesnt block the loop."""
+        async def handler(request: httpx.Request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json=chat_completion("hi"))
+
+        client = self.build_client(handler)
+        inputs = [LLMInput(model="scraper_mini", user_query=f"query {i}") for i in range(5)]
+        # First call builds the model and openai client, keep it out of the timing
+        await client.invoke(LLMInput(model="scraper_mini", user_query="warm up"))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[client.invoke(llm_input) for llm_input in inputs])
+        elapsed = time.perf_counter() - started
+
+        assert results == ["hi"] * 5
+        assert elapsed < 0.6
+        assert len(client._models) == 1
+
+
 class TestGeminiClientModelResolution:
     """Unit tests for Gemini model name resolution."""
 
@@ -220,4 +278,324 @@ class TestGeminiClientModelResolution:
                 for query_piece in transformed_query:
                     print()
                     print("Type: ", type(query_piece))
-                    print("Value: ", query_piece)
\ No newline at end of file
+                    print("Value: ", query_piece)
+
+class FakeGenAiAio:
+    """Stands in for client.aio, every call is slow and tracks how many overlap"""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.models = self
+        self.files = self
+
+    async def _slow(self, result):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return result
+
+    async def generate_content(self, model, contents, config):
+        return await self._slow(MagicMock(text="generated"))
+
+    async def upload(self, file, config):
+        return await self._slow(config["name"])
+
+class TestGeminiClientAsync:
+    """Unit tests for the async gemini surface."""
+
+    def build_client(self, fake: FakeGenAiAio, **limits) -> GeminiClient:
+        with patch("product_agent.infrastructure.llm.client.genai.Client"):
+            client = GeminiClient(api_key="test-key", **limits)
+        client.vertex_api_client = MagicMock(aio=fake)
+        client.developer_api_client = MagicMock(aio=fake)
+        return client
+
+    @pytest.mark.asyncio
+    async def test_generations_overlap(self):
+        fake = FakeGenAiAio(delay=0.2)
+        client = self.build_client(fake)
+
+        results = await asyncio.gather(*[
+            client.invoke(LLMInput(model="scraper_mini", user_query=f"query {i}"))
+            for i in range(5)
+        ])
+
+        assert results == ["generated"] * 5
+        # All five were waiting on the model at once rather than one after another
+        assert fake.max_in_flight == 5
+
+    @pytest.mark.asyncio
+    async def test_uploads_are_bounded(self):
+        fake = FakeGenAiAio(delay=0.05)
+        client = self.build_client(fake, max_concurrent_uploads=2)
+
+        names = await asyncio.gather(*[
+            client.upload_to_file_api(url=f"https://example.com/{i}.jpg", image_file=io.BytesIO(b"img"))
+            for i in range(6)
+        ])
+
+        assert len(set(names)) == 6
+        assert fake.max_in_flight == 2
+
+
+class FakeCachesApi:
+    """Stands in for client.aio.caches"""
+    def __init__(self, fail_create: bool = False):
+        self.fail_create = fail_create
+        self.created = 0
+        self.updated = []
+
+    async def create(self, model, config):
+        if self.fail_create:
+            raise Exception("Cached content is too small")
+        self.created += 1
+        await asyncio.sleep(0.01)
+        return types.CachedContent(name=f"cachedContents/{self.created}", model=model)
+
+    async def update(self, name, config):
+        self.updated.append(name)
+
+class TestGeminiContextCache:
+    """Unit tests for reusing gemini context caches."""
+
+    @pytest.mark.asyncio
+    async def test_cache_is_created_once_per_prompt(self):
+        caches = FakeCachesApi()
+        registry = ContextCacheRegistry(caches_api=caches)
+
+        names = await asyncio.gather(*[registry.get_cache_name("gemini-2.5-flash", "system prompt") for _ in range(5)])
+        other = await registry.get_cache_name("gemini-2.5-flash", "another prompt")
+
+        assert names == ["cachedContents/1"] * 5
+        assert other == "cachedContents/2"
+        assert caches.created == 2
+
+    @pytest.mark.asyncio
+    async def test_ttl_is_refreshed_near_expiry(self):
+        caches = FakeCachesApi()
+        registry = ContextCacheRegistry(caches_api=caches, ttl_seconds=60, refresh_margin_seconds=120)
+
+        await registry.get_cache_name("gemini-2.5-flash", "system prompt")
+        await registry.get_cache_name("gemini-2.5-flash", "system prompt")
+
+        assert caches.created == 1
+        assert caches.updated == ["cachedContents/1"]
+
+    @pytest.mark.asyncio
+    async def test_failed_creation_falls_back_uncached(self):
+        caches = FakeCachesApi(fail_create=True)
+        registry = ContextCacheRegistry(caches_api=caches)
+
+        assert await registry.get_cache_name("gemini-2.5-flash", "tiny") is None
+        assert await registry.get_cache_name("gemini-2.5-flash", "tiny") is None
+        assert registry.metrics().failures == 1
+
+    @pytest.mark.asyncio
+    async def test_invoke_passes_the_real_cache_name(self):
+        fake = FakeGenAiAio(delay=0)
+        configs = []
+
+        async def generate_content(model, contents, config):
+            configs.append(config)
+            return MagicMock(text="generated", usage_metadata=MagicMock(prompt_token_count=1000, cached_content_token_count=900))
+
+        fake.generate_content = generate_content
+        client = TestGeminiClientAsync().build_client(fake)
+        client.context_caches = ContextCacheRegistry(caches_api=FakeCachesApi())
+
+        llm_input = LLMInput(model="scraper_mini", system_query="system prompt", user_query="query", cache_wanted=True)
+        await client.invoke(llm_input)
+
+        assert configs[0].cached_content == "cachedContents/1"
+        assert configs[0].system_instruction is None
+        assert client.context_caches.metrics().cached_token_ratio == 0.9
+
+
+class FakeBatchServer:
+    """A local stand in for the openai files and batches endpoints"""
+
+    def __init__(self, polls_until_done: int = 1, fail_contents: set[str] | None = None):
+        self.polls_until_done = polls_until_done
+        self.fail_contents = fail_contents or set()
+        self.files: dict[str, str] = {}
+        self.batches: dict[str, dict] = {}
+        self.submitted: list[list[dict]] = []
+
+    def _complete(self, batch: dict):
+        output, errors = [], []
+        for line in self.files[batch["input_file_id"]].splitlines():
+            request = json.loads(line)
+            content = request["body"]["messages"][-1]["content"]
+            if content in self.fail_contents:
+                errors.append({"custom_id": request["custom_id"], "response": None, "error": {"code": "bad_request"}})
+                continue
+            body = chat_completion('{"brand_product": "Whey", "adapted_search_string": "whey"}' if "response_format" in request["body"] else f"echo {content}")
+            output.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None})
+
+        self.files["output"] = "\n".join(json.dumps(line) for line in output)
+        self.files["errors"] = "\n".join(json.dumps(line) for line in errors)
+        batch.update(status="completed", output_file_id="output", error_file_id="errors" if errors else None)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path == "/v1/files":
+            jsonl = request.content.split(b"\r\n\r\n", 2)[-1].rsplit(b"\r\n--", 1)[0].decode()
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = jsonl
+            self.submitted.append([json.loads(line) for line in jsonl.splitlines()])
+            return httpx.Response(200, json={"id": file_id})
+
+        if request.method == "POST" and path == "/v1/batches":
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {"id": batch_id, "status": "validating", "polls": 0, **json.loads(request.content)}
+            return httpx.Response(200, json=self.batches[batch_id])
+
+        if path.startswith("/v1/batches/"):
+            batch = self.batches[path.rsplit("/", 1)[-1]]
+            batch["polls"] += 1
+            if batch["status"] != "completed" and batch["polls"] >= self.polls_until_done:
+                self._complete(batch)
+            return httpx.Response(200, json=batch)
+
+        if path.startswith("/v1/files/") and path.endswith("/content"):
+            return httpx.Response(200, text=self.files[path.split("/")[3]])
+
+        return httpx.Response(404)
+
+class TestOpenAiBatchClient:
+    """Unit tests for batch mode against a fake batch server."""
+
+    def build_client(self, server: FakeBatchServer, **kwargs) -> OpenAiBatchClient:
+        client = OpenAiBatchClient(api_key="test-key", poll_interval=0.01, **kwargs)
+        client._http = httpx.AsyncClient(base_url="https://openai.test/v1", transport=httpx.MockTransport(server.handler))
+        return client
+
+    @pytest.mark.asyncio
+    async def test_queued_invokes_share_one_batch(self):
+        server = FakeBatchServer(polls_until_done=3)
+        client = self.build_client(server, flush_interval=0.05)
+
+        results = await asyncio.gather(*[
+            client.invoke(LLMInput(model="scraper_mini", user_query=f"query {i}")) for i in range(5)
+        ])
+
+        assert results == [f"echo query {i}" for i in range(5)]
+        assert len(server.submitted) == 1
+        assert server.submitted[0][0]["body"]["model"] == "gpt-4o-mini"
+        assert server.submitted[0][0]["url"] == "/v1/chat/completions"
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_flushes_early(self):
+        server = FakeBatchServer()
+        client = self.build_client(server, max_batch_size=2, flush_interval=60)
+
+        results = await asyncio.gather(*[
+            client.invoke(LLMInput(model="gpt-4o", user_query=f"query {i}")) for i in range(4)
+        ])
+
+        assert len(results) == 4
+        assert [len(batch) for batch in server.submitted] == [2, 2]
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_structured_output_and_user_query_untouched(self):
+        server = FakeBatchServer()
+        client = self.build_client(server, flush_interval=0.01)
+        llm_input = LLMInput(model="scraper_mini", user_query="extract", response_schema=QueryResponse)
+
+        result = await client.invoke(llm_input)
+
+        assert isinstance(result, QueryResponse)
+        assert llm_input.user_query == "extract"
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_failed_line_only_fails_its_invoke(self):
+        server = FakeBatchServer(fail_contents={"bad"})
+        client = self.build_client(server, flush_interval=0.01)
+
+        good, bad = await asyncio.gather(
+            client.invoke(LLMInput(model="scraper_mini", user_query="good")),
+            client.invoke(LLMInput(model="scraper_mini", user_query="bad")),
+            return_exceptions=True
+        )
+
+        assert good == "echo good"
+        assert isinstance(bad, LLMError)
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aclose_fails_invokes_waiting_on_a_batch(self):
+        # The batch never finishes, so the invokes are still waiting when the client closes
+        server = FakeBatchServer(polls_until_done=10_000)
+        client = self.build_client(server, max_batch_size=1, flush_interval=60)
+        submitted = asyncio.create_task(client.invoke(LLMInput(model="scraper_mini", user_query="submitted")))
+        await asyncio.sleep(0.05)
+        client.max_batch_size = 2
+        queued = asyncio.create_task(client.invoke(LLMInput(model="scraper_mini", user_query="queued")))
+        await asyncio.sleep(0)
+
+        await client.aclose()
+        results = await asyncio.wait_for(asyncio.gather(submitted, queued, return_exceptions=True), timeout=1)
+
+        assert len(server.submitted) == 1
+        assert all(isinstance(result, LLMError) for result in results)
+
+
+class TestOpenAiStructuredOutput:
+    """Unit tests for native json_schema response formats."""
+
+    def build_client(self, handler) -> OpenAiClient:
+        client = OpenAiClient(api_key="test-key", base_url="https://openai.test/v1")
+        client._http_async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    def test_response_formats_are_compiled_once(self):
+        draft = openai_response_format(DraftProduct)
+
+        assert openai_response_format(DraftProduct) is draft
+        assert draft["json_schema"]["strict"] is True
+        assert draft["json_schema"]["schema"]["additionalProperties"] is False
+        # Free form dict fields cant be strict
+        assert openai_response_format(ScraperSynthesisResponse)["json_schema"]["strict"] is False
+
+    @pytest.mark.asyncio
+    async def test_native_schema_sent_without_format_instructions(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, json=chat_completion('{"brand_product": "Whey", "adapted_search_string": "whey"}'))
+
+        client = self.build_client(handler)
+        llm_input = LLMInput(model="scraper_mini", user_query="extract", response_schema=QueryResponse)
+
+        result = await client.invoke(llm_input)
+
+        assert isinstance(result, QueryResponse)
+        assert requests[0]["response_format"]["type"] == "json_schema"
+        assert requests[0]["messages"][-1]["content"] == "extract"
+        assert (llm_input.user_query, llm_input.model) == ("extract", "scraper_mini")
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_format_instructions(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            body = json.loads(request.content)
+            requests.append(body)
+            if "response_format" in body:
+                return httpx.Response(400, json={"error": {"message": "Invalid parameter: 'response_format' of type 'json_schema' is not supported with this model.", "type": "invalid_request_error"}})
+            return httpx.Response(200, json=chat_completion('{"brand_product": "Whey", "adapted_search_string": "whey"}'))
+
+        client = self.build_client(handler)
+        for _ in range(2):
+            result = await client.invoke(LLMInput(model="scraper_mini", user_query="extract", response_schema=QueryResponse))
+            assert isinstance(result, QueryResponse)
+
+        # The model is remembered, the second call goes straight to the fallback
+        assert ["response_format" in body for body in requests] == [True, False, False]
+        assert "extract\n\n" in requests[-1]["messages"][-1]["content"]
@@ -0,0 +1,182 @@
+import asyncio
+import pytest
+
+from product_agent.config.container import ServiceContainer
+from product_agent.infrastructure.llm.router import ModelHealthRegistry, ModelRouter, RouteTarget, is_retryable_error
+from product_agent.models.llm_input import LLMInput
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+class ScriptedLLM:
+    """Answers after delay, or raises error"""
+    def __init__(self, name: str, delay: float = 0.0, error: Exception | None = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.models: list[str] = []
+
+    async def invoke(self, llm_input: LLMInput):
+        self.models.append(llm_input.model)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+def build_router(primary: ScriptedLLM, fallback: ScriptedLLM, health: ModelHealthRegistry | None = None, **kwargs) -> ModelRouter:
+    return ModelRouter(
+        process="scraper_synthesis",
+        primary=RouteTarget(client=primary, model="gemini-2.5-flash"),
+        fallback=RouteTarget(client=fallback, model="gpt-4o-mini"),
+        health=health or ModelHealthRegistry(),
+        **kwargs
+    )
+
+def query() -> LLMInput:
+    return LLMInput(model="ignored", user_query="query")
+
+def decisions(health: ModelHealthRegistry) -> dict[str, int]:
+    return {d.decision: d.count for d in health.metrics().decisions}
+
+class TestModelRouter:
+    """Testing primary / fallback routing"""
+
+    def test_retryable_errors(self):
+        assert is_retryable_error(ProviderError(429))
+        assert is_retryable_error(ProviderError(503))
+        assert is_retryable_error(asyncio.TimeoutError())
+        assert not is_retryable_error(ProviderError(400))
+        assert not is_retryable_error(ValueError("bad json"))
+
+    @pytest.mark.asyncio
+    async def test_primary_used_when_healthy(self):
+        primary, fallback = ScriptedLLM("primary"), ScriptedLLM("fallback")
+        router = build_router(primary, fallback)
+
+        assert await router.invoke(query()) == "primary"
+        assert primary.models == ["gemini-2.5-flash"]
+        assert fallback.models == []
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_falls_back(self):
+        primary, fallback = ScriptedLLM("primary", error=ProviderError(429)), ScriptedLLM("fallback")
+        router = build_router(primary, fallback)
+
+        assert await router.invoke(query()) == "fallback"
+        assert decisions(router.health)["fallback_on_error"] == 1
+        assert router.health.stats("gemini-2.5-flash").errors == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_falls_back(self):
+        primary, fallback = ScriptedLLM("primary", delay=1.0), ScriptedLLM("fallback")
+        router = build_router(primary, fallback, timeout_seconds=0.05)
+
+        assert await router.invoke(query()) == "fallback"
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self):
+        primary, fallback = ScriptedLLM("primary", error=ProviderError(400)), ScriptedLLM("fallback")
+        router = build_router(primary, fallback)
+
+        with pytest.raises(ProviderError):
+            await router.invoke(query())
+        assert fallback.models == []
+
+    @pytest.mark.asyncio
+    async def test_degraded_primary_shifts_traffic(self):
+        health = ModelHealthRegistry(min_samples=4, error_rate_threshold=0.5)
+        primary, fallback = ScriptedLLM("primary", error=ProviderError(500)), ScriptedLLM("fallback")
+        router = build_router(primary, fallback, health=health)
+
+        for _ in range(4):
+            await router.invoke(query())
+        assert health.is_degraded("gemini-2.5-flash")
+
+        primary.models.clear()
+        assert await router.invoke(query()) == "fallback"
+        assert primary.models == []
+        assert decisions(health)["shifted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_request_is_hedged(self):
+        health = ModelHealthRegistry(min_samples=3)
+        for _ in range(3):
+            health.record_success("gemini-2.5-flash", 0.02)
+
+        primary, fallback = ScriptedLLM("primary", delay=1.0), ScriptedLLM("fallback", delay=0.01)
+        router = build_router(primary, fallback, health=health, hedge_percentile=95)
+
+        assert await router.invoke(query()) == "fallback"
+        assert decisions(health)["hedged"] == 1
+        assert decisions(health)["hedge_won"] == 1
+
+    @pytest.mark.asyncio
+    async def test_both_failing_raises(self):
+        primary = ScriptedLLM("primary", error=ProviderError(503))
+        fallback = ScriptedLLM("fallback", error=ProviderError(503))
+        router = build_router(primary, fallback)
+
+        with pytest.raises(ProviderError):
+            await router.invoke(query())
+
+        stats = {s.model: s for s in router.health.metrics().models}
+        assert stats["gpt-4o-mini"].errors == 1
+
+    @pytest.mark.asyncio
+    async def test_image_transform_stays_on_primary_and_is_counted(self):
+        class ImageLLM(ScriptedLLM):
+            async def transform_for_images(self, data):
+                return (self.name, data)
+
+        router = build_router(ImageLLM("gemini"), ImageLLM("open_ai"))
+
+        assert await router.transform_for_images("images") == ("gemini", "images")
+        assert decisions(router.health) == {"image_transform": 1}
+
+    # ---------------------------------------------------------------------------
+    def test_container_routes_gpt_to_open_ai(self):
+        gemini, open_ai = ScriptedLLM("gemini"), ScriptedLLM("open_ai")
+        container = ServiceContainer(
+            shop=None, scraper=None, vector_db=None, embeddor=None, image_scraper=None,
+            llm={
+                "clients": {"gemini": gemini, "open_ai": open_ai},
+                "models": {
+                    "scraper_synthesis": {"primary": "gemini-2.5-flash", "fallback": "gpt-4o-mini"},
+                    "vector_relevance": {"primary": "gpt-4o", "fallback": "claude-sonnet-4"},
+                }
+            }
+        )
+
+        scraper = container.llm_config("scraper_synthesis")
+        assert scraper.client.primary.client is gemini
+        assert scraper.client.fallback.client is open_ai
+        assert container.llm_config("scraper_synthesis").client is scraper.client
+
+        relevance = container.llm_config("vector_relevance")
+        assert relevance.model == "gpt-4o"
+        assert relevance.client.primary.client is open_ai
+        # No anthropic client configured
+        assert relevance.client.fallback is None
+
+    def test_batch_processes_skip_the_router(self):
+        gemini, open_ai, batch = ScriptedLLM("gemini"), ScriptedLLM("open_ai"), ScriptedLLM("batch")
+        container = ServiceContainer(
+            shop=None, scraper=None, vector_db=None, embeddor=None, image_scraper=None,
+            llm={
+                "clients": {"gemini": gemini, "open_ai": open_ai},
+                "models": {
+                    "scraper_synthesis": {"primary": "gemini-2.5-flash", "fallback": "gpt-4o-mini", "batch_model": "gpt-4o-mini"},
+                    "vector_relevance": {"primary": "gpt-4o", "fallback": "claude-sonnet-4"},
+                }
+            },
+            batch_llm=batch,
+            batch_processes=frozenset({"scraper_synthesis"})
+        )
+
+        scraper = container.llm_config("scraper_synthesis")
+        assert scraper.client is batch
+        assert scraper.model == "gpt-4o-mini"
+        assert container.llm_config("vector_relevance").client.primary.client is open_ai
+        assert container.batch_client("draft_creation") is None
@@ -0,0 +1,94 @@
+import json
+import httpx
+import pytest
+from pydantic import BaseModel
+
+from product_agent.infrastructure.llm.client import OpenAiClient
+from product_agent.infrastructure.llm.streaming import StreamingJsonParser
+from product_agent.models.llm_input import LLMInput
+from product_agent.services.infrastructure.llm import llm_stream_service
+from tests.mocks.llm_mock import MockLLM
+
+class Item(BaseModel):
+    sku: int
+    name: str
+
+class Draft(BaseModel):
+    title: str
+    variants: list[Item]
+    description: str
+
+DRAFT = {
+    "title": "Gold Standard Whey",
+    "variants": [{"sku": 1, "name": "a, b"}, {"sku": 2, "name": "{c}"}],
+    "description": "<p>Long \"quoted\", html</p>",
+}
+
+def stream_chunks(text: str, size: int = 3) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def sse_body(chunks: list[str]) -> bytes:
+    events = []
+    for i, chunk in enumerate(chunks):
+        delta = {"role": "assistant", "content": chunk} if i == 0 else {"content": chunk}
+        events.append("data: " + json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+        }))
+    events.append("data: [DONE]")
+    return ("\n\n".join(events) + "\n\n").encode()
+
+class TestStreamingJsonParser:
+    """Testing incremental parsing of structured responses"""
+
+    def test_fields_complete_in_order(self):
+        parser = StreamingJsonParser(Draft)
+        completions = []
+        for chunk in stream_chunks("```json\n" + json.dumps(DRAFT) + "\n```"):
+            result = parser.feed(chunk)
+            if result is not None:
+                completions.append(result.newly_completed)
+                if "variants" in result.newly_completed:
+                    # Commas and braces inside strings and nested values dont complete fields
+                    assert result.partial["variants"] == DRAFT["variants"]
+
+        assert completions == [["title"], ["variants"], ["description"]]
+        final = parser.finish().final
+        assert isinstance(final, Draft)
+        assert final.description == DRAFT["description"]
+
+    def test_nothing_before_first_comma(self):
+        parser = StreamingJsonParser(Draft)
+        assert parser.feed('{"title": "Gold Stand') is None
+        assert parser.partial == {"title": "Gold Stand"}
+
+    # ---------------------------------------------------------------------------
+    @pytest.mark.asyncio
+    async def test_openai_astream_yields_completed_fields(self):
+        body = sse_body(stream_chunks(json.dumps(DRAFT), size=7))
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+        client = OpenAiClient(api_key="test-key", base_url="https://openai.test/v1")
+        client._http_async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        results = [result async for result in client.astream(LLMInput(model="max_deterministic", user_query="draft", response_schema=Draft))]
+
+        assert [r.newly_completed for r in results[:-1]] == [["title"], ["variants"], ["description"]]
+        assert results[-1].final == Draft.model_validate(DRAFT)
+
+    @pytest.mark.asyncio
+    async def test_stream_service_falls_back_to_invoke(self):
+        seen = []
+
+        async def on_partial(result):
+            seen.append(result)
+
+        response = await llm_stream_service(LLMInput(model="mini", user_query="draft", response_schema=Draft), MockLLM(), on_partial)
+
+        assert isinstance(response, Draft)
+        assert len(seen) == 1
+        assert seen[0].final is response
+        assert seen[0].completed_fields == ["title", "variants", "description"]
@@ -0,0 +1,64 @@
+from qdrant_client.models import PointStruct
+
+from product_agent.infrastructure.llm.prompt_budget import (
+    PromptSection,
+    TokenCounter,
+    assemble_prompt,
+    compact_similar_products,
+)
+
+def sections(scraped_words: int = 2000, similar_words: int = 2000) -> list[PromptSection]:
+    return [
+        PromptSection(name="validated_data", text="USER'S VARIANT SPECIFICATIONS: size 2lb"),
+        PromptSection(name="web_scraped_data", text="scraped " * scraped_words, trim_priority=2),
+        PromptSection(name="similar_products", text="similar " * similar_words, trim_priority=1),
+        PromptSection(name="instructions", text="INSTRUCTIONS: fill the draft"),
+    ]
+
+class TestPromptBudget:
+    """Testing prompt assembly under a token budget"""
+
+    def test_under_budget_is_untouched(self):
+        prompt = assemble_prompt(sections(10, 10), budget=10_000, process="draft_creation")
+
+        assert prompt.trimmed == []
+        assert "similar similar" in prompt.text
+        assert prompt.total_tokens <= prompt.budget
+
+    def test_lowest_priority_is_trimmed_first(self):
+        counter = TokenCounter()
+        full = assemble_prompt(sections(), budget=100_000, process="draft_creation", counter=counter)
+        budget = full.total_tokens - full.section_tokens["similar_products"] // 2
+
+        prompt = assemble_prompt(sections(), budget=budget, process="draft_creation", counter=counter)
+
+        assert prompt.trimmed == ["similar_products"]
+        assert prompt.section_tokens["web_scraped_data"] == full.section_tokens["web_scraped_data"]
+        assert prompt.total_tokens <= budget
+
+    def test_required_sections_survive_a_tiny_budget(self):
+        prompt = assemble_prompt(sections(), budget=50, process="draft_creation")
+
+        assert prompt.trimmed == ["similar_products", "web_scraped_data"]
+        assert prompt.text.startswith("USER'S VARIANT SPECIFICATIONS")
+        assert prompt.text.endswith("INSTRUCTIONS: fill the draft")
+
+    def test_compact_similar_products_drops_vectors_and_html(self):
+        point = PointStruct(
+            id=1,
+            vector=[0.1] * 1536,
+            payload={
+                "title": "Optimum Nutrition Gold Standard Whey",
+                "product_type": "Protein Powder",
+                "vendor": "Optimum Nutrition",
+                "tags": ["Protein"],
+                "body_html": "<h2>Whey</h2><p>" + "protein " * 500 + "</p>",
+            }
+        )
+
+        compact = compact_similar_products([point], max_description_chars=100)[0]
+
+        assert "vector" not in compact
+        assert "<" not in compact["description"]
+        assert len(compact["description"]) <= 103
+        assert compact["product_type"] == "Protein Powder"
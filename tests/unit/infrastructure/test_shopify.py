@@ -6,7 +6,8 @@ Unit tests use mock client, integration tests use real Shopify API.
 import pytest
 import os
 from dotenv import load_dotenv
-import asyncio
+import json
+import httpx
 
 from product_agent.models.shopify import (
     DraftProduct, DraftResponse, Variant, Option, InventoryAtStores
@@ -15,6 +16,7 @@ from product_agent.infrastructure.shopify.types import Inventory, Inputs
 from product_agent.infrastructure.shopify.client import (
             ShopifyClient, Locations, Location
         )
+from product_agent.infrastructure.shopify.pool import ShopifyConnectionPool
 
 
 # -----------------------------------------------------------------------------
@@ -188,6 +190,239 @@ class TestDraftProductValidation:
         assert "2kg" in size_option["values"]
 
 
+class TestShopifyConnectionPool:
+    """Unit tests for the shared per shop HTTP transport."""
+
+    @pytest.fixture
+    def locations(self):
+        return Locations(locations=[
+            Location(name="City", id="gid://shopify/Location/1"),
+            Location(name="South Melbourne", id="gid://shopify/Location/2")
+        ])
+
+    @pytest.mark.asyncio
+    async def test_same_shop_shares_one_client(self, locations):
+        """Two clients for the same shop reuse the same transport, no context manager needed."""
+        pool = ShopifyConnectionPool()
+        first = ShopifyClient(locations=locations, access_token="t", shop_name="shop-a", pool=pool)
+        second = ShopifyClient(locations=locations, access_token="t", shop_name="shop-a", pool=pool)
+
+        assert first._client is second._client
+        assert len(pool) == 1
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_each_shop_gets_its_own_client(self, locations):
+        """Shops are isolated from each others connections."""
+        pool = ShopifyConnectionPool()
+        shop_a = ShopifyClient(locations=locations, access_token="t", shop_name="shop-a", pool=pool)
+        shop_b = ShopifyClient(locations=locations, access_token="t", shop_name="shop-b", pool=pool)
+
+        assert shop_a._client is not shop_b._client
+        assert len(pool) == 2
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_and_recreates(self, locations):
+        """Closing the pool closes transports, later use opens a fresh one."""
+        pool = ShopifyConnectionPool()
+        client = ShopifyClient(locations=locations, access_token="t", shop_name="shop-a", pool=pool)
+        transport = client._client
+
+        await pool.aclose()
+        assert transport.is_closed
+        assert len(pool) == 0
+
+        assert client._client is not transport
+        await pool.aclose()
+
+
+class TestShopifyInventoryBatch:
+    """Unit tests for the batched inventory path against a stubbed transport."""
+
+    @pytest.fixture
+    def stubbed_client(self):
+        """A client whose transport records each graphql request body."""
+        requests = []
+
+        def handler(request: httpx.Request):
+            body = json.loads(request.content)
+            requests.append(body)
+            if "inventoryBulkToggleActivation" in body["query"]:
+                data = {
+                    key: {"inventoryItem": {"id": value}, "userErrors": []}
+                    for key, value in body["variables"].items() if key.startswith("item")
+                }
+                return httpx.Response(200, json={"data": data})
+
+            # The second quantity of the second item (index 3) fails
+            return httpx.Response(200, json={"data": {"inventorySetQuantities": {
+                "inventoryAdjustmentGroup": None,
+                "userErrors": [{"field": ["input", "quantities", "3", "quantity"], "message": "Bad quantity"}]
+            }}})
+
+        pool = ShopifyConnectionPool()
+        pool._clients["shop"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        client = ShopifyClient(
+            locations=Locations(locations=[
+                Location(name="City", id="gid://shopify/Location/1"),
+                Location(name="South Melbourne", id="gid://shopify/Location/2")
+            ]),
+            access_token="token",
+            shop_name="shop",
+            pool=pool
+        )
+        return client, requests
+
+    @pytest.mark.asyncio
+    async def test_whole_product_in_two_mutations(self, stubbed_client):
+        """Activation and quantities for every variant x location take one call each."""
+        client, requests = stubbed_client
+        inventory = [
+            Inventory(inventory_item_id=str(i), stores=[
+                Inputs(name_of_store="City", inventory_number=5),
+                Inputs(name_of_store="South Melbourne", inventory_number=7)
+            ])
+            for i in range(3)
+        ]
+
+        result = await client.fill_inventories(inventory_data=inventory)
+
+        assert len(requests) == 2
+        assert len(requests[1]["variables"]["input"]["quantities"]) == 6
+        assert len(result.items) == 3
+
+    @pytest.mark.asyncio
+    async def test_partial_failure_is_reported_per_item(self, stubbed_client):
+        """A user error on one quantity only fails the item that owns it."""
+        client, _ = stubbed_client
+        inventory = [
+            Inventory(inventory_item_id=str(i), stores=[
+                Inputs(name_of_store="City", inventory_number=5),
+                Inputs(name_of_store="South Melbourne", inventory_number=7)
+            ])
+            for i in range(3)
+        ]
+
+        result = await client.fill_inventories(inventory_data=inventory)
+
+        assert not result.all_succeeded
+        assert [item.inventory_item_id for item in result.failed()] == ["1"]
+        assert result.failed()[0].errors == ["Bad quantity"]
+
+
+class TestShopifyProductStreaming:
+    """Unit tests for streaming the catalogue page by page."""
+
+    def build_client(self, handler):
+        pool = ShopifyConnectionPool()
+        pool._clients["shop"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return ShopifyClient(
+            locations=Locations(locations=[Location(name="City", id="gid://shopify/Location/1")]),
+            access_token="token",
+            shop_name="shop",
+            pool=pool
+        )
+
+    @pytest.mark.asyncio
+    async def test_rest_pages_are_yielded_in_order(self):
+        """Each Link header page is yielded as validated products."""
+        def handler(request: httpx.Request):
+            if "page_info" not in str(request.url):
+                return httpx.Response(
+                    200,
+                    json={"products": [{"id": 1, "title": "One"}, {"id": 2, "title": "Two"}]},
+                    headers={"Link": '<https://shop.myshopify.com/admin/api/2024-10/products.json?page_info=abc>; rel="next"'}
+                )
+            return httpx.Response(200, json={"products": [{"id": 3, "title": "Three"}]})
+
+        client = self.build_client(handler)
+        pages = [page async for page in client.stream_products_from_store()]
+
+        assert [[product.id for product in page] for page in pages] == [[1, 2], [3]]
+        assert await client.get_products_from_store() is not None
+
+    @pytest.mark.asyncio
+    async def test_bulk_export_groups_variants_under_products(self):
+        """Bulk JSONL lines are regrouped into products with their variants."""
+        jsonl = "\n".join(json.dumps(line) for line in [
+            {"id": "gid://shopify/Product/1", "legacyResourceId": "1", "title": "Whey", "tags": ["protein"], "status": "ACTIVE"},
+            {"id": "gid://shopify/ProductVariant/11", "legacyResourceId": "11", "sku": "A1", "position": 1, "__parentId": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/ProductVariant/12", "legacyResourceId": "12", "sku": "A2", "position": 2, "__parentId": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/Product/2", "legacyResourceId": "2", "title": "Creatine", "tags": [], "status": "DRAFT"},
+            {"id": "gid://shopify/ProductVariant/21", "legacyResourceId": "21", "sku": "B1", "position": 1, "__parentId": "gid://shopify/Product/2"},
+        ])
+
+        def handler(request: httpx.Request):
+            if request.url.host == "storage.example.com":
+                return httpx.Response(200, text=jsonl)
+
+            body = json.loads(request.content)
+            if "bulkOperationRunQuery" in body["query"]:
+                return httpx.Response(200, json={"data": {"bulkOperationRunQuery": {
+                    "bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"}, "userErrors": []
+                }}})
+            return httpx.Response(200, json={"data": {"currentBulkOperation": {
+                "id": "gid://shopify/BulkOperation/1", "status": "COMPLETED", "url": "https://storage.example.com/export.jsonl"
+            }}})
+
+        client = self.build_client(handler)
+        pages = [page async for page in client.stream_products_from_store(bulk=True, page_size=1)]
+
+        assert len(pages) == 2
+        whey = pages[0][0]
+        assert whey.id == 1
+        assert whey.status == "active"
+        assert [variant.sku for variant in whey.variants] == ["A1", "A2"]
+        assert pages[1][0].variants[0].product_id == 2
+
+
+class TestShopifyBatchSkuSearch:
+    """Unit tests for the batched sku existence lookup."""
+
+    @pytest.mark.asyncio
+    async def test_many_skus_in_few_requests(self):
+        """Terms are OR'd per request, pages are followed and only exact matches are kept."""
+        searches = []
+
+        def handler(request: httpx.Request):
+            body = json.loads(request.content)
+            searches.append(body["variables"])
+            if body["variables"]["cursor"] is None and 'sku:"1"' in body["variables"]["q"]:
+                return httpx.Response(200, json={"data": {"productVariants": {
+                    "edges": [
+                        {"node": {"id": "v1", "sku": "1", "barcode": "900", "product": {"id": "p1", "title": "Whey"}}},
+                        {"node": {"id": "v9", "sku": "100", "barcode": None, "product": {"id": "p9", "title": "Fuzzy"}}},
+                    ],
+                    "pageInfo": {"hasNextPage": True, "endCursor": "c1"}
+                }}})
+            if body["variables"]["cursor"] == "c1":
+                return httpx.Response(200, json={"data": {"productVariants": {
+                    "edges": [{"node": {"id": "v2", "sku": "2", "barcode": None, "product": {"id": "p1", "title": "Whey"}}}],
+                    "pageInfo": {"hasNextPage": False, "endCursor": None}
+                }}})
+            return httpx.Response(200, json={"data": {"productVariants": {
+                "edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}
+            }}})
+
+        client = TestShopifyProductStreaming().build_client(handler)
+        skus = list(range(1, 61))
+        existing = await client.search_by_skus(skus=skus, barcodes=["900"])
+
+        # 61 terms -> two OR'd searches, the first one paginated once
+        assert len(searches) == 3
+        assert " OR " in searches[0]["q"]
+        assert set(existing) == {"1", "2", "900"}
+        assert existing["900"].product.title == "Whey"
+
+    @pytest.mark.asyncio
+    async def test_failed_search_returns_none(self):
+        """A failed request fails the whole lookup rather than reporting a partial map."""
+        client = TestShopifyProductStreaming().build_client(lambda request: httpx.Response(500))
+
+        assert await client.search_by_skus(skus=[1, 2]) is None
+
+
 # -----------------------------------------------------------------------------
 # Integration Tests
 # -----------------------------------------------------------------------------
@@ -0,0 +1,149 @@
+import json
+import httpx
+import pytest
+
+from product_agent.infrastructure.shopify.client import ShopifyClient, Locations, Location
+from product_agent.infrastructure.shopify.pool import ShopifyConnectionPool
+from product_agent.infrastructure.shopify.sku_index import SkuIndex
+from product_agent.infrastructure.shopify.types import SkuSearchResponse, Product
+from product_agent.models.shopify import ShopifyProductSchema, ShopifyVariantSchema
+from tests.mocks.kv_mock import MockKV
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+
+def make_product(product_id: int, title: str, skus: list[tuple[str, str | None]]) -> ShopifyProductSchema:
+    return ShopifyProductSchema(
+        id=product_id,
+        title=title,
+        variants=[
+            ShopifyVariantSchema(id=product_id * 100 + position, product_id=product_id, title=None, price=None, sku=sku, barcode=barcode, position=position)
+            for position, (sku, barcode) in enumerate(skus, start=1)
+        ]
+    )
+
+def build_client(handler, sku_index: SkuIndex) -> ShopifyClient:
+    pool = ShopifyConnectionPool()
+    pool._clients["shop"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return ShopifyClient(
+        locations=Locations(locations=[Location(name="City", id="gid://shopify/Location/1")]),
+        access_token="token",
+        shop_name="shop",
+        pool=pool,
+        sku_index=sku_index
+    )
+
+# -----------------------------------------------------------------------------
+# Unit Tests
+# -----------------------------------------------------------------------------
+
+class TestSkuIndex:
+    """Unit tests for the local sku and barcode index."""
+
+    def test_lookup_by_sku_and_barcode(self):
+        index = SkuIndex(kv_db=MockKV(), shop_name="shop")
+        index.index_products([make_product(1, "Whey", [("A1", "900"), ("A2", None)])])
+
+        assert index.lookup_sku("A1").product.title == "Whey"
+        assert index.lookup_barcode(900).product.id == "1"
+        assert index.lookup_sku("missing") is None
+
+    def test_index_is_shared_through_the_kv_store(self):
+        """A second process loads what the first one wrote."""
+        kv = MockKV()
+        SkuIndex(kv_db=kv, shop_name="shop").index_products([make_product(1, "Whey", [("A1", "900")])])
+
+        other = SkuIndex(kv_db=kv, shop_name="shop")
+        assert other.lookup_sku("A1") is not None
+
+    def test_writes_after_the_first_lookup_are_seen(self):
+        """A consumer writing after this process first looked still reaches it."""
+        kv = MockKV()
+        index = SkuIndex(kv_db=kv, shop_name="shop")
+        assert index.lookup_sku("A1") is None
+
+        SkuIndex(kv_db=kv, shop_name="shop").index_products([make_product(1, "Whey", [("A1", "900")])])
+        assert index.lookup_sku("A1").product.title == "Whey"
+
+        SkuIndex(kv_db=kv, shop_name="shop").remove_products([1])
+        assert index.lookup_sku("A1") is None
+
+    def test_record_does_not_duplicate_product_entries(self):
+        kv = MockKV()
+        index = SkuIndex(kv_db=kv, shop_name="shop")
+        match = SkuSearchResponse(sku="A1", barcode="900", product=Product(title="Whey", id="gid://shopify/Product/1"))
+        index.record(match)
+        index.record(match)
+        index.record_many([match, SkuSearchResponse(sku="A2", barcode=None, product=Product(title="Whey", id="gid://shopify/Product/1"))])
+
+        assert json.loads(kv.hgetall_data(index.product_database)["1"]) == {"skus": ["A1", "A2"], "barcodes": ["900"]}
+        index.remove_products([1])
+        assert index.lookup_sku("A2") is None
+        assert kv.hgetall_data(index.product_database) == {}
+
+    def test_reindex_drops_renamed_skus(self):
+        index = SkuIndex(kv_db=MockKV(), shop_name="shop")
+        index.index_products([make_product(1, "Whey", [("A1", None)])])
+        index.index_products([make_product(1, "Whey", [("B1", None)])])
+
+        assert index.lookup_sku("A1") is None
+        assert index.lookup_sku("B1") is not None
+
+    def test_removed_products_are_dropped(self):
+        kv = MockKV()
+        index = SkuIndex(kv_db=kv, shop_name="shop")
+        index.index_products([make_product(1, "Whey", [("A1", "900")]), make_product(2, "Creatine", [("B1", None)])])
+        index.remove_products([1])
+
+        assert index.lookup_sku("A1") is None
+        assert index.lookup_barcode("900") is None
+        assert index.lookup_sku("B1") is not None
+        assert "A1" not in kv.hgetall_data(index.sku_database)
+
+    def test_stale_entries_are_misses(self):
+        index = SkuIndex(kv_db=MockKV(), shop_name="shop", max_age_seconds=-1)
+        index.index_products([make_product(1, "Whey", [("A1", None)])])
+
+        assert index.lookup_sku("A1") is None
+
+
+class TestShopifyClientSkuIndex:
+    """The client only asks the live api when the index misses."""
+
+    @pytest.mark.asyncio
+    async def test_index_hit_skips_the_network(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            requests.append(request)
+            return httpx.Response(500)
+
+        index = SkuIndex(kv_db=MockKV(), shop_name="shop")
+        index.index_products([make_product(1, "Whey", [("922001", None)])])
+        client = build_client(handler, index)
+
+        result = await client.search_by_sku(sku=922001)
+        existing = await client.search_by_skus(skus=[922001])
+
+        assert result.product.title == "Whey"
+        assert set(existing) == {"922001"}
+        assert requests == []
+
+    @pytest.mark.asyncio
+    async def test_miss_falls_back_and_is_recorded(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            requests.append(request)
+            return httpx.Response(200, json={"data": {"productVariants": {"edges": [{"node": {
+                "id": "gid://shopify/ProductVariant/5", "sku": "555", "barcode": None,
+                "product": {"id": "gid://shopify/Product/5", "title": "Creatine"}
+            }}]}}})
+
+        index = SkuIndex(kv_db=MockKV(), shop_name="shop")
+        client = build_client(handler, index)
+
+        assert (await client.search_by_sku(sku=555)).product.title == "Creatine"
+        assert (await client.search_by_sku(sku=555)).product.id == "5"
+        assert len(requests) == 1
@@ -0,0 +1,111 @@
+"""
+Tests for the shopify graphql cost bucket and the throttled graphql helper.
+"""
+import asyncio
+import httpx
+import pytest
+
+from product_agent.infrastructure.shopify.client import ShopifyClient, Locations, Location
+from product_agent.infrastructure.shopify.pool import ShopifyConnectionPool
+from product_agent.infrastructure.shopify.throttle import GraphQLCostBucket
+
+
+def throttle_extensions(currently_available: float, maximum_available: float = 1000.0, restore_rate: float = 50.0):
+    """Build a graphql extensions block like shopify returns."""
+    return {
+        "cost": {
+            "requestedQueryCost": 10,
+            "actualQueryCost": 10,
+            "throttleStatus": {
+                "maximumAvailable": maximum_available,
+                "currentlyAvailable": currently_available,
+                "restoreRate": restore_rate
+            }
+        }
+    }
+
+
+# -----------------------------------------------------------------------------
+# Unit Tests
+# -----------------------------------------------------------------------------
+
+class TestGraphQLCostBucket:
+    """Unit tests for GraphQLCostBucket."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_never_exceed_bucket(self):
+        """Reservations in flight never add up to more than the bucket holds."""
+        bucket = GraphQLCostBucket(shop_name="shop", maximum_available=30, restore_rate=0.001)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            reserved = await bucket.acquire(10)
+            peak = max(peak, bucket.metrics().in_flight_cost)
+            await asyncio.sleep(0.01)
+            bucket.settle(reserved, None)
+
+        await asyncio.gather(*[call() for _ in range(10)])
+
+        assert peak <= 30
+        assert bucket.metrics().admitted == 10
+        assert bucket.metrics().queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_waits_when_bucket_is_empty(self):
+        """A call waits for the restore rate when the budget is spent."""
+        bucket = GraphQLCostBucket(shop_name="shop", maximum_available=10, restore_rate=200)
+        await bucket.acquire(10)
+
+        await bucket.acquire(10)
+
+        metrics = bucket.metrics()
+        assert metrics.max_wait_seconds >= 0.04
+        assert metrics.average_wait_seconds > 0
+
+    def test_settle_uses_reported_throttle_status(self):
+        """throttleStatus from the response becomes the available budget."""
+        bucket = GraphQLCostBucket(shop_name="shop")
+        bucket.settle(0, throttle_extensions(currently_available=400, maximum_available=2000, restore_rate=100))
+
+        metrics = bucket.metrics()
+        assert metrics.maximum_available == 2000
+        assert metrics.restore_rate == 100
+        assert 400 <= metrics.currently_available < 410
+
+
+class TestShopifyGraphQLThrottling:
+    """Unit tests for ShopifyClient._graphql against a stubbed transport."""
+
+    @pytest.mark.asyncio
+    async def test_retries_throttled_response(self):
+        """A THROTTLED error is retried and the final response returned."""
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(200, json={
+                    "errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+                    "extensions": throttle_extensions(currently_available=995)
+                })
+            return httpx.Response(200, json={
+                "data": {"productVariants": {"edges": []}},
+                "extensions": throttle_extensions(currently_available=990)
+            })
+
+        pool = ShopifyConnectionPool()
+        pool._clients["shop"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        client = ShopifyClient(
+            locations=Locations(locations=[Location(name="City", id="gid://shopify/Location/1")]),
+            access_token="token",
+            shop_name="shop",
+            pool=pool
+        )
+
+        result = await client.search_by_sku(sku=123)
+
+        assert result is None
+        assert len(calls) == 2
+        assert pool.bucket("shop").metrics().throttled == 1
+        await pool.aclose()
@@ -3,10 +3,19 @@ Tests for Qdrant vector database client.
 
 Unit tests use mock client, integration tests use real Qdrant instance.
 """
+import datetime
+import json
+from pathlib import Path
+from unittest.mock import Mock
+import numpy as np
 import pytest
-from qdrant_client.models import PointStruct
+from qdrant_client import QdrantClient
+from qdrant_client.models import Disabled, Distance, PointStruct, VectorParams
 
+from product_agent.infrastructure.vector_db.client import async_vector_database, vector_database, quantization_config, search_params
+from product_agent.infrastructure.vector_db.in_memory import AsyncInMemoryVectorDb, InMemoryVectorDb
 from product_agent.infrastructure.vector_db.schemas import DbResponse
+from product_agent.infrastructure.vector_db.types import CollectionConfig, VectorFilter
 
 
 # -----------------------------------------------------------------------------
@@ -114,6 +123,246 @@ class TestMockVectorDb:
             assert isinstance(result.score, (int, float))
 
 
+class TestAsyncVectorDatabase:
+    """Unit tests for async_vector_database against in process qdrant."""
+
+    @pytest.fixture
+    async def async_db(self):
+        db = async_vector_database(location=":memory:")
+        await db.create_collection("shopify_products", config=CollectionConfig(size=3, payload_indexes={}))
+        await db.upsert_points("shopify_products", [
+            PointStruct(id=1, vector=[1.0, 0.0, 0.0], payload={"title": "Whey Protein", "product_type": "Protein"}),
+            PointStruct(id=2, vector=[0.0, 1.0, 0.0], payload={"title": "Vitamin D3", "product_type": "Vitamins"}),
+            PointStruct(id=3, vector=[0.0, 0.0, 1.0], payload={"title": "Pre Workout", "product_type": "Performance"}),
+        ])
+        yield db
+        await db.close()
+
+    async def test_search_batch_returns_results_per_query_in_order(self, async_db):
+        results = await async_db.search_batch(
+            collection_name="shopify_products",
+            query_vectors=[[0.0, 0.9, 0.1], [0.9, 0.0, 0.1]],
+            k=2
+        )
+
+        assert len(results) == 2
+        assert [len(points) for points in results] == [2, 2]
+        assert results[0][0].payload["title"] == "Vitamin D3"
+        assert results[1][0].payload["title"] == "Whey Protein"
+
+    async def test_search_batch_applies_filter_to_every_query(self, async_db):
+        results = await async_db.search_batch(
+            collection_name="shopify_products",
+            query_vectors=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+            vector_filter=VectorFilter(key="product_type", value="Performance"),
+            k=3
+        )
+
+        assert [[point.id for point in points] for points in results] == [[3], [3]]
+
+    async def test_search_batch_empty(self, async_db):
+        assert await async_db.search_batch(collection_name="shopify_products", query_vectors=[]) == []
+
+    async def test_upsert_error_is_returned(self, async_db):
+        result = await async_db.upsert_points(
+            collection_name="missing_collection",
+            points=[PointStruct(id=1, vector=[1.0, 0.0, 0.0], payload={})]
+        )
+
+        assert result.error is not None
+        assert result.records_inserted == 0
+
+
+class TestCollectionConfig:
+    """Collection config to qdrant quantization and search params."""
+
+    def test_plain_collection_has_no_quantization(self):
+        config = CollectionConfig()
+
+        assert quantization_config(config) is None
+        assert search_params(config) is None
+        assert set(config.payload_indexes) == {"product_type", "vendor", "tags", "tenant_id"}
+
+    def test_scalar_int8(self):
+        quantization = quantization_config(CollectionConfig(quantization="scalar", quantized_in_ram=True))
+
+        assert quantization.scalar.type == "int8"
+        assert quantization.scalar.always_ram is True
+
+    def test_binary_with_rescoring(self):
+        config = CollectionConfig(quantization="binary", on_disk=True, oversampling=3.0)
+
+        assert quantization_config(config).binary.always_ram is True
+        params = search_params(config)
+        assert params.quantization.rescore is True
+        assert params.quantization.oversampling == 3.0
+
+    def test_create_collection_indexes_every_payload_field(self):
+        db = vector_database.__new__(vector_database)
+        db.collection_config = CollectionConfig(quantization="scalar", on_disk=True)
+        db.client = Mock()
+        db.client.create_collection.return_value = True
+
+        db.create_collection("shopify_products", index_payload=True, index_wanted="handle")
+
+        _, kwargs = db.client.create_collection.call_args
+        assert kwargs["vectors_config"].on_disk is True
+        assert kwargs["quantization_config"].scalar.type == "int8"
+        indexed = {call.kwargs["field_name"]: call.kwargs["field_schema"] for call in db.client.create_payload_index.call_args_list}
+        assert indexed == dict.fromkeys(["product_type", "vendor", "tags", "tenant_id", "handle"], "keyword")
+
+    def test_update_collection_switches_existing_settings(self):
+        db = vector_database.__new__(vector_database)
+        db.collection_config = CollectionConfig(quantization="binary", on_disk=True)
+        db.client = Mock()
+        db.client.get_collection.return_value.payload_schema = {"product_type": "keyword", "vendor": "keyword"}
+
+        db.update_collection("shopify_products")
+
+        _, kwargs = db.client.update_collection.call_args
+        assert kwargs["vectors_config"][""].on_disk is True
+        assert kwargs["quantization_config"].binary is not None
+        assert [call.kwargs["field_name"] for call in db.client.create_payload_index.call_args_list] == ["tags", "tenant_id"]
+
+    def test_update_collection_can_turn_quantization_off(self):
+        db = vector_database.__new__(vector_database)
+        db.collection_config = CollectionConfig()
+        db.client = Mock()
+        db.client.get_collection.return_value.payload_schema = {}
+
+        db.update_collection("shopify_products")
+
+        assert db.client.update_collection.call_args.kwargs["quantization_config"] == Disabled.DISABLED
+
+
+EMBEDDING_EXAMPLES = Path(__file__).parents[3] / "store_data" / "embedding_examples"
+
+class FailingVectorDb:
+    def upsert_points(self, collection_name: str, points: list[PointStruct], wait: bool = True) -> DbResponse | None:
+        return DbResponse(records_inserted=0, collection_name=collection_name, time=datetime.datetime.now(), error="unavailable", traceback=None)
+
+    def delete_points(self, collection_name: str, point_ids: list) -> DbResponse | None:
+        return None
+
+class TestInMemoryVectorDb:
+    """Unit tests for the numpy vector index."""
+
+    @pytest.fixture
+    def random_db(self):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(200, 16)).astype(np.float32)
+        db = InMemoryVectorDb()
+        db.load(
+            "shopify_products",
+            ids=list(range(200)),
+            vectors=vectors,
+            payloads=[{"title": f"Product {i}", "vendor": "Optimum" if i % 4 == 0 else "Blackmores"} for i in range(200)]
+        )
+        return db, vectors
+
+    def test_top_k_matches_brute_force(self, random_db):
+        db, vectors = random_db
+        query = np.random.default_rng(1).normal(size=16).astype(np.float32)
+
+        results = db.search_points("shopify_products", query_vector=query.tolist(), k=5)
+
+        cosine = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        assert [point.id for point in results] == np.argsort(-cosine)[:5].tolist()
+        assert results[0].score == pytest.approx(cosine.max(), abs=1e-5)
+
+    def test_filter_only_returns_matching_payloads(self, random_db):
+        db, vectors = random_db
+
+        results = db.search_points(
+            "shopify_products",
+            query_vector=vectors[3].tolist(),
+            vector_filter=VectorFilter(key="vendor", value="Optimum"),
+            k=10
+        )
+
+        assert len(results) == 10
+        assert all(point.payload["vendor"] == "Optimum" for point in results)
+        assert all(point.id % 4 == 0 for point in results)
+
+    def test_search_batch_matches_single_searches(self, random_db):
+        db, vectors = random_db
+
+        batch = db.search_batch("shopify_products", query_vectors=vectors[:3].tolist(), k=4)
+
+        for query, results in zip(vectors[:3], batch, strict=True):
+            assert [p.id for p in results] == [p.id for p in db.search_points("shopify_products", query.tolist(), k=4)]
+
+    def test_delete_keeps_remaining_rows_searchable(self, random_db):
+        db, vectors = random_db
+
+        db.delete_points("shopify_products", point_ids=[5, 199])
+
+        assert db.count("shopify_products") == 198
+        assert db.search_points("shopify_products", vectors[5].tolist(), k=1)[0].id != 5
+        # The last row was swapped into the deleted slot
+        assert db.search_points("shopify_products", vectors[198].tolist(), k=1)[0].id == 198
+
+    def test_upsert_replaces_existing_point(self, random_db):
+        db, vectors = random_db
+
+        db.upsert_points("shopify_products", [PointStruct(id=0, vector=vectors[1].tolist(), payload={"title": "Moved"})])
+
+        assert db.count("shopify_products") == 200
+        top = db.search_points("shopify_products", vectors[1].tolist(), k=2)
+        assert {point.id for point in top} == {0, 1}
+
+    def test_failed_source_write_is_not_applied(self):
+        db = InMemoryVectorDb(source=FailingVectorDb())
+
+        response = db.upsert_points("shopify_products", [PointStruct(id=1, vector=[1.0, 0.0], payload={})])
+
+        assert response.error == "unavailable"
+        assert db.count("shopify_products") == 0
+
+    def test_loads_embedding_examples(self):
+        db = InMemoryVectorDb()
+        db.load_embedding_examples("shopify_products", EMBEDDING_EXAMPLES / "product_names_embedded.json")
+        db.load_embedding_examples("shopify_products", EMBEDDING_EXAMPLES / "singe_document_embed.json")
+
+        with open(EMBEDDING_EXAMPLES / "singe_document_embed.json") as f:
+            document = json.load(f)
+
+        assert db.count("shopify_products") == 4
+        top = db.search_points("shopify_products", document["embed"], k=1)[0]
+        assert top.payload["title"] == document["text"]
+        assert top.score == pytest.approx(1.0, abs=1e-5)
+
+    def test_loads_from_qdrant(self):
+        client = QdrantClient(location=":memory:")
+        client.create_collection("shopify_products", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+        client.upsert("shopify_products", points=[
+            PointStruct(id=i, vector=[float(i + 1), 1.0], payload={"title": f"Product {i}"}) for i in range(5)
+        ])
+
+        db = InMemoryVectorDb()
+        assert db.load_from_qdrant(client, "shopify_products", batch_size=2) == 5
+
+        expected = client.query_points("shopify_products", query=[1.0, 0.2], limit=3).points
+        results = db.search_points("shopify_products", [1.0, 0.2], k=3)
+        assert [p.id for p in results] == [p.id for p in expected]
+        assert [p.score for p in results] == pytest.approx([p.score for p in expected], abs=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_async_view_searches_the_same_index(self, random_db):
+        db, vectors = random_db
+        async_db = AsyncInMemoryVectorDb(db)
+
+        batch = await async_db.search_batch("shopify_products", query_vectors=vectors[:2].tolist(), k=3)
+        assert batch == db.search_batch("shopify_products", query_vectors=vectors[:2].tolist(), k=3)
+
+        await async_db.upsert_points("shopify_products", [PointStruct(id=500, vector=vectors[7].tolist(), payload={"title": "New"})])
+        top = await async_db.search_points("shopify_products", vectors[7].tolist(), k=2)
+        assert {point.id for point in top} == {7, 500}
+
+        await async_db.delete_points("shopify_products", point_ids=[500])
+        assert db.count("shopify_products") == 200
+
+
 # -----------------------------------------------------------------------------
 # Integration Tests
 # -----------------------------------------------------------------------------
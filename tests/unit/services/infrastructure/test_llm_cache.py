@@ -0,0 +1,72 @@
+import pytest
+
+from product_agent.infrastructure.llm.response_cache import LLMResponseCache
+from product_agent.models.llm_input import LLMInput
+from product_agent.models.query import QueryResponse
+from product_agent.services.infrastructure.llm import llm_service
+from tests.mocks.kv_mock import MockKV
+from tests.mocks.llm_mock import MockLLM
+
+def query_input(user_query: str = "Test query", schema=QueryResponse) -> LLMInput:
+    return LLMInput(model="mini_deterministic", user_query=user_query, response_schema=schema)
+
+class TestLLMResponseCache:
+    """Testing the content addressed llm response cache"""
+
+    @pytest.mark.asyncio
+    async def test_identical_call_is_served_from_memory(self):
+        llm = MockLLM()
+        cache = LLMResponseCache()
+
+        first = await llm_service(query_input(), llm, cache=cache, call_site="query_extract")
+        second = await llm_service(query_input(), llm, cache=cache, call_site="query_extract")
+
+        assert llm.invoke_call_count == 1
+        assert isinstance(second, QueryResponse)
+        assert second == first
+        stats = cache.stats()[0]
+        assert (stats.memory_hits, stats.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_different_query_misses(self):
+        llm = MockLLM()
+        cache = LLMResponseCache()
+
+        await llm_service(query_input("one"), llm, cache=cache)
+        await llm_service(query_input("two"), llm, cache=cache)
+
+        assert llm.invoke_call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared_between_processes(self):
+        kv = MockKV()
+        llm = MockLLM()
+        await llm_service(query_input(schema=None), llm, cache=LLMResponseCache(kv_db=kv))
+
+        other_process = LLMResponseCache(kv_db=kv)
+        result = await llm_service(query_input(schema=None), llm, cache=other_process, call_site="fill_data")
+
+        assert llm.invoke_call_count == 1
+        assert isinstance(result, str)
+        assert other_process.stats()[0].redis_hits == 1
+
+    def test_lru_and_ttl_eviction(self):
+        cache = LLMResponseCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+
+        assert len(cache) == 2
+        assert cache.get("a", None) is None
+        assert cache.get("c", None) == "c"
+
+        expired = LLMResponseCache(ttl_seconds=-1)
+        expired.set("a", "a")
+        assert expired.get("a", None) is None
+
+    @pytest.mark.asyncio
+    async def test_no_cache_always_invokes(self):
+        llm = MockLLM()
+        await llm_service(query_input(), llm)
+        await llm_service(query_input(), llm)
+
+        assert llm.invoke_call_count == 2
@@ -0,0 +1,98 @@
+import pytest
+
+from product_agent.infrastructure.llm.markdown_cache import MarkdownExtractionCache, normalise_markdown
+from product_agent.models.llm_input import LLMInput
+from product_agent.models.scraper import ScraperSynthesisResponse
+from product_agent.services.orchestrators.content_extraction import analyse_markdowns_with_llm_svc
+
+PRODUCT_COPY = " ".join(
+    f"Gold Standard whey protein delivers {i} grams of blended protein per serve with low fat and sugar"
+    for i in range(40)
+)
+
+def synthesis(url: str = "https://example.com/whey") -> ScraperSynthesisResponse:
+    return ScraperSynthesisResponse(
+        url=url, name="Gold Standard Whey", price=49.95, currency="AUD", description="Whey protein",
+        other=None, image_urls=None, sku=None, brand="Optimum Nutrition", category="Protein Powder",
+        attributes=None, rating=None, review_count=None, metadata=None
+    )
+
+class CountingLLM:
+    """Returns a fixed synthesis and counts calls"""
+    def __init__(self):
+        self.calls = 0
+
+    async def invoke(self, llm_input: LLMInput):
+        self.calls += 1
+        return synthesis(url=f"https://example.com/{self.calls}")
+
+class TestMarkdownExtractionCache:
+    """Testing the exact and near duplicate markdown tiers"""
+
+    def test_normalise_strips_links_and_layout(self):
+        first = normalise_markdown("# Whey  [Buy](https://a.com/whey)\n\n**Protein**")
+        second = normalise_markdown("# whey [Buy](https://b.com/x)\nprotein")
+        assert first == second
+
+    def test_exact_hit(self):
+        cache = MarkdownExtractionCache()
+        cache.store(cache.signature(PRODUCT_COPY), synthesis())
+
+        assert cache.lookup(cache.signature(PRODUCT_COPY.upper())) == synthesis()
+        assert cache.stats.exact_hits == 1
+
+    def test_near_duplicate_hit(self):
+        cache = MarkdownExtractionCache()
+        cache.store(cache.signature(PRODUCT_COPY), synthesis())
+
+        # Same product copy, another retailers footer
+        near = cache.signature(PRODUCT_COPY + " free shipping over fifty dollars")
+        assert cache.similarity(cache.signature(PRODUCT_COPY), near) >= 0.95
+        assert cache.lookup(near) == synthesis()
+        assert cache.stats.near_hits == 1
+
+    def test_different_page_misses(self):
+        cache = MarkdownExtractionCache()
+        cache.store(cache.signature(PRODUCT_COPY), synthesis())
+
+        other = " ".join(f"Creatine monohydrate {i} micronised for mixing and strength" for i in range(40))
+        assert cache.lookup(cache.signature(other)) is None
+        assert cache.stats.misses == 1
+
+    def test_lru_eviction_clears_buckets(self):
+        cache = MarkdownExtractionCache(max_entries=1)
+        cache.store(cache.signature(PRODUCT_COPY), synthesis())
+        cache.store(cache.signature("a completely different page about creatine"), synthesis())
+
+        assert len(cache) == 1
+        assert cache.lookup(cache.signature(PRODUCT_COPY)) is None
+        assert all(len(bucket) == 1 for bucket in cache._buckets.values())
+
+    # ---------------------------------------------------------------------------
+    @pytest.mark.asyncio
+    async def test_analyse_markdowns_reuses_near_duplicates(self):
+        """A reused analysis comes back under the url of the page it was reused for."""
+        llm = CountingLLM()
+        cache = MarkdownExtractionCache()
+        markdowns = [PRODUCT_COPY, PRODUCT_COPY + " free shipping over fifty dollars"]
+        urls = ["https://a.com/whey", "https://b.com/whey"]
+
+        first = await analyse_markdowns_with_llm_svc(markdowns, llm, model="scraper_mini", markdown_cache=cache, urls=urls)
+        assert llm.calls == 1
+        assert [scrape.url for scrape in first.successful_scrapes] == ["https://example.com/1", "https://b.com/whey"]
+        assert first.successful_scrapes[1].name == first.successful_scrapes[0].name
+
+        second = await analyse_markdowns_with_llm_svc([PRODUCT_COPY], llm, model="scraper_mini", markdown_cache=cache, urls=["https://c.com/whey"])
+        assert llm.calls == 1
+        assert second.successful_scrapes[0].url == "https://c.com/whey"
+        assert second.successful_scrapes[0].description == first.successful_scrapes[0].description
+
+    @pytest.mark.asyncio
+    async def test_analyse_markdowns_drops_reused_pages_without_urls(self):
+        llm = CountingLLM()
+        cache = MarkdownExtractionCache()
+        markdowns = [PRODUCT_COPY, PRODUCT_COPY + " free shipping over fifty dollars"]
+
+        result = await analyse_markdowns_with_llm_svc(markdowns, llm, model="scraper_mini", markdown_cache=cache)
+        assert llm.calls == 1
+        assert [scrape.url for scrape in result.successful_scrapes] == ["https://example.com/1"]
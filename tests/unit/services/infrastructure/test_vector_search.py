@@ -3,9 +3,24 @@ Tests for vector database service layer functions.
 
 Uses standardized TestCase pattern with data + expected results.
 """
-import pytest
+import asyncio
+import threading
+import time
+from qdrant_client.models import ScoredPoint
 
-from product_agent.services.infrastructure.vector_search import similarity_search_svc, product_similarity_threshold_svc
+from product_agent.services.infrastructure.vector_search import (
+    similarity_search_svc,
+    product_similarity_threshold_svc,
+    similarity_search_batch_svc,
+    merge_search_results,
+    batch_products_to_vector_db,
+    stream_products_to_vector_db,
+    product_point_id,
+    VectorSyncProgress
+)
+from product_agent.infrastructure.vector_db.in_memory import InMemoryVectorDb
+from product_agent.infrastructure.vector_db.types import VectorFilter
+from product_agent.models.shopify import ShopifyProductSchema
 
 
 # -----------------------------------------------------------------------------
@@ -108,3 +123,248 @@ class TestProductSimilarityThreshold:
 
         # Mock returns 95.0 score
         assert result.score == 95.0
+
+
+def scored(point_id: int, score: float) -> ScoredPoint:
+    return ScoredPoint(id=point_id, score=score, payload={"title": f"Product {point_id}"}, version=0)
+
+class FakeAsyncVectorDb:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def search_batch(self, collection_name: str, query_vectors: list[list[float]], vector_filter=None, k: int = 5):
+        self.calls.append(query_vectors)
+        if self.fail:
+            raise TimeoutError("search timed out")
+        return [[scored(i, 0.9)] for i in range(len(query_vectors))]
+
+class TestSimilaritySearchBatch:
+    """Tests for the batched search service and merging its results."""
+
+    async def test_one_round_trip_for_all_queries(self):
+        vector_db = FakeAsyncVectorDb()
+
+        results = await similarity_search_batch_svc([[0.1], [0.2], [0.3]], 4, vector_db)
+
+        assert len(vector_db.calls) == 1
+        assert [points[0].id for points in results] == [0, 1, 2]
+
+    async def test_failure_returns_none(self):
+        assert await similarity_search_batch_svc([[0.1]], 4, FakeAsyncVectorDb(fail=True)) is None
+
+    def test_merge_keeps_best_score_per_point(self):
+        merged = merge_search_results([
+            [scored(1, 0.8), scored(2, 0.7)],
+            [scored(2, 0.95), scored(3, 0.6)],
+        ], results_wanted=2)
+
+        assert [(point.id, point.score) for point in merged] == [(2, 0.95), (1, 0.8)]
+
+
+class CountingEmbeddor:
+    def __init__(self):
+        self.embedded: list[str] = []
+
+    def embed_documents(self, documents: list[str]):
+        self.embedded.extend(documents)
+        return [[float(len(document)), 1.0] for document in documents]
+
+def catalogue(*titles: str) -> list[ShopifyProductSchema]:
+    return [ShopifyProductSchema(id=i + 1, title=title, vendor="Optimum") for i, title in enumerate(titles)]
+
+class TestBatchProductsToVectorDb:
+    """Deterministic ids, content hash skipping and stale deletes."""
+
+    async def _sync(self, products, vector_db, embeddor, delete_stale=False):
+        return await batch_products_to_vector_db(
+            products=products,
+            database=vector_db,
+            embedder=embeddor,
+            collection_name="shopify_products",
+            delete_stale=delete_stale
+        )
+
+    async def test_point_ids_come_from_product_ids(self):
+        vector_db = InMemoryVectorDb()
+
+        assert await self._sync(catalogue("Whey Protein", "Creatine"), vector_db, CountingEmbeddor()) == "Success"
+
+        payloads = vector_db.retrieve_payloads("shopify_products", [product_point_id(1), product_point_id(2)])
+        assert payloads[product_point_id(1)]["title"] == "Whey Protein"
+        assert len(payloads[product_point_id(2)]["content_hash"]) == 64
+
+    async def test_payload_carries_tenant_and_split_tags(self):
+        vector_db = InMemoryVectorDb()
+        products = catalogue("Whey Protein")
+        products[0].tags = "protein, isolate,, whey "
+
+        await batch_products_to_vector_db(products=products, database=vector_db, embedder=CountingEmbeddor(), collection_name="shopify_products", tenant_id="shop-a")
+
+        payload = vector_db.retrieve_payloads("shopify_products", [product_point_id(1)])[product_point_id(1)]
+        assert payload["tenant_id"] == "shop-a"
+        assert payload["tags"] == ["protein", "isolate", "whey"]
+        assert vector_db.search_points("shopify_products", [12.0, 1.0], vector_filter=VectorFilter(key="tenant_id", value="shop-a"))
+        assert vector_db.search_points("shopify_products", [12.0, 1.0], vector_filter=VectorFilter(key="tags", value="isolate"))
+        assert vector_db.search_points("shopify_products", [12.0, 1.0], vector_filter=VectorFilter(key="tags", value="casein")) == []
+        assert vector_db.scroll_point_ids("shopify_products", vector_filter=VectorFilter(key="tenant_id", value="shop-a")) == [product_point_id(1)]
+        assert vector_db.scroll_point_ids("shopify_products", vector_filter=VectorFilter(key="tenant_id", value="shop-b")) == []
+
+    async def test_reordered_resync_sends_nothing(self):
+        vector_db = InMemoryVectorDb()
+        products = catalogue("Whey Protein", "Creatine", "Vitamin D3")
+        await self._sync(products, vector_db, CountingEmbeddor())
+
+        embeddor = CountingEmbeddor()
+        await self._sync(products[::-1], vector_db, embeddor)
+
+        assert embeddor.embedded == []
+        assert vector_db.count("shopify_products") == 3
+
+    async def test_only_changed_products_are_re_embedded(self):
+        vector_db = InMemoryVectorDb()
+        await self._sync(catalogue("Whey Protein", "Creatine"), vector_db, CountingEmbeddor())
+
+        products = catalogue("Whey Protein", "Creatine Monohydrate")
+        products[0].tags = "protein, isolate"
+        embeddor = CountingEmbeddor()
+        await self._sync(products, vector_db, embeddor)
+
+        # A payload only change still refreshes the point
+        assert embeddor.embedded == ["Whey Protein", "Creatine Monohydrate"]
+        assert vector_db.retrieve_payloads("shopify_products", [product_point_id(2)])[product_point_id(2)]["title"] == "Creatine Monohydrate"
+
+    async def test_delete_stale_removes_missing_products(self):
+        vector_db = InMemoryVectorDb()
+        await self._sync(catalogue("Whey Protein", "Creatine", "Vitamin D3"), vector_db, CountingEmbeddor())
+
+        await self._sync(catalogue("Whey Protein", "Creatine"), vector_db, CountingEmbeddor(), delete_stale=True)
+
+        assert set(vector_db.scroll_point_ids("shopify_products")) == {product_point_id(1), product_point_id(2)}
+
+    async def test_stream_deletes_products_not_streamed(self):
+        vector_db = InMemoryVectorDb()
+        await self._sync(catalogue("Whey Protein", "Creatine", "Vitamin D3"), vector_db, CountingEmbeddor())
+
+        async def pages():
+            yield catalogue("Whey Protein")
+            yield [ShopifyProductSchema(id=3, title="Vitamin D3", vendor="Optimum")]
+
+        embeddor = CountingEmbeddor()
+        assert await stream_products_to_vector_db(pages(), vector_db, embeddor, "shopify_products") == "Success"
+
+        assert embeddor.embedded == []
+        assert set(vector_db.scroll_point_ids("shopify_products")) == {product_point_id(1), product_point_id(3)}
+
+
+class RecordingEmbeddor(CountingEmbeddor):
+    """Records when each batch starts and ends being embedded"""
+    def __init__(self, events: list, delay: float = 0.02):
+        super().__init__()
+        self.events = events
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def embed_documents(self, documents: list[str]):
+        with self.lock:
+            self.events.append(("embed_start", documents[0]))
+        time.sleep(self.delay)
+        return super().embed_documents(documents)
+
+class RecordingVectorDb(InMemoryVectorDb):
+    """Records upserts, can be made to fail on a given call"""
+    def __init__(self, events: list, delay: float = 0.05, fail_on_call: int | None = None):
+        super().__init__()
+        self.events = events
+        self.delay = delay
+        self.fail_on_call = fail_on_call
+        self.waits: list[bool] = []
+
+    def upsert_points(self, collection_name, points, wait=True):
+        self.waits.append(wait)
+        if len(self.waits) == self.fail_on_call:
+            raise ConnectionError("qdrant went away")
+        self.events.append(("upsert_start", points[0].payload["title"]))
+        time.sleep(self.delay)
+        response = super().upsert_points(collection_name, points, wait=wait)
+        self.events.append(("upsert_end", points[0].payload["title"]))
+        return response
+
+def titles(count: int) -> list[ShopifyProductSchema]:
+    return catalogue(*[f"Product {i:03}" for i in range(count)])
+
+class TestVectorSyncPipeline:
+    """Overlapping embed and upsert batches, backpressure and resume."""
+
+    async def test_next_batch_embeds_while_previous_upserts(self):
+        events = []
+        vector_db = RecordingVectorDb(events)
+
+        await batch_products_to_vector_db(titles(6), vector_db, RecordingEmbeddor(events), "shopify_products", batch_size=2)
+
+        # Batch 2 started embedding before batch 1 finished upserting
+        assert events.index(("embed_start", "Product 002")) < events.index(("upsert_end", "Product 000"))
+        assert vector_db.count("shopify_products") == 6
+
+    async def test_only_last_batch_waits(self):
+        vector_db = RecordingVectorDb([], delay=0)
+
+        await batch_products_to_vector_db(titles(5), vector_db, CountingEmbeddor(), "shopify_products", batch_size=2)
+
+        assert vector_db.waits == [False, False, True]
+
+    async def test_embedding_is_bounded_by_pending_batches(self):
+        events = []
+        vector_db = RecordingVectorDb(events, delay=0.05)
+
+        await batch_products_to_vector_db(titles(10), vector_db, RecordingEmbeddor(events, delay=0), "shopify_products", batch_size=1, max_pending_batches=1)
+
+        for step, event in enumerate(events):
+            if event[0] != "embed_start":
+                continue
+            upserts_done = sum(1 for e in events[:step] if e[0] == "upsert_end")
+            embedded_before = sum(1 for e in events[:step] if e[0] == "embed_start")
+            # One batch upserting, one queued and the one being embedded
+            assert embedded_before - upserts_done <= 2
+
+    async def test_progress_is_reported_per_batch(self):
+        reports = []
+
+        await batch_products_to_vector_db(
+            titles(5), InMemoryVectorDb(), CountingEmbeddor(), "shopify_products",
+            batch_size=2, on_progress=lambda progress: reports.append(progress.model_copy())
+        )
+
+        assert [report.batches_committed for report in reports] == [1, 2, 3]
+        assert reports[-1] == VectorSyncProgress(
+            collection_name="shopify_products", products=5, unchanged=0,
+            batches=3, batches_embedded=3, batches_committed=3, points_committed=5
+        )
+
+    async def test_rerun_after_crash_resumes_from_last_committed_batch(self):
+        products = titles(6)
+        vector_db = RecordingVectorDb([], delay=0, fail_on_call=3)
+
+        assert await batch_products_to_vector_db(products, vector_db, CountingEmbeddor(), "shopify_products", batch_size=2) is None
+        assert vector_db.count("shopify_products") == 4
+
+        embeddor = CountingEmbeddor()
+        assert await batch_products_to_vector_db(products, vector_db, embeddor, "shopify_products", batch_size=2) == "Success"
+        assert embeddor.embedded == ["Product 004", "Product 005"]
+        assert vector_db.count("shopify_products") == 6
+
+    async def test_embedding_failure_stops_the_pipeline(self):
+        class FailingEmbeddor(CountingEmbeddor):
+            def embed_documents(self, documents):
+                if len(self.embedded) >= 2:
+                    raise TimeoutError("embeddings api timed out")
+                return super().embed_documents(documents)
+
+        vector_db = InMemoryVectorDb()
+        result = await asyncio.wait_for(
+            batch_products_to_vector_db(titles(6), vector_db, FailingEmbeddor(), "shopify_products", batch_size=2),
+            timeout=5
+        )
+
+        assert result is None
+        assert vector_db.count("shopify_products") == 2
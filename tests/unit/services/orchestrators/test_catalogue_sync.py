@@ -0,0 +1,276 @@
+import asyncio
+import datetime
+import pytest
+
+from product_agent.infrastructure.vector_db.schemas import DbResponse
+from product_agent.models.shopify import ShopifyProductSchema
+from product_agent.services.infrastructure.vector_search import batch_products_to_vector_db
+from product_agent.services.orchestrators import catalogue_sync
+from product_agent.services.orchestrators.catalogue_sync import (
+    incremental_catalogue_sync,
+    parse_updated_at,
+    product_point_id,
+    schedule_catalogue_sync,
+    WATERMARK_DATABASE,
+)
+from tests.mocks.kv_mock import MockKV
+
+# ---------------------------------------------------------------------------
+# Fakes
+# ---------------------------------------------------------------------------
+
+def make_product(product_id: int, title: str, updated_at: str) -> ShopifyProductSchema:
+    return ShopifyProductSchema(id=product_id, title=title, updated_at=updated_at)
+
+class FakeShop:
+    """Filters on updated_at_min like the real store"""
+    def __init__(self, products: list[ShopifyProductSchema]):
+        self.products = products
+        self.calls = []
+
+    async def stream_products_from_store(self, fields=None, page_size=250, bulk=False, updated_at_min=None):
+        self.calls.append(updated_at_min)
+        products = [
+            p for p in self.products
+            if updated_at_min is None or p.updated_at >= updated_at_min
+        ]
+        for start in range(0, len(products), page_size):
+            yield products[start:start + page_size]
+
+class FakeEmbeddor:
+    def __init__(self):
+        self.embedded: list[str] = []
+
+    def embed_documents(self, documents):
+        self.embedded.extend(documents)
+        return [[0.1, 0.2] for _ in documents]
+
+def db_response(collection_name: str) -> DbResponse:
+    return DbResponse(
+        records_inserted=0,
+        collection_name=collection_name,
+        time=datetime.datetime.now(),
+        error=None,
+        traceback=None
+    )
+
+class FakeVectorDb:
+    def __init__(self):
+        self.points = {}
+
+    def upsert_points(self, collection_name, points, wait=True):
+        for point in points:
+            self.points[point.id] = point
+        return db_response(collection_name)
+
+    def delete_points(self, collection_name, point_ids):
+        for point_id in point_ids:
+            self.points.pop(point_id, None)
+        return db_response(collection_name)
+
+    def retrieve_payloads(self, collection_name, point_ids, keys=None):
+        return {
+            point_id: {key: value for key, value in self.points[point_id].payload.items() if keys is None or key in keys}
+            for point_id in point_ids if point_id in self.points
+        }
+
+    def scroll_point_ids(self, collection_name, vector_filter=None):
+        return [
+            point_id for point_id, point in self.points.items()
+            if vector_filter is None or point.payload.get(vector_filter.key) == vector_filter.value
+        ]
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestIncrementalCatalogueSync:
+    """Testing watermark, hash skipping and deletion handling"""
+
+    async def _sync(self, shop, vector_db, embeddor, kv, detect_deletions=False):
+        return await incremental_catalogue_sync(
+            shop=shop,
+            vector_db=vector_db,
+            embeddor=embeddor,
+            kv_db=kv,
+            shop_name="test-shop",
+            collection_name="products",
+            detect_deletions=detect_deletions
+        )
+
+    @pytest.mark.asyncio
+    async def test_first_run_embeds_everything_and_sets_watermark(self):
+        shop = FakeShop([
+            make_product(1, "Whey Protein", "2026-01-01T00:00:00Z"),
+            make_product(2, "Creatine", "2026-01-02T00:00:00Z"),
+        ])
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+
+        result = await self._sync(shop, vector_db, embeddor, kv)
+
+        assert result.error is None
+        assert result.products_embedded == 2
+        assert result.watermark == "2026-01-02T00:00:00Z"
+        assert kv.hashes[WATERMARK_DATABASE]["test-shop"] == "2026-01-02T00:00:00Z"
+        assert set(vector_db.points) == {product_point_id(1), product_point_id(2)}
+
+    @pytest.mark.asyncio
+    async def test_unchanged_text_is_not_re_embedded(self):
+        products = [
+            make_product(1, "Whey Protein", "2026-01-01T00:00:00Z"),
+            make_product(2, "Creatine", "2026-01-02T00:00:00Z"),
+        ]
+        shop = FakeShop(products)
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await self._sync(shop, vector_db, embeddor, kv)
+
+        # An inventory edit bumps updated_at without touching the title
+        products[1] = make_product(2, "Creatine", "2026-01-03T00:00:00Z")
+        embeddor.embedded.clear()
+        result = await self._sync(shop, vector_db, embeddor, kv)
+
+        assert shop.calls == [None, "2026-01-02T00:00:00Z"]
+        assert result.products_embedded == 0
+        assert result.products_unchanged == 1
+        assert embeddor.embedded == []
+        assert result.watermark == "2026-01-03T00:00:00Z"
+
+    @pytest.mark.asyncio
+    async def test_changed_title_is_re_embedded_with_same_point_id(self):
+        products = [make_product(1, "Whey Protein", "2026-01-01T00:00:00Z")]
+        shop = FakeShop(products)
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await self._sync(shop, vector_db, embeddor, kv)
+
+        products[0] = make_product(1, "Whey Protein Isolate", "2026-01-05T00:00:00Z")
+        result = await self._sync(shop, vector_db, embeddor, kv)
+
+        assert result.products_embedded == 1
+        assert list(vector_db.points) == [product_point_id(1)]
+        assert vector_db.points[product_point_id(1)].payload["title"] == "Whey Protein Isolate"
+
+    @pytest.mark.asyncio
+    async def test_removed_products_are_deleted(self):
+        products = [
+            make_product(1, "Whey Protein", "2026-01-01T00:00:00Z"),
+            make_product(2, "Creatine", "2026-01-02T00:00:00Z"),
+        ]
+        shop = FakeShop(products)
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await self._sync(shop, vector_db, embeddor, kv)
+
+        products.pop(0)
+        assert (await self._sync(shop, vector_db, embeddor, kv)).products_deleted == 0
+        result = await self._sync(shop, vector_db, embeddor, kv, detect_deletions=True)
+
+        assert result.products_deleted == 1
+        assert set(vector_db.points) == {product_point_id(2)}
+
+    @pytest.mark.asyncio
+    async def test_other_shops_points_are_not_deleted(self):
+        shop = FakeShop([make_product(1, "Whey Protein", "2026-01-01T00:00:00Z")])
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await batch_products_to_vector_db(
+            products=[make_product(7, "Magnesium", "2026-01-01T00:00:00Z")],
+            database=vector_db,
+            embedder=embeddor,
+            collection_name="products",
+            tenant_id="other-shop"
+        )
+
+        result = await self._sync(shop, vector_db, embeddor, kv, detect_deletions=True)
+
+        assert result.products_deleted == 0
+        assert set(vector_db.points) == {product_point_id(1), product_point_id(7)}
+
+    @pytest.mark.asyncio
+    async def test_agrees_with_batch_products_to_vector_db(self):
+        """Points written by the full sync carry the hash the incremental sync diffs on."""
+        products = [make_product(1, "Whey Protein", "2026-01-01T00:00:00Z")]
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await batch_products_to_vector_db(products=products, database=vector_db, embedder=embeddor, collection_name="products", tenant_id="test-shop")
+
+        embeddor.embedded.clear()
+        result = await self._sync(FakeShop(products), vector_db, embeddor, kv)
+
+        assert result.products_unchanged == 1
+        assert embeddor.embedded == []
+
+    @pytest.mark.asyncio
+    async def test_payload_only_change_refreshes_the_point(self):
+        products = [make_product(1, "Whey Protein", "2026-01-01T00:00:00Z")]
+        shop = FakeShop(products)
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+        await self._sync(shop, vector_db, embeddor, kv)
+
+        products[0] = make_product(1, "Whey Protein", "2026-01-02T00:00:00Z")
+        products[0].vendor = "Optimum Nutrition"
+        result = await self._sync(shop, vector_db, embeddor, kv)
+
+        assert result.products_embedded == 1
+        assert vector_db.points[product_point_id(1)].payload["vendor"] == "Optimum Nutrition"
+
+    @pytest.mark.asyncio
+    async def test_watermark_compares_timestamps_not_strings(self):
+        """REST offsets and bulk Z timestamps order by instant, not by text."""
+        shop = FakeShop([
+            # 2026-01-01T23:00:00Z, sorts after the other one as a string
+            make_product(1, "Whey Protein", "2026-01-02T10:00:00+11:00"),
+            make_product(2, "Creatine", "2026-01-01T23:30:00Z"),
+        ])
+        vector_db, embeddor, kv = FakeVectorDb(), FakeEmbeddor(), MockKV()
+
+        result = await self._sync(shop, vector_db, embeddor, kv)
+
+        assert result.watermark == "2026-01-01T23:30:00Z"
+
+    def test_parse_updated_at(self):
+        assert parse_updated_at("2026-01-02T10:00:00+11:00") == parse_updated_at("2026-01-01T23:00:00Z")
+        assert parse_updated_at("2026-01-01T23:00:00").tzinfo is not None
+        assert parse_updated_at("not a date") is None
+        assert parse_updated_at(None) is None
+
+    def test_point_id_is_deterministic(self):
+        assert product_point_id(42) == product_point_id("42")
+        assert product_point_id(42) != product_point_id(43)
+
+
+class TestScheduleCatalogueSync:
+    """The scheduled sync only walks the whole store on its full passes"""
+
+    @pytest.mark.asyncio
+    async def test_full_pass_every_n_runs(self, monkeypatch):
+        calls = []
+
+        async def fake_sync(**kwargs):
+            calls.append(kwargs["detect_deletions"])
+            if len(calls) == 5:
+                raise asyncio.CancelledError
+
+        monkeypatch.setattr(catalogue_sync, "incremental_catalogue_sync", fake_sync)
+        with pytest.raises(asyncio.CancelledError):
+            await schedule_catalogue_sync(
+                shop=FakeShop([]), vector_db=FakeVectorDb(), embeddor=FakeEmbeddor(), kv_db=MockKV(),
+                shop_name="test-shop", collection_name="products", interval_seconds=0, full_pass_every=2
+            )
+
+        assert calls == [True, False, True, False, True]
+
+    @pytest.mark.asyncio
+    async def test_failed_run_is_retried_on_the_next_tick(self, monkeypatch):
+        calls = []
+
+        async def fake_sync(**kwargs):
+            calls.append(kwargs["detect_deletions"])
+            if len(calls) == 1:
+                raise RuntimeError("shopify unavailable")
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr(catalogue_sync, "incremental_catalogue_sync", fake_sync)
+        with pytest.raises(asyncio.CancelledError):
+            await schedule_catalogue_sync(
+                shop=FakeShop([]), vector_db=FakeVectorDb(), embeddor=FakeEmbeddor(), kv_db=MockKV(),
+                shop_name="test-shop", collection_name="products", interval_seconds=0
+            )
+
+        assert len(calls) == 2